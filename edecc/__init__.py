@@ -0,0 +1,26 @@
+"""
+Curve25519/Edwards curve cryptography and abstract group support.
+
+Importing the package is cheap: submodules are imported on first access
+(edecc.eddsa, edecc.extended, ...) or explicitly (import edecc.eddsa).
+Optional dependencies are imported by the functions that need them:
+pycryptodome for the AES of hybrid encryption, ecdsa for square roots and
+Jacobi symbols modulo general primes, multiprocessing for worker pools.
+"""
+
+import importlib
+
+_submodules = (
+    'aio', 'context', 'conv', 'curve', 'curve25519', 'dlog', 'ecc', 'ed25519',
+    'eddsa', 'edwards', 'elgamal', 'extended', 'group', 'inv', 'modular',
+    'mont', 'noncepool', 'proj', 'reference', 'rng', 'scalar', 'serve',
+    'tablecache', 'testcurves', 'utils', 'values', 'verifierpool', 'xz',
+)
+
+def __getattr__(name):
+    if name in _submodules:
+        return importlib.import_module('.' + name, __name__)
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
+
+def __dir__():
+    return sorted(set(globals()) | set(_submodules))
@@ -0,0 +1,164 @@
+"""
+asyncio interface to signing, verification, key exchange and encryption.
+
+The curve arithmetic takes milliseconds of pure Python per operation, so
+running it on the event loop would stall every other task. The coroutines
+here run it in an executor instead (the loop's default thread pool unless
+configured otherwise, e.g. a ProcessPoolExecutor or a VerifierPool), and
+concurrent verify calls are coalesced into batches, one executor job each,
+checked with one randomized batch equation (eddsa.verify_batch).
+"""
+
+import asyncio
+import weakref
+from .eddsa import verify_batch
+from .verifierpool import VerifierPool
+
+max_pending = 1024 # operations in flight before callers wait (backpressure)
+max_batch = 64 # verifications coalesced into one executor job
+
+class Runner(object):
+    """
+    Runs key operations off the event loop.
+
+    Attributes:
+        - executor: a concurrent.futures executor, a VerifierPool (used for
+          verification only; other operations go to the loop's default
+          executor), or None for the loop's default executor
+        - limit: maximum number of operations in flight
+        - batch: maximum number of verifications per executor job
+        - batches: number of verification jobs submitted so far
+
+    A Runner may be used from several event loops in turn (e.g. successive
+    asyncio.run calls); each loop gets its own limit semaphore, since an
+    asyncio.Semaphore can only be used from one loop.
+    """
+
+    def __init__(self, executor=None, limit=max_pending, batch=max_batch):
+        self.executor = executor
+        self.limit = limit
+        self.batch = batch
+        self.batches = 0
+        self.semaphores = weakref.WeakKeyDictionary()
+        self.pending = []
+
+    def _slots(self):
+        """
+        The semaphore limiting the operations in flight on the running loop.
+        """
+        loop = asyncio.get_running_loop()
+        slots = self.semaphores.get(loop)
+        if slots is None:
+            slots = self.semaphores[loop] = asyncio.Semaphore(self.limit)
+        return slots
+
+    async def run(self, func, *args):
+        """
+        Runs func(*args) in the executor, waiting first if limit operations
+        are already in flight.
+        """
+        executor = self.executor
+        if isinstance(executor, VerifierPool):
+            executor = None
+        async with self._slots():
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(executor, func, *args)
+
+    async def sign(self, key, msg):
+        return await self.run(key.sign, msg)
+
+    async def exchange(self, private, public):
+        return await self.run(private.exchange, public)
+
+    async def encrypt(self, public, data):
+        return await self.run(public.encrypt, data)
+
+    async def decrypt(self, private, encrypted):
+        return await self.run(private.decrypt, encrypted)
+
+    async def verify(self, key, msg, sig):
+        """
+        Verifies sig on msg under the edwardsPublicKey key. Calls made while
+        the loop is busy are queued and verified together: the queue is
+        flushed as one executor job when it reaches batch entries or at the
+        next iteration of the loop, whichever comes first, and the job
+        checks them with one batch equation (see eddsa.verify_batch, which
+        is cofactored).
+        """
+        async with self._slots():
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            self.pending.append((key, msg, sig, future))
+            if len(self.pending) >= self.batch:
+                self._flush()
+            elif len(self.pending) == 1:
+                loop.call_soon(self._flush)
+            return await future
+
+    def _flush(self):
+        batch, self.pending = self.pending, []
+        if not batch:
+            return
+        self.batches += 1
+        if isinstance(self.executor, VerifierPool):
+            items = [(key.element, msg, sig) for key, msg, sig, f in batch]
+            job = asyncio.wrap_future(self.executor.submit(items))
+        else:
+            items = [(key, msg, sig) for key, msg, sig, f in batch]
+            loop = asyncio.get_running_loop()
+            job = loop.run_in_executor(self.executor, _verify_batch, items)
+        job.add_done_callback(lambda job: _resolve(job, batch))
+
+def _verify_batch(items):
+    """
+    Executor entry point for Runner verification batches.
+    """
+    return verify_batch(items)
+
+def _resolve(job, batch):
+    """
+    Hands the results of a verification job to the waiting callers.
+    """
+    futures = [f for key, msg, sig, f in batch]
+    if job.cancelled():
+        for f in futures:
+            f.cancel()
+        return
+    if job.exception() is not None:
+        for f in futures:
+            if not f.done():
+                f.set_exception(job.exception())
+        return
+    for f, ok in zip(futures, job.result()):
+        if not f.done():
+            f.set_result(ok)
+
+runner = None
+
+def configure(executor=None, limit=max_pending, batch=max_batch):
+    """
+    Replaces the module-level Runner used by the functions below.
+    """
+    global runner
+    runner = Runner(executor, limit, batch)
+    return runner
+
+def _runner():
+    if runner is None:
+        configure()
+    return runner
+
+async def sign(key, msg):
+    return await _runner().sign(key, msg)
+
+async def verify(key, msg, sig):
+    return await _runner().verify(key, msg, sig)
+
+async def exchange(private, public):
+    return await _runner().exchange(private, public)
+
+async def encrypt(public, data):
+    return await _runner().encrypt(public, data)
+
+async def decrypt(private, encrypted):
+    return await _runner().decrypt(private, encrypted)
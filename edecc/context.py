@@ -0,0 +1,81 @@
+"""
+Per-curve constants, computed once.
+
+The curve arithmetic needs a number of values derived from the curve
+parameters (2d, sqrt(-1), the exponents of the square root, ...). A
+CurveContext computes them when the curve is defined, and the coordinate
+systems and EdDSA read them from there instead of recomputing them in every
+formula. Named curves (e.g. ed25519.context) memoize their context at module
+level, so that all the curve objects built for them share the constants and
+the fixed-base tables.
+
+The ModInt constants are shared: they must only ever be used as operands.
+"""
+
+from .modular import ModInt
+
+class CurveContext(object):
+    """
+    Constants of the twisted Edwards curve ax^2 + y^2 = 1 + dx^2y^2 over the
+    prime field p, as ModInts of that field (p itself is a ModInt).
+
+    Attributes:
+        - name, p, a, d, r, gx, gy: the curve parameters
+        - zero, one, two: small constants
+        - d2: 2d (extended coordinates addition)
+        - sqrt_m1: a square root of -1, or None if -1 is not a square
+        - exp_p38, exp_p58: the exponents (p + 3)/8 and (p - 5)/8 of the
+          square root when p = 5 (mod 8), None otherwise
+        - a24: (A + 2)/4 for the birationally equivalent Montgomery curve
+          By^2 = x^3 + Ax^2 + x, i.e. a/(a - d)
+        - tables: the fixed-base tables of every coordinate system (see
+          table_cache)
+        - factory: the module-level function memoizing this context, if any
+    """
+
+    def __init__(self, name, p, d, a, r, gx, gy, factory=None):
+        P = p.v
+        self.name = name
+        self.p = p
+        self.a = a
+        self.d = d
+        self.r = r
+        self.gx = gx
+        self.gy = gy
+        self.factory = factory
+
+        self.zero = ModInt(p, 0)
+        self.one = ModInt(p, 1)
+        self.two = ModInt(p, 2)
+        self.d2 = ModInt(p).add(d, d)
+        self.exp_p38 = self.exp_p58 = self.sqrt_m1 = None
+        if P % 8 == 5:
+            self.exp_p38 = ModInt(p, (P + 3)//8)
+            self.exp_p58 = ModInt(p, (P - 5)//8)
+            self.sqrt_m1 = ModInt(p).exp(self.two, ModInt(p, (P - 1)//4))
+        elif P % 4 == 1:
+            self.sqrt_m1 = ModInt(p).sqrt(ModInt(p, P - 1))
+
+        self.a24 = ModInt(p).div(a, ModInt(p).sub(a, d))
+        self.tables = {}
+
+    def table_cache(self, curve):
+        """
+        Returns the dictionary caching the fixed-base tables of curve's
+        coordinate system; curve objects of the same system share it.
+        """
+        return self.tables.setdefault(type(curve), {})
+
+    def __reduce__(self):
+        """
+        Memoized contexts are pickled by reference to their factory, so that
+        another process uses (and fills) its own; others without tables.
+        """
+        if self.factory is not None:
+            return (self.factory, ())
+        state = dict(self.__dict__)
+        state['tables'] = {}
+        return (_new, (), state)
+
+def _new():
+    return CurveContext.__new__(CurveContext)
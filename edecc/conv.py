@@ -1,10 +1,5 @@
-import edwards
-import proj
-import inv
-import mont
-import extended
-import xz
-from modular import ModInt
+# The coordinate modules are imported by the conversions that need them.
+from .modular import ModInt
 
 def pp_to_ep(curve, a):
         """
@@ -15,6 +10,7 @@ def pp_to_ep(curve, a):
             (a[1] * inverse(a[2], self.p)) % self.p)
 
 def ep_to_pp(curve, a):
+    from . import proj
     return proj.projEdwardsPoint(a.c, a.x, a.y, a.c.one)
 
 def pp_to_ip(curve, a):
@@ -47,6 +43,7 @@ def ep_to_ip(c, a):
         return invEdwardsPoint(c, c.zero, c.one, c.zero)
     else:
         z = ModInt(p=c.p)
+        from . import inv
         return inv.invEdwardsPoint(a.c, a.y, a.x, z.mul(a.y, a.x))
 
 def ip_to_ep(curve, a):
@@ -80,6 +77,7 @@ def exp_to_ep(a):
 
     t1 = ModInt(p=a.c.p); t2 = ModInt(p=a.c.p)
     assert t1.mul(x, y).equal(t2.div(T, Z))
+    from . import edwards
     return edwards.EdwardsPoint(a.c, x, y)
 
 
@@ -121,6 +119,7 @@ def mp_to_xz(a):
     XZ (Montgomery) coordinates
     """
     print("p?", a.c.p)
+    from . import xz
     return xz.xzEdwardsPoint(a.c, a.x, a.c.one)
 
 def mc_to_tc(c):
@@ -148,6 +147,7 @@ def xz_to_mp(a):
     x.div(a.x, a.z)
     y = ModInt(p=a.c.p)
     y = a.yrecover(x)
+    from . import mont
     return mont.montEdwardsPoint(a.c, x, y)
 
 def xz_to_mp(a):
@@ -158,6 +158,7 @@ def xz_to_mp(a):
     x = ModInt(p=a.c.p)
     x.div(a.x, a.z)
     y = ModInt(p=a.c.p)
+    from . import mont
     return mont.montEdwardsPoint(a.c, x, a.yrecover(x))
 
 def to_tp(self, a):
@@ -1,4 +1,4 @@
-from modular import ModInt
+from .modular import ModInt
 
 class Curve(Group):
     """
@@ -1,6 +1,15 @@
-from mont import montEdwardsCurve
-from modular import ModInt
-from ed25519 import ed25519
+"""
+Curve25519: the Montgomery curve and the X25519 function of RFC 7748.
+"""
+
+from .mont import montEdwardsCurve
+from .modular import ModInt, inverse
+from .scalar import Scalar
+from .ed25519 import ed25519, context
+
+size = 32 # bytes of scalars and u-coordinates
+
+_group = None
 
 def curve25519():
     """
@@ -23,4 +32,82 @@ def curve25519():
     r = ModInt(p, 7237005577332262213973186563042994240857116359379907606001950938285454250989)
     gx = ModInt(p, 9)
     gy = ModInt(p, 14781619447589544791020593568409986887264606134616475288964881837755586237401)
-    return montEdwardsCurve(A, B, p, r, gx, gy, ed25519())
\ No newline at end of file
+    return montEdwardsCurve(A, B, p, r, gx, gy, ed25519())
+
+def _clamp(k):
+    """
+    The X25519 scalar of the 32 bytes k: the three low bits cleared, bit
+    255 cleared and bit 254 set.
+    """
+    if len(k) != size:
+        raise ValueError("X25519 scalars must be %d bytes" % size)
+    n = int.from_bytes(k, 'little')
+    return (n & ~7 & ((1 << 255) - 1)) | (1 << 254)
+
+def _encode(x, z, p):
+    """
+    The 32-byte little-endian u = x/z, 0 for the point at infinity (z = 0).
+    """
+    if z % p == 0:
+        return bytes(size)
+    return int(x * inverse(z, p) % p).to_bytes(size, 'little')
+
+def x25519(k, u):
+    """
+    X25519 (RFC 7748 section 5): the u-coordinate of [k]P for the clamped
+    scalar k and the point P of u-coordinate u, both 32 bytes, computed with
+    the Montgomery ladder on x/z coordinates. The top bit of u is ignored
+    and non-canonical values are reduced, as the RFC requires; u need not be
+    on the curve (points of the twist are handled by the same ladder).
+    The ladder branches on the scalar bits, so it is not constant time.
+    """
+    if len(u) != size:
+        raise ValueError("X25519 u-coordinates must be %d bytes" % size)
+    c = context()
+    p = c.p.v
+    a24 = c.a24.v # (A + 2)/4 = 121666
+    n = _clamp(k)
+    x1 = (int.from_bytes(u, 'little') & ((1 << 255) - 1)) % p
+    x2, z2, x3, z3 = 1, 0, x1, 1
+    swap = 0
+    for t in range(254, -1, -1):
+        bit = (n >> t) & 1
+        if swap ^ bit:
+            x2, x3, z2, z3 = x3, x2, z3, z2
+        swap = bit
+        A = x2 + z2
+        AA = A * A % p
+        B = x2 - z2
+        BB = B * B % p
+        E = AA - BB
+        C = x3 + z3
+        D = x3 - z3
+        DA = D * A % p
+        CB = C * B % p
+        x3 = (DA + CB) * (DA + CB) % p
+        z3 = x1 * (DA - CB) * (DA - CB) % p
+        x2 = AA * BB % p
+        z2 = E * (BB + a24 * E) % p
+    if swap:
+        x2, z2 = x3, z3
+    return _encode(x2, z2, p)
+
+def x25519_base(k, group=None):
+    """
+    X25519 of k and the base point u = 9, computed on the birationally
+    equivalent Ed25519 (in group's coordinates, extended by default) with
+    its fixed-base table: [k]B = (x, y) maps to u = (1 + y)/(1 - y). B has
+    order r, so k is reduced modulo r first.
+    """
+    global _group
+    if group is None:
+        if _group is None:
+            from .extended import extEdwardsCurve
+            _group = extEdwardsCurve(ed25519())
+        group = _group
+    Q = group.point().multiply_fixed(group.base_table(),
+                                     Scalar(group.r, _clamp(k) % group.r.v))
+    ed = Q.to_ep(Q)
+    p = group.p.v
+    one = group.one.v
+    return _encode(one + ed.y.v, one - ed.y.v, p)
@@ -0,0 +1,197 @@
+"""
+Baby-step giant-step discrete logarithms for small exponents, as needed to
+decrypt exponential ElGamal ciphertexts ([m]G for a bounded message m).
+"""
+
+import mmap
+import os
+import struct
+from array import array
+from bisect import bisect_left
+from .modular import ModInt
+
+magic = b'EDDLOG\x00\x01'
+header = struct.Struct('>8sIIQQ') # magic, bits, baby_bits, count, curve tag
+block = 256 # giant steps normalized per shared inversion
+default_bits = 32 # messages of the shared tables lie in [0, 2^default_bits)
+
+# entry layout: y fingerprint (40 bits) | sign of x (1 bit) | j (23 bits)
+fp_bits = 40
+j_bits = 23
+
+_tables = {}
+
+def table(group, bits=default_bits, baby_bits=16, path=None):
+    """
+    Returns the shared (lazily built) table for group and message size.
+    Tables are shared by the curve objects of one curve (context) and
+    coordinate system.
+    """
+    key = (type(group), getattr(group, 'context', group), bits, baby_bits, path)
+    if key not in _tables:
+        _tables[key] = DlogTable(group, bits, baby_bits, path)
+    return _tables[key]
+
+class DlogTable(object):
+    """
+    Solves M = [m]G for 0 <= m < 2^bits by baby-step giant-step.
+
+    The baby steps [j]G, 0 <= j <= 2^baby_bits, are stored as a sorted array
+    of 64-bit entries packing a fingerprint of the affine y-coordinate, the
+    parity of x and j. Since -P has the same y as P, each entry matches both
+    [j]G and [-j]G, so the giant stride covers 2^(baby_bits + 1) + 1 values
+    and only 2^(bits - baby_bits - 1) giant steps are needed in the worst
+    case. Giant steps are normalized in blocks with one shared inversion.
+
+    The array is built on first use, or memory-mapped from path when that
+    file exists and matches the curve and parameters (and written there
+    after a build otherwise).
+
+    Attributes:
+        group (Group): curve the logarithms are taken on.
+        bits (int): messages lie in [0, 2^bits).
+        baby_bits (int): log2 of the number of baby steps.
+        path (str): optional file backing the table.
+    """
+
+    def __init__(self, group, bits=default_bits, baby_bits=16, path=None):
+        if baby_bits > j_bits - 1:
+            raise ValueError("baby_bits must be at most %d" % (j_bits - 1))
+        self.group = group
+        self.bits = bits
+        self.baby_bits = baby_bits
+        self.path = path
+        self.entries = None
+        self._mmap = None
+        self._steps = None
+
+    def _entry(self, ed, j):
+        P = self.group.p.v
+        fp = (ed.y.v % P) & ((1 << fp_bits) - 1)
+        return (fp << (j_bits + 1)) | (((ed.x.v % P) & 1) << j_bits) | j
+
+    def _tag(self):
+        """
+        Identifies the curve the table was built for (low bits of the
+        generator's y-coordinate).
+        """
+        base = self.group.c.base
+        return (base.y.v % self.group.p.v) & 0xffffffffffffffff
+
+    def load(self):
+        """
+        Makes the baby-step array available, loading or building it.
+        """
+        if self.entries is not None:
+            return self
+        if self.path is not None and os.path.exists(self.path):
+            with open(self.path, 'rb') as f:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            fields = header.unpack_from(mm) if len(mm) >= header.size else None
+            count = (1 << self.baby_bits) + 1
+            if fields == (magic, self.bits, self.baby_bits, count, self._tag()) \
+                    and len(mm) == header.size + 8 * count:
+                self._mmap = mm
+                self.entries = memoryview(mm)[header.size:].cast('Q')
+                return self
+            mm.close()
+        self.build()
+        if self.path is not None:
+            self.save(self.path)
+        return self
+
+    def build(self):
+        """
+        Computes and sorts the baby steps [0..2^baby_bits]G.
+        """
+        g = self.group
+        G = g.point().generator()
+        P = g.point().identity()
+        entries = array('Q')
+        j = 0
+        count = (1 << self.baby_bits) + 1
+        while j < count:
+            pts = []
+            for i in range(min(block, count - j)):
+                pts.append(g.point().set(P))
+                P.add(P, G)
+            for ed in g.batch_to_ep(pts):
+                entries.append(self._entry(ed, j))
+                j += 1
+        self.entries = array('Q', sorted(entries))
+        return self
+
+    def save(self, path):
+        """
+        Writes the table to path (header followed by the raw entries),
+        atomically: the temporary file is named after the process, so that
+        processes saving the same table concurrently do not clobber it.
+        """
+        tmp = '%s.%d.tmp' % (path, os.getpid())
+        try:
+            with open(tmp, 'wb') as f:
+                f.write(header.pack(magic, self.bits, self.baby_bits,
+                                    len(self.entries), self._tag()))
+                f.write(array('Q', self.entries).tobytes())
+            os.replace(tmp, path)
+        finally:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+
+    def lookup(self, ed):
+        """
+        Returns the values e with [e]G = ed among the baby steps (normally
+        at most one; fingerprint collisions give extra candidates).
+        """
+        entry = self._entry(ed, 0)
+        fp, sign = entry >> (j_bits + 1), (entry >> j_bits) & 1
+        entries = self.entries
+        i = bisect_left(entries, fp << (j_bits + 1))
+        found = []
+        while i < len(entries) and entries[i] >> (j_bits + 1) == fp:
+            j = entries[i] & ((1 << j_bits) - 1)
+            found.append(j if (entries[i] >> j_bits) & 1 == sign else -j)
+            i += 1
+        return found
+
+    def log(self, M):
+        """
+        Returns m in [0, 2^bits) with M = [m]G; raises ValueError if there is
+        none.
+        """
+        self.load()
+        g = self.group
+        m = 1 << self.baby_bits
+        stride = 2 * m + 1
+        if self._steps is None:
+            self._steps = []
+            for n in (m, stride):
+                S = g.point().multiply_fixed(g.base_table(), ModInt(g.p, n))
+                self._steps.append(S.neg(S))
+        start, step = self._steps
+
+        # Q_i = M - [m + i * stride]G, so that Q_i = [e]G with |e| <= m
+        Q = g.point().add(M, start)
+        target = M.to_ep(M)
+
+        # blocks start small, as small messages are the common case
+        i, size = 0, 8
+        giants = ((1 << self.bits) + m) // stride + 1
+        while i < giants:
+            pts = []
+            for n in range(min(size, giants - i)):
+                pts.append(g.point().set(Q))
+                Q.add(Q, step)
+            size = min(2 * size, block)
+            for n, ed in enumerate(g.batch_to_ep(pts)):
+                for e in self.lookup(ed):
+                    cand = m + (i + n) * stride + e
+                    if 0 <= cand < 1 << self.bits and self._check(cand, target):
+                        return cand
+            i += len(pts)
+        raise ValueError("discrete log not in range")
+
+    def _check(self, cand, target):
+        g = self.group
+        R = g.point().multiply_fixed(g.base_table(), ModInt(g.p, cand))
+        return R.to_ep(R).equal(target)
@@ -2,13 +2,18 @@
 Weierstrauss curve base class.
 """
 
+import os
 import random
+from . import rng
 import math
+import time
 import unittest
-from numth import jacobi, sqrt, inverse
-from utils import string_to_long, b2l, l2b
+from ecdsa.numbertheory import jacobi, square_root_mod_prime, \
+    inverse_mod as inverse
+from .utils import string_to_long, b2l, l2b
+from .noncepool import NoncePool
 
-from elgamal import ElGamal, PublicKey, PrivateKey
+from .elgamal import ElGamal
 
 # parameter initialization for NIST-endorsed p256 (prime field)
 def curvep256():
@@ -28,6 +33,17 @@ def curvep256():
 
 # P-256 is represented in Weierstrauss formm, which has separate laws for
 # addition and doubling.
+#
+# Scalar multiplication is carried out in Jacobian coordinates, where the
+# triple (X, Y, Z) represents the affine point (X/Z^2, Y/Z^3) and any triple
+# with Z = 0 is the point at infinity. This avoids a modular inverse in every
+# addition and doubling; a single inverse is paid when converting the result
+# back to affine coordinates.
+
+window = 4 # width of the fixed window used by multiply
+wnaf_width = 5 # wNAF width for variable points (e.g. public keys)
+base_width = 8 # wNAF width for the fixed generator table
+max_tables = 1024 # number of per-point wNAF tables kept by the curve
 
 class EllipticCurve(ElGamal):
     def __init__(self, a, b, p, q, k=None, g_x=None, g_y=None):
@@ -38,6 +54,24 @@ class EllipticCurve(ElGamal):
         self.k = k
         self.g = (g_x, g_y)
 
+        # a = -3 (as in every NIST prime curve) enables the cheaper
+        # Jacobian doubling formula.
+        self.a_is_minus_3 = (a + 3) % p == 0
+
+        # byte length of a field element, and the square root exponent
+        # (p + 1)/4 used when p = 3 mod 4
+        self.size = (p.bit_length() + 7) // 8
+        self.sqrt_exp = (p + 1) // 4
+
+        # wNAF odd-multiple tables, keyed by affine point. The generator's
+        # table is built on first use; public keys are cached as they are
+        # used for verification (up to max_tables of them).
+        self.tables = {}
+
+        # Optional noncepool.NoncePool used by sign; nonces are computed
+        # inline when it is None or runs dry.
+        self.pool = None
+
     def zero(self):
         return 0
 
@@ -69,16 +103,17 @@ class EllipticCurve(ElGamal):
 
     def random_secret(self):
         """
-        Generates random secret in the range [1, self.p - 1]
+        Generates random secret in the range [1, self.q - 1] (a scalar modulo
+        the order of the generator), from the buffered CSPRNG pool (rng.pool).
         """
-        return random.randrange(1, self.p)
+        return rng.pool.secret(self.q)
 
     def random_element(self, secret=None):
         """
         Generates random element in the field f_q
         """
         if secret is None:
-            secret = self.random_secret
+            secret = self.random_secret()
         return self.multiply(self.generator(),secret)
 
     # Mathematical operations
@@ -91,19 +126,18 @@ class EllipticCurve(ElGamal):
         x_p, y_p = p
         x_q, y_q = q
 
-        if (x_p == x_q and y_p == -y_q) or (p == q and y_p == 0):
-            return (0,0)
-        elif (x_p == x_q and y_p == y_q):
-            return self.double(p)
-        elif p == (0,0):
+        if p == (0,0):
             return q
         elif q == (0,0):
             return p
+        elif x_p == x_q and (y_p + y_q) % self.p == 0:
+            return (0,0)
+        elif x_p == x_q:
+            return self.double(p)
 
         s = ((y_q - y_p) * inverse(x_q - x_p, self.p)) % self.p
         x_r = (s**2 - x_p - x_q) % self.p
         y_r = (s * (x_p - x_r) - y_p) % self.p
-        assert(self.is_element((x_r, y_r)))
         return (x_r, y_r)
 
     def double(self, p):
@@ -111,7 +145,7 @@ class EllipticCurve(ElGamal):
         Adding the same point to itself.
         """
         p_x, p_y = p
-        if p_x == 0 and p_y == 0:
+        if (p_x == 0 and p_y == 0) or p_y % self.p == 0:
             return (0,0)
         s = ((3 * p_x**2 + self.a) * inverse(2 * p_y, self.p)) % self.p
 
@@ -122,24 +156,304 @@ class EllipticCurve(ElGamal):
 
     def multiply(self, k, n):
         """
-        Uses repeated doubling method. n is an integer and k is an elliptic
-        curve point. Optimized versions of multiply to be implemented.
+        Fixed-window scalar multiplication in Jacobian coordinates.
+        n is an integer and k is an elliptic curve point; only the final
+        result is converted back to affine coordinates.
         """
-        db = bin(n)
-        T = self.identity()
-        lendb = len(db)
-        for i in range(len(db)):
-            T = self.double(T)
-            if db[i] == str(1):
-                T = self.add(T, k)
+        T = self.to_affine(self.multiply_jacobian(self.to_jacobian(k), n))
         assert(self.is_element(T))
         return T
 
+    # Jacobian coordinates
+
+    def to_jacobian(self, a):
+        """
+        Lifts the affine point a to Jacobian coordinates (x, y, 1).
+        """
+        if a == self.identity():
+            return (1, 1, 0)
+        return (a[0] % self.p, a[1] % self.p, 1)
+
+    def to_affine(self, a):
+        """
+        Converts a from Jacobian coordinates to an affine point:
+        (X, Y, Z) --> (X/Z^2, Y/Z^3). Costs one modular inverse.
+        """
+        X, Y, Z = a
+        P = self.p
+        if Z % P == 0:
+            return self.identity()
+        z_inv = inverse(Z, P)
+        zz_inv = (z_inv * z_inv) % P
+        return ((X * zz_inv) % P, (Y * zz_inv * z_inv) % P)
+
+    def double_jacobian(self, a):
+        """
+        Doubles a, expressed in Jacobian coordinates.
+        Computational cost: 3M + 5S (4M + 4S with a = -3, since
+        3X^2 + aZ^4 = 3(X - Z^2)(X + Z^2)), "dbl-2001-b".
+        """
+        X, Y, Z = a
+        P = self.p
+        if Z == 0 or Y == 0:
+            return (1, 1, 0)
+
+        ZZ = (Z * Z) % P
+        YY = (Y * Y) % P
+        S = (4 * X * YY) % P
+        if self.a_is_minus_3:
+            M = (3 * (X - ZZ) * (X + ZZ)) % P
+        else:
+            M = (3 * X * X + self.a * ZZ * ZZ) % P
+
+        X_r = (M * M - 2 * S) % P
+        Y_r = (M * (S - X_r) - 8 * YY * YY) % P
+        Z_r = (2 * Y * Z) % P
+        return (X_r, Y_r, Z_r)
+
+    def add_jacobian(self, a, b):
+        """
+        Adds a and b, both expressed in Jacobian coordinates.
+        Computational cost: 11M + 5S, "add-2007-bl" (without the doubled
+        terms); 7M + 4S when b is affine (Z = 1).
+        """
+        X1, Y1, Z1 = a
+        X2, Y2, Z2 = b
+        P = self.p
+        if Z1 == 0:
+            return b
+        if Z2 == 0:
+            return a
+
+        Z1Z1 = (Z1 * Z1) % P
+        U2 = (X2 * Z1Z1) % P
+        S2 = (Y2 * Z1 * Z1Z1) % P
+        if Z2 == 1:
+            U1, S1 = X1, Y1
+        else:
+            Z2Z2 = (Z2 * Z2) % P
+            U1 = (X1 * Z2Z2) % P
+            S1 = (Y1 * Z2 * Z2Z2) % P
+
+        H = (U2 - U1) % P
+        R = (S2 - S1) % P
+        if H == 0:
+            if R == 0:
+                return self.double_jacobian(a)
+            return (1, 1, 0)
+
+        HH = (H * H) % P
+        HHH = (H * HH) % P
+        V = (U1 * HH) % P
+        X_r = (R * R - HHH - 2 * V) % P
+        Y_r = (R * (V - X_r) - S1 * HHH) % P
+        Z_r = (Z1 * H) % P if Z2 == 1 else (Z1 * Z2 * H) % P
+        return (X_r, Y_r, Z_r)
+
+    def multiply_jacobian(self, a, n):
+        """
+        Computes n * a for a in Jacobian coordinates with a fixed window of
+        `window` bits: [0..2^w - 1] * a is precomputed, after which each
+        window costs w doublings and at most one addition.
+        """
+        table = [(1, 1, 0), a]
+        for i in range(2, 1 << window):
+            table.append(self.add_jacobian(table[-1], a))
+
+        mask = (1 << window) - 1
+        digits = []
+        while n > 0:
+            digits.append(n & mask)
+            n >>= window
+
+        T = (1, 1, 0)
+        for d in reversed(digits):
+            for i in range(window):
+                T = self.double_jacobian(T)
+            if d:
+                T = self.add_jacobian(T, table[d])
+        return T
+
+    def to_affine_many(self, points):
+        """
+        Converts a list of Jacobian points to affine coordinates with a
+        single modular inverse (Montgomery's simultaneous inversion trick):
+        3M per point instead of one inverse per point.
+        """
+        P = self.p
+        prods = []
+        acc = 1
+        for X, Y, Z in points:
+            prods.append(acc)
+            if Z % P != 0:
+                acc = (acc * Z) % P
+
+        acc_inv = inverse(acc, P)
+        affine = [None] * len(points)
+        for i in reversed(range(len(points))):
+            X, Y, Z = points[i]
+            if Z % P == 0:
+                affine[i] = self.identity()
+                continue
+            z_inv = (acc_inv * prods[i]) % P
+            acc_inv = (acc_inv * Z) % P
+            zz_inv = (z_inv * z_inv) % P
+            affine[i] = ((X * zz_inv) % P, (Y * zz_inv * z_inv) % P)
+        return affine
+
+    def wnaf(self, n, w):
+        """
+        Width-w non-adjacent form of n, least significant digit first.
+        Each nonzero digit is odd and lies in (-2^(w-1), 2^(w-1)), and any
+        w consecutive digits contain at most one nonzero digit.
+        """
+        digits = []
+        while n > 0:
+            if n & 1:
+                d = n & ((1 << w) - 1)
+                if d >= 1 << (w - 1):
+                    d -= 1 << w
+                n -= d
+            else:
+                d = 0
+            digits.append(d)
+            n >>= 1
+        return digits
+
+    def precompute(self, a, w=wnaf_width):
+        """
+        Returns the table of odd multiples [1a, 3a, ..., (2^(w-1) - 1)a] of the
+        affine point a, in affine coordinates so that it can be used with
+        mixed additions. Tables are cached on the curve, so repeated
+        verifications under the same public key reuse them.
+        """
+        if a in self.tables:
+            return self.tables[a]
+
+        A = self.to_jacobian(a)
+        A2 = self.double_jacobian(A)
+        table = [A]
+        for i in range(1, 1 << (w - 2)):
+            table.append(self.add_jacobian(table[-1], A2))
+        table = (w, self.to_affine_many(table))
+        if a == self.identity():
+            table = (w, [])
+
+        if len(self.tables) >= max_tables:
+            # evict the oldest table that isn't the generator's
+            for key in self.tables:
+                if key != self.g:
+                    del self.tables[key]
+                    break
+        self.tables[a] = table
+        return table
+
+    def multiply_joint_jacobian(self, a, n, b, m):
+        """
+        Computes n * a + m * b (Shamir's trick) by interleaving the wNAF
+        expansions of n and m: both products share a single chain of
+        doublings, and each nonzero digit costs one mixed addition from the
+        points' (cached) odd-multiple tables. The generator uses a wider
+        table than other points.
+        """
+        P = self.p
+        w_a, t_a = self.precompute(a, base_width if a == self.g else wnaf_width)
+        w_b, t_b = self.precompute(b, base_width if b == self.g else wnaf_width)
+        d_a = self.wnaf(n, w_a)
+        d_b = self.wnaf(m, w_b)
+
+        T = (1, 1, 0)
+        for i in reversed(range(max(len(d_a), len(d_b)))):
+            T = self.double_jacobian(T)
+            for digits, table in ((d_a, t_a), (d_b, t_b)):
+                if i >= len(digits) or digits[i] == 0 or not table:
+                    continue
+                x, y = table[abs(digits[i]) >> 1]
+                if digits[i] < 0:
+                    y = P - y
+                T = self.add_jacobian(T, (x, y, 1))
+        return T
+
     def bytes(self, a):
-        return long_to_bytes(a)
+        return l2b(a)
 
     def element(self, a):
-        return bytes_to_long(a)
+        return b2l(a)
+
+    # SEC1 point encoding (SEC 1 v2, sections 2.3.3 and 2.3.4)
+
+    def encode_point(self, a, compressed=True):
+        """
+        Encodes the affine point a as an octet string: 0x02 or 0x03 (the
+        parity of y) followed by x when compressed, 0x04 || x || y otherwise.
+        The point at infinity is the single octet 0x00.
+        """
+        if a == self.identity():
+            return b'\x00'
+        x, y = a[0] % self.p, a[1] % self.p
+        if compressed:
+            return bytes([2 + (y & 1)]) + x.to_bytes(self.size, 'big')
+        return b'\x04' + x.to_bytes(self.size, 'big') + \
+            y.to_bytes(self.size, 'big')
+
+    def decode_point(self, data):
+        """
+        Decodes a SEC1 octet string (compressed or uncompressed) into an
+        affine point, checking that the point lies on the curve.
+        """
+        data = memoryview(data)
+        n = self.size
+        if len(data) == 1 and data[0] == 0:
+            return self.identity()
+        if len(data) == n + 1 and data[0] in (2, 3):
+            x = int.from_bytes(data[1:], 'big')
+            if x >= self.p:
+                raise ValueError("x-coordinate out of range")
+            y = self._solve_for_y(x)
+            if y is None:
+                raise ValueError("point is not on curve")
+            if y & 1 != data[0] & 1:
+                y = self.p - y
+            return (x, y)
+        if len(data) == 2 * n + 1 and data[0] == 4:
+            x = int.from_bytes(data[1:n + 1], 'big')
+            y = int.from_bytes(data[n + 1:], 'big')
+            if x >= self.p or y >= self.p or not self.is_element((x, y)):
+                raise ValueError("point is not on curve")
+            return (x, y)
+        raise ValueError("malformed point encoding")
+
+    def decode_points(self, data):
+        """
+        Decodes many SEC1 encoded points: either a sequence of encodings, or
+        a packed buffer of equal-length encodings (as produced by joining
+        encode_point outputs), which is sliced without copying.
+        """
+        if isinstance(data, (bytes, bytearray, memoryview)):
+            data = memoryview(data)
+            if len(data) == 0:
+                return []
+            width = self.size + 1 if data[0] in (2, 3) else 2 * self.size + 1
+            if len(data) % width != 0:
+                raise ValueError("packed buffer is not a multiple of %d" % width)
+            data = [data[i:i + width] for i in range(0, len(data), width)]
+        return [self.decode_point(d) for d in data]
+
+    def sqrt(self, a):
+        """
+        Returns a square root of a modulo p, or None if a is a non-residue.
+        When p = 3 mod 4 (as for P-256), this is the single exponentiation
+        a^((p + 1)/4); otherwise it falls back to Tonelli-Shanks.
+        """
+        a %= self.p
+        if self.p % 4 == 3:
+            y = pow(a, self.sqrt_exp, self.p)
+            return y if (y * y) % self.p == a else None
+        if a == 0:
+            return 0
+        if jacobi(a, self.p) != 1:
+            return None
+        return square_root_mod_prime(a, self.p)
 
     def encode(self, data):
         """
@@ -166,15 +480,21 @@ class EllipticCurve(ElGamal):
 
     def sign(self, secret, data):
         """
-        Executes ECDSA for data to be signed.
+        Executes ECDSA for data to be signed, taking the nonce from the
+        curve's nonce pool when one is attached.
         """
         s = 0
         e = self._hash(data, self.q - 1)
         while s == 0 or r == 0:
-            k = self.random_secret()
-            kG_x, _ = self.multiply(self.generator(), k)
-            r = kG_x
-            s = (inverse(k, self.q) * (e + (secret * r)) % self.q) % self.q
+            nonce = None if self.pool is None else self.pool.get()
+            if nonce is None:
+                k = self.random_secret()
+                kG_x, _ = self.multiply(self.generator(), k)
+                r = kG_x % self.q
+                k_inv = int(inverse(k, self.q))
+            else:
+                k, k_inv, r = nonce
+            s = (k_inv * (e + (secret * r)) % self.q) % self.q
         return (r, s)
 
     def verify(self, a, data, signature):
@@ -190,34 +510,80 @@ class EllipticCurve(ElGamal):
 
         u_1 = (e * w) % self.q
         u_2 = (r * w) % self.q
-        X_x, X_y = self.add(self.multiply(self.generator(), u_1), \
-            self.multiply(a, u_2))
+        X_x, X_y = self.to_affine(
+            self.multiply_joint_jacobian(self.generator(), u_1, a, u_2))
 
         if X_x == 0 and X_y == 0:
             return False
         return (X_x % self.q) == r
 
     def _solve_for_y(self, x):
+        """
+        Returns a y with y^2 = x^3 + ax + b, or None if there is no such y.
+        """
         tmp = (pow(x, 3, self.p) + self.a * x + self.b) % self.p
-        # test with jacobi symbol (determines if tmp is a quadratic residue)
-        if jacobi(tmp, self.p) == 1:
-            return square_root_mod_prime(tmp, self.p)
-        else:
-            return None
+        return self.sqrt(tmp)
+
+# NIST P-256 prime, p = 2^256 - 2^224 + 2^192 + 2^96 - 1
+P256 = pow(2, 256) - pow(2, 224) + pow(2, 192) + pow(2, 96) - 1
+
+def reduce_p256(x):
+    """
+    Solinas (generalized Mersenne) reduction modulo the P-256 prime, as in
+    FIPS 186-4 D.2.3 and the NIST routines handbook.
+
+    x (< p^2) is split into sixteen 32-bit words c0..c15, which are
+    reassembled into 256-bit terms and summed:
+        x = T + 2S1 + 2S2 + S3 + S4 - D1 - D2 - D3 - D4 (mod p)
+    The result is then brought into [0, p) with a few additions or
+    subtractions of p.
+
+    Only the baseline of test_reduce_p256: on CPython's integers the ~70
+    word operations cost more than one % p, which EllipticCurve uses.
+    """
+    c0, c1, c2, c3, c4, c5, c6, c7, c8, c9, c10, c11, c12, c13, c14, c15 = \
+        [(x >> (32 * i)) & 0xffffffff for i in range(16)]
+
+    t = x & (pow(2, 256) - 1)
+    s1 = _words(c15, c14, c13, c12, c11, 0, 0, 0)
+    s2 = _words(0, c15, c14, c13, c12, 0, 0, 0)
+    s3 = _words(c15, c14, 0, 0, 0, c10, c9, c8)
+    s4 = _words(c8, c13, c15, c14, c13, c11, c10, c9)
+    d1 = _words(c10, c8, 0, 0, 0, c13, c12, c11)
+    d2 = _words(c11, c9, 0, 0, c15, c14, c13, c12)
+    d3 = _words(c12, 0, c10, c9, c8, c15, c14, c13)
+    d4 = _words(c13, 0, c11, c10, c9, 0, c15, c14)
+
+    r = t + 2 * (s1 + s2) + s3 + s4 - d1 - d2 - d3 - d4
+    while r < 0:
+        r += P256
+    while r >= P256:
+        r -= P256
+    return r
+
+def _words(a7, a6, a5, a4, a3, a2, a1, a0):
+    """
+    Assembles eight 32-bit words (most significant first) into an integer.
+    """
+    return (a7 << 224) | (a6 << 192) | (a5 << 160) | (a4 << 128) | \
+        (a3 << 96) | (a2 << 64) | (a1 << 32) | a0
 
 class Test(unittest.TestCase):
     def setUp(self):
         self.group = curvep256()
-        self.x0 = PrivateKey(self.group)
-        self.x1 = PrivateKey(self.group)
-        self.y0 = self.x0.public_key()
-        self.y1 = self.x1.public_key()
+        # The ElGamal key classes expect point objects, so the tuple-based
+        # P-256 keys are built directly from the curve.
+        g = self.group
+        self.x0 = g.random_secret()
+        self.x1 = g.random_secret()
+        self.y0 = g.multiply(g.generator(), self.x0)
+        self.y1 = g.multiply(g.generator(), self.x1)
         self.S, self.T = self.test_operations_basic()
 
     def test_is_element(self):
         self.assertTrue(self.group.is_element((self.group.g)))
-        self.assertTrue(self.group.is_element((self.x1.element)))
-        self.assertTrue(self.group.is_element((self.x0.element)))
+        self.assertTrue(self.group.is_element((self.y1)))
+        self.assertTrue(self.group.is_element((self.y0)))
         for i in range(100):
             self.assertTrue(self.group.is_element((self.group.random_element())))
 
@@ -282,6 +648,157 @@ class Test(unittest.TestCase):
         R_j = self.group.add(self.group.multiply(self.S, d), \
             self.group.multiply(self.T, e))
         self.assertEqual(R_j, (x_j, y_j))
+        R_j = self.group.to_affine(
+            self.group.multiply_joint_jacobian(self.S, d, self.T, e))
+        self.assertEqual(R_j, (x_j, y_j))
+
+    def test_jacobian(self):
+        g = self.group
+        G = g.generator()
+        self.assertEqual(g.multiply(G, 0), g.identity())
+        self.assertEqual(g.multiply(G, 1), G)
+        self.assertEqual(g.multiply(G, g.order()), g.identity())
+        self.assertEqual(g.to_affine(g.double_jacobian(g.to_jacobian(self.S))),
+            g.double(self.S))
+        self.assertEqual(g.to_affine(g.add_jacobian(g.to_jacobian(self.S),
+            g.to_jacobian(self.T))), g.add(self.S, self.T))
+        for i in range(10):
+            k = g.random_secret()
+            # affine double-and-add reference
+            R = g.identity()
+            for bit in bin(k)[2:]:
+                R = g.double(R)
+                if bit == '1':
+                    R = g.add(R, G)
+            self.assertEqual(g.multiply(G, k), R)
+
+    def test_wnaf(self):
+        g = self.group
+        for w in (2, wnaf_width, base_width):
+            for i in range(20):
+                n = g.random_secret()
+                digits = g.wnaf(n, w)
+                self.assertEqual(sum(d << i for i, d in enumerate(digits)), n)
+                for j, d in enumerate(digits):
+                    if d != 0:
+                        self.assertTrue(d % 2 == 1 and abs(d) < 1 << (w - 1))
+                        self.assertFalse(any(digits[j+1:j+w]))
+
+    def test_joint_multiply(self):
+        g = self.group
+        G = g.generator()
+        for i in range(10):
+            n, m = g.random_secret(), g.random_secret()
+            self.assertEqual(
+                g.to_affine(g.multiply_joint_jacobian(G, n, self.y0, m)),
+                g.add(g.multiply(G, n), g.multiply(self.y0, m)))
+        self.assertEqual(
+            g.to_affine(g.multiply_joint_jacobian(G, 0, self.y0, 0)),
+            g.identity())
+        self.assertEqual(
+            g.to_affine(g.multiply_joint_jacobian(G, 5, g.identity(), 7)),
+            g.multiply(G, 5))
+
+        # tables are built once and reused across verifications
+        table = g.precompute(self.y0)
+        msg = b"Example of ECDSA with P-256"
+        self.assertTrue(g.verify(self.y0, msg, g.sign(self.x0, msg)))
+        self.assertIs(g.precompute(self.y0), table)
+        self.assertEqual(g.precompute(G)[0], base_width)
+
+    def test_ecdsa_timing(self):
+        g = self.group
+        n = 20
+        msg = b"Example of ECDSA with P-256"
+        times1, times2 = 0, 0
+        print("\nTesting P-256 ECDSA signing/verification times: ")
+        for i in range(n):
+            t0 = time.time()
+            signature = g.sign(self.x0, msg)
+            times1 += time.time() - t0
+            t1 = time.time()
+            self.assertTrue(g.verify(self.y0, msg, signature))
+            times2 += time.time() - t1
+        print("avgtime: signing: ", times1/n, "verification: ", times2/n)
+
+    def test_reduce_p256(self):
+        g = self.group
+        self.assertEqual(g.p, P256)
+        for x in (0, 1, g.p - 1, g.p, g.p + 1, (g.p - 1) * (g.p - 1)):
+            self.assertEqual(reduce_p256(x), x % g.p)
+        for i in range(1000):
+            x = random.randrange(g.p) * random.randrange(g.p)
+            self.assertEqual(reduce_p256(x), x % g.p)
+
+        n = 10000
+        x = random.randrange(g.p) * random.randrange(g.p)
+        print("\nTesting P-256 reduction times: ")
+        t0 = time.time()
+        for i in range(n):
+            x % g.p
+        time1 = (time.time() - t0)/n
+        t1 = time.time()
+        for i in range(n):
+            reduce_p256(x)
+        time2 = (time.time() - t1)/n
+        print("avgtime: generic %: ", time1, "solinas: ", time2)
+
+    def test_nonce_pool(self):
+        g = self.group
+        msg = b"Example of ECDSA with P-256"
+        pool = NoncePool(g, size=8, low=4, batch=4, start=False)
+        pool.fill()
+        self.assertEqual(len(pool), 8)
+        for k, k_inv, r in list(pool._nonces):
+            self.assertEqual((k * k_inv) % g.q, 1)
+            self.assertEqual(g.multiply(g.generator(), k)[0] % g.q, r)
+
+        g.pool = pool
+        try:
+            for i in range(10):
+                self.assertTrue(g.verify(self.y0, msg, g.sign(self.x0, msg)))
+            stats = pool.stats()
+            self.assertEqual((stats["hits"], stats["misses"]), (8, 2))
+            self.assertEqual(stats["occupancy"], 0)
+
+            pool.start()
+            for i in range(100):
+                if len(pool) == pool.size:
+                    break
+                time.sleep(0.05)
+            self.assertTrue(pool.low < len(pool) <= pool.size)
+            self.assertTrue(g.verify(self.y0, msg, g.sign(self.x0, msg)))
+        finally:
+            pool.stop()
+            g.pool = None
+
+    def test_nonce_pool_fork(self):
+        """
+        A forked child does not sign with the nonces pooled by its parent.
+        """
+        g = self.group
+        msg = b"Example of ECDSA with P-256"
+        pool = NoncePool(g, size=8, low=4, batch=4, start=False)
+        pool.fill()
+        g.pool = pool
+        try:
+            rfd, wfd = os.pipe()
+            pid = os.fork()
+            if pid == 0:
+                r, s = g.sign(self.x0, msg)
+                os.write(wfd, r.to_bytes(32, 'big') + bytes([len(pool)]))
+                os._exit(0)
+            os.waitpid(pid, 0)
+            child = os.read(rfd, 33)
+            os.close(rfd)
+            os.close(wfd)
+            r, s = g.sign(self.x0, msg)
+            self.assertEqual(type(s), int)
+            self.assertNotEqual(child[:32], r.to_bytes(32, 'big'))
+            self.assertEqual(child[32], 0)
+            self.assertEqual(len(pool), 7)
+        finally:
+            g.pool = None
 
     def test_addition_random(self):
         for i in range(50):
@@ -305,17 +822,47 @@ class Test(unittest.TestCase):
         self.assertEqual(g.decode(g.encode(msg2)), msg2)
         self.assertEqual(g.decode(g.encode(msg3)), msg3)
 
+    def test_sec1(self):
+        g = self.group
+        G = g.generator()
+        self.assertEqual(g.encode_point(G), bytes.fromhex("036b17d1f2e12c4247"
+            "f8bce6e563a440f277037d812deb33a0f4a13945d898c296"))
+        self.assertEqual(g.encode_point(G, compressed=False)[33:],
+            bytes.fromhex("4fe342e2fe1a7f9b8ee7eb4a7c0f9e162bce33576b315ececb"
+            "b6406837bf51f5"))
+        self.assertEqual(g.decode_point(g.encode_point(g.identity())),
+            g.identity())
+
+        points = [g.random_element() for i in range(10)] + [self.S, self.T]
+        for P in points:
+            self.assertEqual(g.decode_point(g.encode_point(P)), P)
+            self.assertEqual(g.decode_point(g.encode_point(P, False)), P)
+        packed = b"".join(g.encode_point(P) for P in points)
+        self.assertEqual(g.decode_points(packed), points)
+        self.assertEqual(g.decode_points(
+            [g.encode_point(P, False) for P in points]), points)
+
+        bad = bytearray(g.encode_point(G, compressed=False))
+        bad[-1] ^= 1
+        self.assertRaises(ValueError, g.decode_point, bytes(bad))
+        self.assertRaises(ValueError, g.decode_point, b"\x05" + bytes(32))
+        self.assertRaises(ValueError, g.decode_points, packed[:-1])
+
+        n = 100
+        t0 = time.time()
+        g.decode_points(packed * (n // len(points)))
+        print("\nTesting SEC1 decompression times: ")
+        print("avgtime: ", (time.time() - t0) / (n // len(points) * len(points)))
+
     def test_ecdsa(self):
         msg = b"Example of ECDSA with P-256"
         g = self.group
-        self.assertTrue(g.verify(self.y0.element, msg, \
-            g.sign(self.x0.secret, msg)))
-        self.assertFalse(g.verify(self.y1.element, msg, \
-            g.sign(self.x0.secret, msg)))
+        self.assertTrue(g.verify(self.y0, msg, g.sign(self.x0, msg)))
+        self.assertFalse(g.verify(self.y1, msg, g.sign(self.x0, msg)))
 
     def test_exchange(self):
-        self.assertEqual(self.x0.exchange(self.y1), self.y1.exchange(self.x0))
-        self.assertEqual(self.x1.exchange(self.y0), self.y0.exchange(self.x1))
+        g = self.group
+        self.assertEqual(g.multiply(self.y1, self.x0), g.multiply(self.y0, self.x1))
 
 if __name__ == "__main__":
     unittest.main()
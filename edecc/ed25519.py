@@ -1,19 +1,45 @@
-import edwards
-from utils import string_to_long
-from modular import ModInt
+from . import edwards
+from .utils import string_to_long
+from .modular import ModInt, backend, field
+from .context import CurveContext
 
-def ed25519():
-    """ Edwards Curve version of curve25519.
-    Base points obtained from
-    http://tools.ietf.org/html/draft-ladd-safecurves-04
+_context = None
+
+def new_context():
+    """
+    Computes the CurveContext of Ed25519, in the representation of the
+    current arithmetic backend.
     """
     prime = pow(2, 255) - 19
-    p = ModInt(prime, prime)
+    p = field(prime)
     d = ModInt(p)
     d.div(ModInt(p, -121665), ModInt(p, 121666))
     a = ModInt(p, -1)
-    r = ModInt(p, (pow(2, 252) + 27742317777372353535851937790883648493 % p.v))
+    r = ModInt(p, backend().mpz(pow(2, 252) + 27742317777372353535851937790883648493 % p.v))
     gx = ModInt(p, string_to_long("216936 d3cd6e 53fec0 a4e231 fdd6dc 5c692c c76095 25a7b2 c9562d 608f25 d51a"))
     gy = ModInt(p)
     gy.div(ModInt(p, 4), ModInt(p, 5))
-    return edwards.EdwardsCurve("Twisted Edwards w/ a = -1", p, d, a, r, gx, gy)
\ No newline at end of file
+    return CurveContext("Twisted Edwards w/ a = -1", p, d, a, r, gx, gy)
+
+def context():
+    """
+    The CurveContext of Ed25519, computed on first use.
+    """
+    global _context
+    if _context is None:
+        c = new_context()
+        c.factory = context
+        _context = c
+    return _context
+
+def ed25519(ctx=None):
+    """ Edwards Curve version of curve25519.
+    Base points obtained from
+    http://tools.ietf.org/html/draft-ladd-safecurves-04
+
+    The curve uses the memoized context unless another one (e.g. from
+    new_context) is given.
+    """
+    c = ctx or context()
+    return edwards.EdwardsCurve(c.name, c.p, c.d, c.a, c.r, ModInt(c.p, c.gx.v),
+                                ModInt(c.p, c.gy.v), c)
@@ -1,191 +1,420 @@
 """
 Performs ed25519, a variant of the ECDSA algorithm specifically
 for the Edwards curve ed25519, on Edwards public/private key pairs.
+Keys, messages and signatures are byte strings, encoded as in RFC 8032.
+Ed25519ph (the prehashed variant) signs the SHA-512 digest of the message
+instead, so that large messages can be signed in one streaming pass
+(Signer, Verifier).
 """
 
-from edwards import EdwardsCurve, EdwardsPoint
-from utils import *
-from modular import ModInt
+from hashlib import sha512
+from .edwards import EdwardsCurve, EdwardsPoint
+from .modular import ModInt
+from .scalar import Scalar
+from . import rng
 
 b = 256
+dom2 = b"SigEd25519 no Ed25519 collisions" # RFC 8032 domain separator
+cofactor = 8 # h: batch verification checks the equation multiplied by h
+z_bits = 128 # bits of the random coefficients of batch verification
 
 class edwardsPublicKey(EdwardsCurve):
     def __init__(self, group, element):
         self.group = group
         self.element = element
+        self.A = None
+        self.table = None
 
-    def _hash(self, msg):
+    def _hash(self, *parts):
         """
         Custom hash function for edDSA: public keys are 2b bits long.
-        Uses a cryptographically secure sha512 function.
+        Uses a cryptographically secure sha512 function over the
+        concatenation of parts, which are fed to it one by one (so a large
+        message is never copied).
         """
-        hasher = SHA512.new()
-        hasher.update(bytes(msg, encoding='utf-8'))
+        hasher = sha512()
+        for part in parts:
+            hasher.update(_bytes(part))
         return hasher.digest()
 
-    def sum_bits(self, bits):
+    def _Hint(self, *parts):
         """
-        Faster version of sum_bits_a
+        Hashes the concatenation of parts using the SHA512 method and reduces
+        the (2b)-bit little-endian digest to a scalar modulo r.
         """
-        return ''.join([chr(sum([bits[i * 8 + j] << j \
-                for j in range(8)])) for i in range(b//8)])
+        return Scalar(self.group.r).from_hash(self._hash(*parts))
 
-    def bit(self, hashed, i):
-        """
-        Given a (hashed) string h, return the value of the bit at index i.
-        """
-        hashed = str(hashed)
-        return (ord(hashed[i//8]) >> (i % 8)) & 1
-
-    def _Hint(self, m):
+    def _encodeint(self, y):
         """
-        Given a message m, hash it using the SHA512 method and convert that
-        value into its (2b) bit-array representation.
+        Returns the b/8-byte little-endian encoding of the integer or scalar y.
         """
-        h = self._hash(m)
-        return sum(pow(2, i, self.group.p.v) * self.bit(h, i) for i in range(2*b))
+        if isinstance(y, ModInt):
+            y = y.v
+        return y.to_bytes(b//8, 'little')
 
     def _decodeint(self, s):
         """
-        Assume int s has been encoded by the encodeint method above.
-        Converts from a 256-bit-array to a base-10 integer.
-        """
-        return sum(pow(2, i, self.group.p.v) * self.bit(s, i) for i in range(0, b))
-
-    def _decodepoint(self, s):
-        """
-        Given the bit-array representation s (actually the encoded y-coordinate
-        of some point), convert the first (b-1) bits into a base-10 integer,
-        recover x, and change the sign if necessary.
-        """
-        p = self.group.p
-        d = self.group.d
-        yy, xx, x, num, denom, test = ModInt(p), ModInt(p), ModInt(p), ModInt(p), ModInt(p), ModInt(p)
-
-        y = ModInt(p, sum(pow(2, i, p.v) * self.bit(s, i) for i in range(0, b-1)))
-        yy.mul(y, y)
-        num.sub(yy, self.group.one)
-        denom.add(denom.mul(yy, self.group.d), self.group.one)
-        xx.div(num, denom)
-        x.exp(xx, ModInt(p, ((p.v + 3)//8)))
-
-        if not (test.mul(x, x).sub(test, xx)).equal(self.group.zero):
-            I = ModInt(p)
-            I.exp(ModInt(p, 2), ModInt(p, (p.v-1)//4))
-            x.mul(x, I)
-        if x.v % 2 != 0:
-            x.sub(p, x)
-        if x.v & 1 != self.bit(s, b - 1):
-            x.sub(p, x)
-
-        P = self.group.point()
-        ed = self.group.c.point()
-        ed.x.set(x)
-        ed.y.set(y)
-        if not ed._on_curve():
-            raise Exception("decoding point that is not on curve")
-        return P.from_ep(ed)
+        Decodes a canonical scalar encoded by _encodeint (values >= r are
+        rejected).
+        """
+        return Scalar(self.group.r).from_bytes(s)
 
     def verify(self, m, s):
         """
         Verifies a message m using the edDSA algorithm.
-        Checks that R, A, and s values have been recreated correctly by
-        making another commitment (hashhing r, pk, and m together), as well as
-        checking that
-        sB = rB + H(Rpub, Apub, M)aB = R + H(Rpub, Apub, M)A.
+        Recomputes the commitment k = H(R, A, m) and checks that
+        sB - kA = R, by comparing the encoding of sB - kA with the R part of
+        the signature (so R is never decoded). s is the (R, S) pair returned
+        by sign, or its 64-byte concatenation.
+        """
+        return self._verify(m, s)
+
+    def precompute(self):
+        """
+        Builds the fixed-base table of the public key (once), after which
+        verification computes [k]A with table additions and no doublings.
+        Worth it for keys that verify many signatures.
+        """
+        if self.table is None:
+            if self.A is None:
+                self.A = self.group.decode_point(self.element)
+            self.table = self.group.fixed_table(self.A)
+        return self.table
+
+    def verify_prehashed(self, m, s, context=b''):
+        """
+        Verifies an Ed25519ph signature s of the message m (see
+        edwardsPrivateKey.sign_prehashed).
+        """
+        return self._verify(sha512(_bytes(m)).digest(), s, _dom(context))
+
+    def verifier(self, s, context=b''):
+        """
+        Returns a Verifier for an Ed25519ph signature s, to be fed the
+        message incrementally.
+        """
+        return Verifier(self, s, context)
+
+    def _verify(self, m, s, dom=b''):
+        """
+        Verification shared by Ed25519 (dom empty) and Ed25519ph (m is the
+        digest of the message, dom the domain separator).
         """
+        if len(s) == b//4:
+            s = (s[:b//8], s[b//8:])
         r, s = s
         pk = self.element
-        p = self.group.p
         if (len(r) + len(s)) != b//4:
             raise Exception("signature length is wrong")
         if len(pk) != b//8:
             raise Exception("public-key length is wrong")
-        R = self._decodepoint(r)
-        A = self._decodepoint(pk)
-        S = self._decodeint(s)
-        h = self._Hint("%s%s%s" % (r, pk, m))
-        # print("R", R.string())
-        # print("A", A.string())
-        # print("S", S)
-        # print("h", h)
-        elem1 = self.group.point()
-        return elem1.random_element(ModInt(p, 8*S)) == elem1.add(elem1.multiply(R, ModInt(p, 8)), elem1.multiply(A, ModInt(p, 8*h)))
+        try:
+            if self.A is None:
+                self.A = self.group.decode_point(pk)
+            S = self._decodeint(s)
+        except ValueError:
+            return False
+        h = self._Hint(dom, r, pk, m)
+
+        group = self.group
+        if self.table is not None:
+            kA = group.point().multiply_fixed(self.table, h)
+        else:
+            kA = group.point().multiply_window(self.A, h)
+        Q = group.point().multiply_fixed(group.base_table(), S)
+        Q.add(Q, kA.neg(kA))
+        return self.group.encode_point(Q) == bytes(r)
 
 class edwardsPrivateKey(edwardsPublicKey):
     def __init__(self, group, secret = None):
         """
-        Generates a random private/public key pair in the field f_q
-        Takes a secret (a random integer in the field)
+        Generates a private/public key pair from a 32-byte secret seed
+        (random if not given; an integer secret is encoded first).
+        The secret scalar a is the clamped first half of SHA512(seed), and
+        the second half is the prefix hashed into every nonce.
         """
         if secret is None:
-            secret = group.secret().v
-        h = str(self._hash(self._encodeint(secret)))
-        p = group.p.v
-        a_1 = pow(2, b-2, p)
-        a_2 = sum(pow(2, i, p) * self.bit(h, i) for i in range(3, b-2))
-        a = ModInt(p, a_1 + a_2)
-        P = group.point()
-        element = self._encodepoint(P.to_ep(P.random_element(a)))
+            secret = rng.pool.read(b//8)
+        elif isinstance(secret, int):
+            secret = self._encodeint(secret)
+        self.scalar, self.prefix = _expand(group, secret)
+
+        A = group.point().multiply_fixed(group.base_table(), self.scalar)
+        element = group.encode_point(A)
         edwardsPublicKey.__init__(self, group, element)
+        self.A = A
         self.secret = secret
 
-    def _encodeint(self, y):
+    def sign(self, m):
         """
-        Given an integer, returns a string of ascii characters representing y.
-        y is first converted to its (little-endian) bit-array representation.
-        (e.g. 4 --> [0, 0, 1, 0.....0] for array of size 256), which is
-        then converted to an ascii-string-literal representation.
+        Signs a message m using the edDSA algorithm. Described here:
+        http://ed25519.cr.yp.to/ed25519-20110926.pdf and in RFC 8032.
+
+        Args:
+            - (bytes or str) m, the message to be signed
+
+        Returns:
+            - (bytes) R, the encoding of rB, where the nonce r is the hash of
+            the key's prefix and m.
+            - (bytes) S, the encoding of r + H(R, A, m)a mod r.
         """
-        bits = [(y >> i) & 1 for i in range(b)]
-        return self.sum_bits(bits)
+        return self._sign(m)
 
-    def _encodepoint(self, P):
+    def sign_prehashed(self, m, context=b''):
         """
-        Given a point on the curve, returns a string of ascii characters that
-        represent the point.
-        First convert the y coordinate to its b - 1 bit-array representation,
-        with the last bit being the sign of the x coordinate.
-        It is then converted to an ascii-string-literal representation.
+        Signs m with Ed25519ph (RFC 8032 5.1): the message is hashed once
+        with SHA-512 and the digest is signed under the domain separator
+        dom2(1, context). m may be bytes or any buffer (bytearray, mmap,
+        memoryview), which is hashed in place.
         """
-        x, y = P.x.v, P.y.v
-        bits = [(y >> i) & 1 for i in range(b - 1)] + [x & 1]
-        return self.sum_bits(bits)
+        return self._sign(sha512(_bytes(m)).digest(), _dom(context))
 
-    def sign(self, m):
+    def signer(self, context=b''):
         """
-        Signs a message m using the edDSA algorithm. Described here:
-        http://ed25519.cr.yp.to/ed25519-20110926.pdf
+        Returns a Signer producing an Ed25519ph signature of a message fed
+        incrementally.
+        """
+        return Signer(self, context)
 
-        Args:
-            - (array) sk, the encoded version of the (int) private key
-            - (array) pk, the encoded version of the (int) public key
-            - (string) m, the message to be signed
+    def _sign(self, m, dom=b''):
+        """
+        Signing shared by Ed25519 (dom empty) and Ed25519ph (m is the digest
+        of the message, dom the domain separator).
+        """
+        group = self.group
+        r = self._Hint(dom, self.prefix, m)
+        R = group.point().multiply_fixed(group.base_table(), r)
+        R = group.encode_point(R)
+        S = Scalar(group.r).mul(self._Hint(dom, R, self.element, m), self.scalar)
+        S.add(S, r)
+        return (R, S.to_bytes())
 
-        Returns:
-            - (array) r, the encoded version of the point multiplied by the last
-            (b, 2b-1) bits of the bit-array determined by the hash of the
-            secret key.
-            - (array) s, the encoded version of the int determined by
-            calculating the commitment (hashing)
+    def sign_many(self, messages):
         """
-        p = self.group.p.v
-        pk = self.element
-        h = str(self._hash(self._encodeint(self.secret)))
-        a_1 = pow(2, b-2, p)
-        a_2 = sum(pow(2, i, p) * self.bit(h, i) for i in range(3, b-2))
-        a = a_1 + a_2
-        r = self._Hint(''.join([h[i] for i in range(b//8, b//4)]) + m)
-        R = self.group.point()
-        R = R.to_ep(R.random_element(ModInt(p, r)))
-        S = (r + self._Hint("%s%s%s" % (self._encodepoint(R), pk, m)) * a) % self.group.r.v
-        # print("a", a)
-        # print("r", r)
-        # print("R", R.string(), R._on_curve(), type(R), R.c.name)
-        # print("S",S)
-        return (self._encodepoint(R), self._encodeint(S))
+        Signs every message of messages, as sign does. All the nonces are
+        derived first, the [r]B products go through the fixed-base table and
+        the R points are normalized and encoded with one shared inversion
+        before the S values are computed. Returns the (R, S) pairs in the
+        order of messages.
+        """
+        group = self.group
+        table = group.base_table()
+        messages = [_bytes(m) for m in messages]
+        nonces = [self._Hint(self.prefix, m) for m in messages]
+        Rs = group.encode_points([group.point().multiply_fixed(table, r)
+                                  for r in nonces])
+        signatures = []
+        for m, r, R in zip(messages, nonces, Rs):
+            S = Scalar(group.r).mul(self._Hint(R, self.element, m), self.scalar)
+            S.add(S, r)
+            signatures.append((R, S.to_bytes()))
+        return signatures
 
     def public_key(self):
         return edwardsPublicKey(self.group, self.element)
 
+class Signer(object):
+    """
+    Incremental Ed25519ph signing: the message is fed in chunks with update,
+    and only its running SHA-512 state is kept, so arbitrarily large
+    messages are signed in constant memory.
+    """
+
+    def __init__(self, key, context=b''):
+        self.key = key
+        self.dom = _dom(context)
+        self.hasher = sha512()
+
+    def update(self, chunk):
+        self.hasher.update(_bytes(chunk))
+        return self
+
+    def sign(self):
+        """
+        Returns the Ed25519ph (R, S) signature of everything fed so far.
+        """
+        return self.key._sign(self.hasher.digest(), self.dom)
+
+class Verifier(object):
+    """
+    Incremental Ed25519ph verification of the signature s, the counterpart
+    of Signer.
+    """
+
+    def __init__(self, key, s, context=b''):
+        self.key = key
+        self.s = s
+        self.dom = _dom(context)
+        self.hasher = sha512()
+
+    def update(self, chunk):
+        self.hasher.update(_bytes(chunk))
+        return self
+
+    def verify(self):
+        """
+        Checks the signature against everything fed so far.
+        """
+        return self.key._verify(self.hasher.digest(), self.s, self.dom)
+
+def verify_batch(items):
+    """
+    Verifies the (key, m, s) triples of items (edwardsPublicKeys,
+    messages, signatures as for verify) with one randomized batch equation
+    per curve instead of one equation per signature:
+        [h]([sum z_i S_i]B - sum [z_i]R_i - sum [z_i k_i]A_i) = 0
+    for random z_i of z_bits bits, computed as one fixed-base product and
+    one multi-scalar multiplication (coefficients of repeated public keys
+    are summed). Returns the results (booleans) in the order of items.
+
+    If the batch equation fails, every signature is checked on its own with
+    the same (cofactored) equation. Cofactored verification is allowed by
+    RFC 8032 (5.1.7); it differs from verify, which compares encodings
+    without the cofactor, only on crafted signatures with small-order
+    components, which it accepts. A signature's result does not depend on
+    the other signatures of the batch.
+    """
+    results = [False] * len(items)
+    curves = {}
+    for i, (key, m, s) in enumerate(items):
+        entry = _parse(key, m, s)
+        if entry is not None:
+            curve = (type(key.group), key.group.context)
+            curves.setdefault(curve, []).append((i, entry))
+
+    for parsed in curves.values():
+        if _batch_equation([entry for i, entry in parsed]):
+            for i, entry in parsed:
+                results[i] = True
+        else:
+            for i, entry in parsed:
+                results[i] = _batch_equation([entry], 1)
+    return results
+
+def _parse(key, m, s):
+    """
+    The (key, R, S, k) terms of one signature in a batch, or None if the
+    signature, R or the public key cannot be decoded.
+    """
+    if len(s) == b//4:
+        s = (s[:b//8], s[b//8:])
+    elif not isinstance(s, (tuple, list)) or len(s) != 2:
+        return None
+    r, s = s
+    if len(r) != b//8 or len(s) != b//8 or len(key.element) != b//8:
+        return None
+    group = key.group
+    try:
+        if key.A is None:
+            key.A = group.decode_point(key.element)
+        R = group.decode_point(bytes(r))
+        S = key._decodeint(s)
+    except ValueError:
+        return None
+    return (key, R, S, key._Hint(r, key.element, m))
+
+def _batch_equation(entries, z=None):
+    """
+    Checks the cofactored batch equation (see verify_batch) over entries,
+    with random coefficients (or z for every entry).
+    """
+    group = entries[0][0].group
+    r = group.r.v
+    if z is None:
+        zs = rng.pool.secrets(1 << z_bits, len(entries))
+    else:
+        zs = [z] * len(entries)
+
+    s_sum = 0
+    keys = {}
+    points, scalars = [], []
+    for (key, R, S, k), z in zip(entries, zs):
+        s_sum += z * S.v
+        points.append(R)
+        scalars.append(z)
+        if key.element in keys:
+            keys[key.element][1] += z * k.v
+        else:
+            keys[key.element] = [key, z * k.v]
+
+    fixed = group.point().multiply_fixed(group.base_table(), Scalar(group.r, s_sum % r))
+    for key, c in keys.values():
+        if key.table is not None:
+            kA = group.point().multiply_fixed(key.table, Scalar(group.r, c % r))
+            fixed.add(fixed, kA.neg(kA))
+        else:
+            points.append(key.A)
+            scalars.append(c % r)
+    Q = group.multiply_many(points, scalars)
+    Q.add(fixed, Q.neg(Q))
+    for i in range(cofactor.bit_length() - 1):
+        Q.double(Q)
+    return group.encode_point(Q) == group.encode_point(group.point().identity())
+
+def _bytes(m):
+    """
+    Messages may be given as text, which is signed as its UTF-8 encoding.
+    Buffers (bytearray, mmap, memoryview) are used in place, not copied.
+    """
+    if isinstance(m, str):
+        return m.encode('utf-8')
+    if isinstance(m, bytes):
+        return m
+    return memoryview(m)
+
+def _dom(context):
+    """
+    dom2(1, context), the prefix of every Ed25519ph hash.
+    """
+    if len(context) > 255:
+        raise ValueError("context must be at most 255 bytes")
+    return dom2 + bytes([1, len(context)]) + context
+
+def _expand(group, seed):
+    """
+    Derives the secret scalar a (the clamped first half of SHA512(seed),
+    reduced modulo r) and the nonce prefix (the second half) from a seed.
+    """
+    h = sha512(seed).digest()
+    a = int.from_bytes(h[:b//8], 'little')
+    a &= (1 << (b - 2)) - 8
+    a |= 1 << (b - 2)
+    return Scalar(group.r, a % group.r.v), h[b//8:]
+
+def generate_keypairs(group, n, workers=None):
+    """
+    Generates n key pairs in bulk, packed into one bytes object of n 64-byte
+    records seed || public key (the layout of libsodium secret keys);
+    edwardsPrivateKey(group, record[:32]) restores a key.
+
+    The seeds come from a single read of the CSPRNG pool, the [a]B products
+    from the generator's fixed-base table, and all public keys are
+    compressed with one shared inversion. With workers > 1, the keys are
+    generated in that many worker processes.
+    """
+    if workers and workers > 1 and n > 1:
+        size = -(-n // workers)
+        jobs = [(group, min(size, n - i)) for i in range(0, n, size)]
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(workers) as executor:
+            return b''.join(executor.map(_generate_chunk, jobs))
+
+    seeds = rng.pool.read(b//8 * n)
+    table = group.base_table()
+    points = []
+    for i in range(0, len(seeds), b//8):
+        a = _expand(group, seeds[i:i + b//8])[0]
+        points.append(group.point().multiply_fixed(table, a))
+
+    packed = bytearray()
+    for i, pk in enumerate(group.encode_points(points)):
+        packed += seeds[i * (b//8):(i + 1) * (b//8)]
+        packed += pk
+    return bytes(packed)
 
+def _generate_chunk(args):
+    """
+    Process pool entry point for generate_keypairs.
+    """
+    group, n = args
+    return generate_keypairs(group, n)
@@ -3,14 +3,29 @@ Elliptic curve implementation of the abstract class Group, Curve, and Point.
 """
 
 import math
-from elgamal import ElGamal
-from group import Group, Point
-from ed25519 import ed25519
-from modular import ModInt
-from utils import b2l, l2b
+from .elgamal import ElGamal
+from .group import Group, Point
+from .modular import ModInt, batch_inverse
+from .context import CurveContext
+from .scalar import Scalar
+from . import rng
+from .utils import b2l, l2b
 
 b = 256 # word size
 k = 1000
+radix = 4 # bits per digit of the fixed-base tables
+max_tables = 256 # number of fixed-base tables kept by a curve
+
+def digits(n):
+    """
+    Radix 2^radix digits of the non-negative integer n, least significant
+    first.
+    """
+    result = []
+    while n > 0:
+        result.append(n & ((1 << radix) - 1))
+        n >>= radix
+    return result
 
 class EdwardsCurve(Group, ElGamal, object):
     """
@@ -21,23 +36,28 @@ class EdwardsCurve(Group, ElGamal, object):
         p(int): Size of the prime field, used in modulo operations.
         r(int): Order of the finite prime field.
         d(int), a(int), c(int): equation parameters
+        context(CurveContext): constants derived from the parameters
 
     The EdCurve class generates points, secrets on a twisted Edwards curve.
     """
 
-    def __init__(self, name, p, d, a, r, gx, gy):
+    def __init__(self, name, p, d, a, r, gx, gy, context=None):
         self.name = name
         self.p = p
         self.d = d
         self.a = a
         self.r = r
         self.c = self
+        if context is None:
+            context = CurveContext(name, p, d, a, r, gx, gy)
+        self.context = context
 
-        self.one = ModInt(p, 1)
-        self.zero = ModInt(p, 0)
+        self.one = context.one
+        self.zero = context.zero
 
         self.base = EdwardsPoint(self, gx, gy)
         self.i = EdwardsPoint(self, self.zero, self.one)
+        self.tables = context.table_cache(self)
 
         if not self.base._on_curve():
             raise Exception("Incorrect base point")
@@ -45,11 +65,34 @@ class EdwardsCurve(Group, ElGamal, object):
     def string(self):
         return self.name
 
+    def __getstate__(self):
+        """
+        Cached tables are left out when a curve is pickled (e.g. to send work
+        to another process); they are rebuilt on demand.
+        """
+        state = dict(self.__dict__)
+        state['tables'] = {}
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.tables = self.context.table_cache(self)
+
     def point(self):
         return EdwardsPoint(self, ModInt(self.p), ModInt(self.p))
 
     def secret(self):
-        return ModInt(self.p).random_secret()
+        """
+        Returns a random scalar modulo the group order r.
+        """
+        return Scalar(self.r).random_secret()
+
+    def secrets(self, n):
+        """
+        Returns n random scalars modulo r, drawn with a single read of the
+        CSPRNG pool.
+        """
+        return [Scalar(self.r, v) for v in rng.pool.secrets(self.r.v, n)]
 
     def order(self):
         """
@@ -57,6 +100,253 @@ class EdwardsCurve(Group, ElGamal, object):
         """
         return self.r
 
+    def fixed_table(self, P):
+        """
+        Returns the fixed-base table of the point P: row i holds the
+        multiples [1, 2, ..., 15] * 16^i * P, so that any scalar multiple of
+        P costs one addition per nonzero radix-16 digit and no doublings
+        (see EdwardsPoint.multiply_fixed).
+
+        Tables are cached on the curve, keyed by P's coordinates, so the
+        generator's table and those of long-lived public keys are built once.
+        When the cache is full the least recently used table is evicted,
+        never the generator's.
+        """
+        key = P.string()
+        table = self.tables.get(key)
+        if table is not None:
+            self.tables.pop(key, None)
+            self.tables[key] = table
+            return table
+
+        rows = []
+        Q = self.point().set(P)
+        for i in range((self.p.v.bit_length() + radix - 1) // radix):
+            row = [Q]
+            for j in range(2, 1 << radix):
+                row.append(self.point().add(row[-1], Q))
+            rows.append(row)
+            Q = self.point().double(row[(1 << (radix - 1)) - 1])
+
+        if len(self.tables) >= max_tables:
+            base = self.base.string()
+            for old in list(self.tables):
+                if old != base:
+                    self.tables.pop(old, None)
+                    break
+        self.tables[key] = rows
+        return rows
+
+    def multiply_fixed_many(self, tables, n):
+        """
+        Computes [n]P for every point P whose fixed-base table is in tables,
+        recoding n into radix-16 digits only once. Returns the products in
+        the order of tables.
+        """
+        products = [self.point().identity() for table in tables]
+        for i, digit in enumerate(digits(n.v)):
+            if digit:
+                for product, table in zip(products, tables):
+                    product.add(product, table[i][digit - 1])
+        return products
+
+    def multiply_many(self, points, scalars):
+        """
+        Computes the sum of [n]P over the points and (int) scalars, with
+        Straus's interleaved windows: each point gets its multiples
+        [0..15]P, and the radix-16 digits of all the scalars share one
+        chain of doublings (about 4 doublings per digit of the longest
+        scalar, plus one addition per nonzero digit).
+        """
+        tables, columns = [], []
+        for P, n in zip(points, scalars):
+            table = [None, self.point().set(P)]
+            for i in range(2, 1 << radix):
+                table.append(self.point().add(table[-1], P))
+            tables.append(table)
+            columns.append(digits(n))
+
+        Q = self.point().identity()
+        for i in reversed(range(max([len(c) for c in columns] or [0]))):
+            for j in range(radix):
+                Q.double(Q)
+            for table, column in zip(tables, columns):
+                if i < len(column) and column[i]:
+                    Q.add(Q, table[column[i]])
+        return Q
+
+    def base_table(self):
+        """
+        Returns the fixed-base table of the generator.
+        """
+        return self.fixed_table(self.base)
+
+    def pack_table(self, table):
+        """
+        Serializes a fixed-base table as the affine coordinates x || y
+        (little-endian, b/8 bytes each) of its points, row by row; all the
+        points are normalized with a single shared inversion.
+        """
+        n = b//8
+        packed = bytearray()
+        for ed in self.batch_to_ep([pt for row in table for pt in row]):
+            packed += (ed.x.v % self.p.v).to_bytes(n, 'little')
+            packed += (ed.y.v % self.p.v).to_bytes(n, 'little')
+        return bytes(packed)
+
+    def unpack_table(self, data, pk=None):
+        """
+        Rebuilds a fixed-base table from the output of pack_table (any
+        buffer), without any point arithmetic. If pk is given, the table must
+        be that of the point encoded as pk: its first point is checked
+        against the decoded pk, and ValueError is raised if they differ.
+        """
+        n = b//8
+        points = []
+        for i in range(0, len(data), 2 * n):
+            ed = self.c.point()
+            ed.x.v = int.from_bytes(data[i:i + n], 'little')
+            ed.y.v = int.from_bytes(data[i + n:i + 2 * n], 'little')
+            if pk is not None and not points:
+                A = self.decode_point(pk)
+                A = A.to_ep(A)
+                if (ed.x.v, ed.y.v) != (A.x.v % self.p.v, A.y.v % self.p.v):
+                    raise ValueError("table is not the one of the key")
+            points.append(self.point().from_ep(ed))
+        cols = (1 << radix) - 1
+        return [points[i:i + cols] for i in range(0, len(points), cols)]
+
+    def batch_to_ep(self, points):
+        """
+        Converts a list of points of this curve to standard Edwards
+        coordinates. Coordinate systems with a common denominator override
+        this to share a single inversion between all the points.
+        """
+        return [pt.to_ep(pt) for pt in points]
+
+    def normalize_many(self, points):
+        """
+        Returns points re-expressed in this curve's coordinates with their
+        denominators cleared (e.g. Z = 1), using batch_to_ep.
+        """
+        return [self.point().from_ep(ed) for ed in self.batch_to_ep(points)]
+
+    def sqrt(self, xx):
+        """
+        Returns a square root of the quadratic residue xx (a ModInt). When
+        p = 5 (mod 8) this is one exponentiation, x = xx^((p+3)/8), times
+        sqrt(-1) when x^2 = -xx.
+        """
+        ctx = self.context
+        x = ModInt(self.p)
+        if ctx.exp_p38 is None:
+            return x.sqrt(xx)
+        x.exp(xx, ctx.exp_p38)
+        if not ModInt(self.p).mul(x, x).equal(xx):
+            x.mul(x, ctx.sqrt_m1)
+        return x
+
+    def encode_point(self, pt):
+        """
+        Compressed encoding of pt (RFC 8032): the b-1 bits of y,
+        little-endian, with the sign (low bit) of x in the top bit.
+        """
+        ed = pt.to_ep(pt)
+        x, y = ed.x.v % self.p.v, ed.y.v % self.p.v
+        return (y | ((x & 1) << (b - 1))).to_bytes(b//8, 'little')
+
+    def encode_points(self, points):
+        """
+        Encodes every point as encode_point does, normalizing them all with
+        a single shared inversion (batch_to_ep).
+        """
+        return [self.encode_point(ed) for ed in self.batch_to_ep(points)]
+
+    def decode_point(self, s):
+        """
+        Given the encoding s of a point (its y coordinate and the sign of x),
+        recover x and return the point in this curve's coordinates.
+        Raises ValueError if s does not encode a point on the curve.
+        """
+        p = self.p
+        if len(s) != b//8:
+            raise ValueError("point encoding must be %d bytes" % (b//8))
+        yx = int.from_bytes(s, 'little')
+        sign = yx >> (b - 1)
+        if yx & ((1 << (b - 1)) - 1) >= p.v:
+            raise ValueError("non-canonical point encoding")
+        ctx = self.context
+        yy, u, v, x, test = ModInt(p), ModInt(p), ModInt(p), ModInt(p), ModInt(p)
+
+        y = ModInt(p, yx & ((1 << (b - 1)) - 1))
+        yy.mul(y, y)
+        u.sub(yy, self.one)
+        v.add(v.mul(yy, self.d), self.one)
+        if ctx.exp_p58 is not None:
+            # x = u v^3 (u v^7)^((p-5)/8), without inverting v (RFC 8032)
+            v3, uv7 = ModInt(p), ModInt(p)
+            v3.mul(v, v).mul(v3, v)
+            uv7.mul(v3, v3).mul(uv7, v).mul(uv7, u)
+            x.exp(uv7, ctx.exp_p58).mul(x, v3).mul(x, u)
+            test.mul(x, x).mul(test, v)
+            if not test.equal(u):
+                if not test.add(test, u).equal(self.zero):
+                    raise ValueError("decoding point that is not on curve")
+                x.mul(x, ctx.sqrt_m1)
+        else:
+            xx = ModInt(p).div(u, v)
+            if xx.jacobi(xx) == -1:
+                raise ValueError("decoding point that is not on curve")
+            x.sqrt(xx)
+        if x.v == 0 and sign:
+            raise ValueError("non-canonical point encoding")
+        if x.v & 1 != sign:
+            x.sub(p, x)
+
+        ed = self.c.point()
+        ed.x.set(x)
+        ed.y.set(y)
+        if not ed._on_curve():
+            raise ValueError("decoding point that is not on curve")
+        return self.point().from_ep(ed)
+
+    def encode_many(self, datas):
+        """
+        Maps each of datas to a point, exactly as EdwardsPoint.encode does,
+        but shares one inversion between all the candidate x^2 values of a
+        round: x^2 = (y^2 - 1) / (dy^2 + 1), with y = k * data + j.
+        Messages whose candidate is a non-residue move on to the next j.
+        """
+        P, d = self.p.v, self.d.v
+        elements = []
+        for data in datas:
+            if isinstance(data, int):
+                data = l2b(data)
+            tmp_data = bytearray(b'\xff' + data + b'0\xff')
+            if len(data) == 0:
+                tmp_data = bytearray(b'\xff' + b'\xff')
+            elements.append(b2l(tmp_data))
+
+        encoded = [None] * len(elements)
+        pending = list(range(len(elements)))
+        for j in range(k):
+            if not pending:
+                break
+            ys = [(k * elements[i] + j) % P for i in pending]
+            invs = batch_inverse([(d * y * y + 1) % P for y in ys], P)
+            retry = []
+            for i, y, inv in zip(pending, ys, invs):
+                xx = ModInt(self.p, ((y * y - 1) * inv) % P)
+                if xx.jacobi(xx) != 1:
+                    retry.append(i)
+                    continue
+                ed = self.c.point()
+                ed.x.set(self.sqrt(xx))
+                ed.y.v = y
+                encoded[i] = self.point().from_ep(ed)
+            pending = retry
+        return encoded
+
     def to_ec_from_tec(self):
         """
         Returns a standard, non-twist Edwards curve from twist curve params.
@@ -74,10 +364,10 @@ class EdwardsCurve(Group, ElGamal, object):
                             self.base.x, self.base.y)
 
 class EdwardsPoint(Point, object):
-    def __init__(self, curve, x=ModInt(), y=ModInt()):
+    def __init__(self, curve, x=None, y=None):
         self.c = curve
-        self.x = x
-        self.y = y
+        self.x = ModInt(curve.p) if x is None else x
+        self.y = ModInt(curve.p) if y is None else y
 
     def string(self):
         return (self.x.v, self.y.v)
@@ -181,7 +471,7 @@ class EdwardsPoint(Point, object):
         """
         Doubles the point p on the curve using its unified addition law.
         """
-        return p.add(p, p)
+        return self.add(p, p)
 
     def multiply(self, P, n):
         """
@@ -196,8 +486,35 @@ class EdwardsPoint(Point, object):
                 self.add(self, P)
         return self
 
+    def multiply_fixed(self, table, n):
+        """
+        Multiplies the point whose fixed-base table (EdwardsCurve.fixed_table)
+        is given by the scalar n: one addition per nonzero radix-16 digit.
+        """
+        self.set(self.c.i)
+        for i, digit in enumerate(digits(n.v)):
+            if digit:
+                self.add(self, table[i][digit - 1])
+        return self
+
     def multiply_window(self, P, n):
-        pass
+        """
+        Fixed-window scalar multiplication: the multiples [0..15]P are
+        precomputed, after which each radix-16 digit of n costs four
+        doublings and at most one addition (about 64 additions for a 256-bit
+        n, against about 128 for multiply).
+        """
+        table = [self.c.point().identity(), self.c.point().set(P)]
+        for i in range(2, 1 << radix):
+            table.append(self.c.point().add(table[-1], table[1]))
+
+        self.set(self.c.i)
+        for digit in reversed(digits(n.v)):
+            for i in range(radix):
+                self.double(self)
+            if digit:
+                self.add(self, table[digit])
+        return self
 
     def multiply_ladder(self, P, n):
         pass
@@ -265,7 +582,7 @@ class EdwardsPoint(Point, object):
         denom.add(denom.mul(yy, self.c.d), self.c.one)
         xx.div(num, denom)
         if self.x.jacobi(xx) == 1:
-            x.sqrt(xx)
+            x.set(self.c.sqrt(xx))
             newpt = EdwardsPoint(self.c, x, y)
             if not newpt._on_curve():
                 x.sub(P, self.x)
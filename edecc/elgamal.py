@@ -1,13 +1,30 @@
 #!/usr/bin/env python
-from Crypto.Hash import SHA256
-from Crypto.Util.number import bytes_to_long, GCD
+import hmac
+from hashlib import sha256
+from .modular import ModInt
+from . import dlog
+
+tag_size = 32 # bytes of an HMAC-SHA256 tag
+
+def hkdf(secret, length, salt=b'', info=b''):
+    """
+    HMAC-based extract-and-expand key derivation function (RFC 5869)
+    instantiated with SHA-256.
+    """
+    prk = hmac.new(salt or bytes(tag_size), secret, sha256).digest()
+    okm, t = b'', b''
+    for i in range(-(-length // tag_size)):
+        t = hmac.new(prk, t + info + bytes([i + 1]), sha256).digest()
+        okm += t
+    return okm[:length]
+
+chunk_size = 64 * 1024 # default plaintext bytes per stream frame
+max_chunk_size = 16 * chunk_size # largest frame size accepted in a stream header
 
 class ElGamal:
     def _hash(self, data, bits):
         limit = bits // 8
-        h = SHA256.new()
-        h.update(data)
-        return bytes_to_long(h.digest()[0:limit])
+        return int.from_bytes(sha256(data).digest()[0:limit], 'big')
 
     def encrypt(self, element, data):
         y = self.secret()
@@ -15,7 +32,7 @@ class ElGamal:
         s.multiply(element, y)
 
         c1 = self.point()
-        c1.multiply(element.generator(), y)
+        c1.multiply(self.point().generator(), y)
 
         de = self.point().encode(data)
         c2 = self.point().add(de, s)
@@ -31,6 +48,366 @@ class ElGamal:
         de.sub(c2, s)
         return de.decode(de)
 
+    def encrypt_many(self, element, datas):
+        """
+        Encrypts each of datas to the public element. Both [y]G and [y]element
+        go through cached fixed-base tables (no doublings), the messages are
+        encoded in batch, and all output points are normalized with a single
+        shared inversion.
+        """
+        base = self.base_table()
+        table = self.fixed_table(element)
+        points = []
+        encoded = self.encode_many(datas)
+        for de, y in zip(encoded, self.secrets(len(encoded))):
+            points.append(self.point().multiply_fixed(base, y))
+            s = self.point().multiply_fixed(table, y)
+            points.append(s.add(de, s))
+        points = self.normalize_many(points)
+        return list(zip(points[0::2], points[1::2]))
+
+    def rerandomize_many(self, element, encrypted):
+        """
+        Re-randomizes each ciphertext (c1, c2) under the public element as
+        (c1 + [r]G, c2 + [r]element) with a fresh r, leaving the plaintext
+        unchanged. [r]G and [r]element are computed together from the cached
+        fixed-base tables with one recoding of r, and all output points are
+        normalized with a single shared inversion.
+        """
+        tables = (self.base_table(), self.fixed_table(element))
+        encrypted = list(encrypted)
+        points = []
+        for (c1, c2), r in zip(encrypted, self.secrets(len(encrypted))):
+            rG, rK = self.multiply_fixed_many(tables, r)
+            points.append(rG.add(c1, rG))
+            points.append(rK.add(c2, rK))
+        points = self.normalize_many(points)
+        return list(zip(points[0::2], points[1::2]))
+
+    def decrypt_many(self, secret, encrypted, workers=None):
+        """
+        Decrypts a list of ciphertexts. With workers > 1 the list is split
+        into contiguous chunks that are decrypted in a pool of worker
+        processes; results keep the input order.
+        """
+        encrypted = list(encrypted)
+        if not workers or workers <= 1 or len(encrypted) < 2:
+            return self._decrypt_batch(secret, encrypted)
+
+        size = -(-len(encrypted) // workers)
+        chunks = [(self, secret, encrypted[i:i + size])
+                  for i in range(0, len(encrypted), size)]
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=len(chunks)) as pool:
+            return [data for chunk in pool.map(_decrypt_chunk, chunks)
+                    for data in chunk]
+
+    def _decrypt_batch(self, secret, encrypted):
+        """
+        Decrypts each ciphertext with a windowed multiplication of c1, and
+        normalizes all the recovered message points with one inversion.
+        """
+        encoded = []
+        for c1, c2 in encrypted:
+            s = self.point().multiply_window(c1, secret)
+            encoded.append(s.add(c2, s.neg(s)))
+        return [ed.decode(ed) for ed in self.batch_to_ep(encoded)]
+
+    # Exponential ElGamal: the message is carried as [m]G, which makes
+    # ciphertexts additively homomorphic. Decryption recovers [m]G and takes
+    # its discrete log with a baby-step giant-step table, so m must be small
+    # (below 2^bits of the table).
+
+    def encrypt_exp(self, element, m, bits=dlog.default_bits):
+        """
+        Encrypts the integer m, which must lie in [0, 2^bits) so that the
+        dlog table of decrypt_exp can recover it; ValueError otherwise.
+        """
+        if not 0 <= m < 1 << bits:
+            raise ValueError("message must be in [0, 2^%d)" % bits)
+        y = self.secret()
+        c1 = self.point().multiply_fixed(self.base_table(), y)
+        s = self.point().multiply(element, y)
+        M = self.point().multiply_fixed(self.base_table(), ModInt(self.p, m))
+        return (c1, s.add(s, M))
+
+    def add_exp(self, a, b):
+        """
+        Returns a ciphertext of the sum of the messages of a and b.
+        """
+        return (self.point().add(a[0], b[0]), self.point().add(a[1], b[1]))
+
+    def decrypt_exp(self, secret, encrypted, table=None):
+        c1, c2 = encrypted
+        if table is None:
+            table = dlog.table(self)
+        s = self.point().multiply(c1, secret)
+        M = self.point().add(c2, s.neg(s))
+        return table.log(M)
+
+    # Hybrid (ECIES-style) encryption: a single ephemeral Diffie-Hellman
+    # exchange yields the keys for a symmetric cipher, so the curve cost is
+    # independent of the payload length.
+    #
+    # Ciphertext layout: ephemeral point (x || y) || AES-256-CTR(data) || tag,
+    # where tag is HMAC-SHA256 over everything before it (encrypt-then-MAC).
+
+    def encrypt_hybrid(self, element, data, info=b''):
+        y = self.secret()
+        eph = self.point().multiply(self.point().generator(), y)
+        shared = self.point().multiply(element, y)
+
+        header = self.point_bytes(eph)
+        enc_key, mac_key = self._hybrid_keys(shared, header, info)
+        cipher = _cipher(enc_key)
+        body = header + cipher.encrypt(bytes(data))
+        return body + hmac.new(mac_key, body, sha256).digest()
+
+    def decrypt_hybrid(self, secret, encrypted, info=b''):
+        n = 2 * self.point_size()
+        if len(encrypted) < n + tag_size:
+            raise ValueError("ciphertext too short")
+        header, body = encrypted[:n], encrypted[:-tag_size]
+        eph = self.bytes_point(header)
+        shared = self.point().multiply(eph, secret)
+
+        enc_key, mac_key = self._hybrid_keys(shared, header, info)
+        tag = hmac.new(mac_key, body, sha256).digest()
+        if not _equal(tag, encrypted[-tag_size:]):
+            raise ValueError("ciphertext failed authentication")
+        cipher = _cipher(enc_key)
+        return cipher.decrypt(bytes(body[n:]))
+
+    # Streaming hybrid encryption: one key exchange for the whole stream,
+    # followed by fixed-size authenticated frames so that memory use does not
+    # depend on the stream length.
+    #
+    # Stream layout: ephemeral point (x || y) || chunk size (4 bytes), then
+    # frames of AES-256-CTR(chunk) || tag. Every frame but the last carries
+    # exactly chunk_size bytes of ciphertext; the last is shorter (possibly
+    # empty), which marks the end of the stream. Each tag is HMAC-SHA256 over
+    # the frame index, a final-frame flag and the ciphertext, so frames can't
+    # be reordered, dropped or truncated.
+
+    def encrypt_frames(self, element, reader, size=chunk_size, info=b''):
+        """
+        Generator yielding the header and then each encrypted frame of the
+        data read from reader (a binary file object, or any buffer such as
+        bytes or an mmap, which is sliced without copying).
+        """
+        if not 0 < size <= max_chunk_size:
+            raise ValueError("frame size must be in [1, %d]" % max_chunk_size)
+        y = self.secret()
+        eph = self.point().multiply(self.point().generator(), y)
+        shared = self.point().multiply(element, y)
+
+        header = self.point_bytes(eph) + size.to_bytes(4, 'big')
+        enc_key, mac_key = self._hybrid_keys(shared, header, info)
+        cipher = _cipher(enc_key)
+        yield header
+
+        i = 0
+        for chunk in _chunks(reader, size):
+            final = len(chunk) < size
+            ct = cipher.encrypt(chunk)
+            yield ct + _frame_tag(mac_key, i, final, ct)
+            if final:
+                return
+            i += 1
+
+    def decrypt_frames(self, secret, reader, info=b''):
+        """
+        Generator yielding the plaintext of each frame of a stream produced by
+        encrypt_frames. Each frame is authenticated before it is released;
+        a ValueError is raised on a forged, reordered or truncated stream.
+        """
+        n = 2 * self.point_size()
+        chunks = _chunks(reader, n + 4)
+        header = bytes(next(chunks, b''))
+        if len(header) != n + 4:
+            raise ValueError("stream header too short")
+        size = int.from_bytes(header[n:], 'big')
+        # the header is only authenticated with the first frame: bound the
+        # frame buffer before allocating it
+        if not 0 < size <= max_chunk_size:
+            raise ValueError("invalid stream frame size")
+        eph = self.bytes_point(header[:n])
+        shared = self.point().multiply(eph, secret)
+
+        enc_key, mac_key = self._hybrid_keys(shared, header, info)
+        cipher = _cipher(enc_key)
+
+        chunks = _chunks(reader, size + tag_size, offset=n + 4)
+        for i, frame in enumerate(chunks):
+            final = len(frame) < size + tag_size
+            if len(frame) < tag_size:
+                raise ValueError("stream truncated")
+            ct = frame[:-tag_size]
+            if not _equal(_frame_tag(mac_key, i, final, ct), frame[-tag_size:]):
+                raise ValueError("stream failed authentication")
+            yield cipher.decrypt(ct)
+            if final:
+                if next(chunks, None) is not None:
+                    raise ValueError("data after final frame")
+                return
+        raise ValueError("stream truncated")
+
+    def encrypt_stream(self, element, reader, writer, size=chunk_size, info=b''):
+        """
+        Encrypts everything read from reader into writer in constant memory.
+        Returns the number of bytes written.
+        """
+        written = 0
+        for frame in self.encrypt_frames(element, reader, size, info):
+            writer.write(frame)
+            written += len(frame)
+        return written
+
+    def decrypt_stream(self, secret, reader, writer, info=b''):
+        """
+        Decrypts a stream produced by encrypt_stream into writer in constant
+        memory. Returns the number of plaintext bytes written.
+        """
+        written = 0
+        for chunk in self.decrypt_frames(secret, reader, info):
+            writer.write(chunk)
+            written += len(chunk)
+        return written
+
+    def _hybrid_keys(self, shared, header, info):
+        """
+        Derives the (encryption, MAC) key pair from the shared point, bound to
+        the ephemeral public key.
+        """
+        okm = hkdf(self.point_bytes(shared), 64, salt=header, info=info)
+        return okm[:32], okm[32:]
+
+    def point_size(self):
+        """
+        Byte length of one affine coordinate.
+        """
+        return (self.p.v.bit_length() + 7) // 8
+
+    def point_bytes(self, pt):
+        """
+        Serializes pt as its affine coordinates x || y (big-endian).
+        """
+        ed = pt.to_ep(pt)
+        n = self.point_size()
+        return (ed.x.v % self.p.v).to_bytes(n, 'big') + \
+            (ed.y.v % self.p.v).to_bytes(n, 'big')
+
+    def bytes_point(self, data):
+        """
+        Parses the output of point_bytes into a point of this group,
+        checking that it lies on the curve.
+        """
+        n = self.point_size()
+        ed = self.c.point()
+        ed.x.v = int.from_bytes(data[:n], 'big')
+        ed.y.v = int.from_bytes(data[n:2 * n], 'big')
+        if len(data) != 2 * n or not ed._on_curve():
+            raise ValueError("point is not on curve")
+        return self.point().from_ep(ed)
+
+def generate_keypairs(group, n, workers=None):
+    """
+    Generates n Diffie-Hellman key pairs of the Edwards group in bulk, packed
+    into one bytes object of n 64-byte records secret || public element: the
+    secret scalar in its canonical 32-byte encoding and the compressed
+    element (EdwardsCurve.encode_point). A key is restored with
+    PrivateKey(group, Scalar(group.r).from_bytes(record[:32])).
+
+    The secrets come from a single read of the CSPRNG pool, the [x]G
+    products from the generator's fixed-base table, and all public elements
+    are compressed with one shared inversion. With workers > 1, the keys are
+    generated in that many worker processes.
+    """
+    if workers and workers > 1 and n > 1:
+        size = -(-n // workers)
+        jobs = [(group, min(size, n - i)) for i in range(0, n, size)]
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(workers) as executor:
+            return b''.join(executor.map(_generate_chunk, jobs))
+
+    secrets = group.secrets(n)
+    table = group.base_table()
+    points = [group.point().multiply_fixed(table, x) for x in secrets]
+    packed = bytearray()
+    for x, element in zip(secrets, group.encode_points(points)):
+        packed += x.to_bytes()
+        packed += element
+    return bytes(packed)
+
+def _generate_chunk(args):
+    """
+    Process pool entry point for generate_keypairs.
+    """
+    group, n = args
+    return generate_keypairs(group, n)
+
+def _decrypt_chunk(args):
+    """
+    Process pool entry point for ElGamal.decrypt_many.
+    """
+    group, secret, encrypted = args
+    return group._decrypt_batch(secret, encrypted)
+
+def _chunks(reader, size, offset=0):
+    """
+    Yields successive size-byte chunks (the last one possibly shorter) of
+    reader, as memoryviews. Buffers (bytes, bytearray, memoryview, mmap) are
+    sliced in place starting at offset; file objects are read with readinto
+    into a single reused buffer, so each chunk is only valid until the next
+    one is produced. An empty input yields one empty chunk.
+    """
+    if not hasattr(reader, 'readinto'):
+        view = memoryview(reader)[offset:]
+        for i in range(0, len(view), size):
+            yield view[i:i + size]
+        if len(view) % size == 0:
+            yield view[len(view):]
+        return
+
+    buf = bytearray(size)
+    view = memoryview(buf)
+    while True:
+        n = 0
+        while n < size:
+            r = reader.readinto(view[n:])
+            if not r:
+                break
+            n += r
+        yield view[:n]
+        if n < size:
+            return
+
+def _cipher(key):
+    """
+    AES-256-CTR with a zero initial counter. pycryptodome is only imported
+    here, on first use of the hybrid encryption.
+    """
+    from Crypto.Cipher import AES
+    from Crypto.Util import Counter
+    return AES.new(key, AES.MODE_CTR, counter=Counter.new(128))
+
+def _frame_tag(mac_key, i, final, ct):
+    h = hmac.new(mac_key, digestmod=sha256)
+    h.update(i.to_bytes(8, 'big') + bytes([final]))
+    h.update(ct)
+    return h.digest()
+
+def _equal(a, b):
+    """
+    Compares two byte strings in time independent of where they differ.
+    """
+    if len(a) != len(b):
+        return False
+    result = 0
+    for x, y in zip(a, b):
+        result |= x ^ y
+    return result == 0
+
 class PublicKey:
     def __init__(self, group, element):
         self.group = group
@@ -39,7 +416,8 @@ class PublicKey:
     def exchange(self, private):
         pubkey = self.group.point()
         if isinstance(self.element.string(), tuple):
-            return pubkey.multiply(self.element, private.secret).x.string()
+            pubkey.multiply(self.element, private.secret)
+            return pubkey.to_ep(pubkey).x.string()
         return pubkey.multiply(self.element, private.secret)
 
     def verify(self, data, sign):
@@ -48,19 +426,35 @@ class PublicKey:
     def encrypt(self, data):
         return self.group.encrypt(self.element, data)
 
+    def encrypt_many(self, datas):
+        return self.group.encrypt_many(self.element, datas)
+
+    def rerandomize_many(self, encrypted):
+        return self.group.rerandomize_many(self.element, encrypted)
+
+    def encrypt_exp(self, m, bits=dlog.default_bits):
+        return self.group.encrypt_exp(self.element, m, bits)
+
+    def encrypt_hybrid(self, data, info=b''):
+        return self.group.encrypt_hybrid(self.element, data, info)
+
+    def encrypt_stream(self, reader, writer, size=chunk_size, info=b''):
+        return self.group.encrypt_stream(self.element, reader, writer, size, info)
+
 class PrivateKey(PublicKey):
     def __init__(self, group, secret = None):
         if secret == None:
             secret = group.secret()
         element = group.point()
-        element.random_element()
+        element.random_element(secret)
         super(PrivateKey, self).__init__(group, element)
         self.secret = secret
 
     def exchange(self, public):
         privatekey = self.group.point()
         if isinstance(self.element.string(), tuple):
-            return privatekey.multiply(public.element, self.secret).x.string()
+            privatekey.multiply(public.element, self.secret)
+            return privatekey.to_ep(privatekey).x.string()
         return privatekey.multiply(public.element, self.secret)
 
     def sign(self, data):
@@ -69,5 +463,17 @@ class PrivateKey(PublicKey):
     def decrypt(self, encrypted):
         return self.group.decrypt(self.secret, encrypted)
 
+    def decrypt_many(self, encrypted, workers=None):
+        return self.group.decrypt_many(self.secret, encrypted, workers)
+
+    def decrypt_exp(self, encrypted, table=None):
+        return self.group.decrypt_exp(self.secret, encrypted, table)
+
+    def decrypt_hybrid(self, encrypted, info=b''):
+        return self.group.decrypt_hybrid(self.secret, encrypted, info)
+
+    def decrypt_stream(self, reader, writer, info=b''):
+        return self.group.decrypt_stream(self.secret, reader, writer, info)
+
     def public_key(self):
         return PublicKey(self.group, self.element)
@@ -1,6 +1,6 @@
-import edwards
-from modular import ModInt
-from group import Point, Group
+from . import edwards
+from .modular import ModInt, batch_inverse
+from .group import Point, Group
 
 #TODO
 #   - test:
@@ -51,12 +51,14 @@ class extEdwardsCurve(edwards.EdwardsCurve, object):
         self.d = ed.d
         self.p = ed.p
         self.r = ed.r
+        self.context = ed.context
 
         self.zero = ed.zero
         self.one = ed.one
 
         self.base = self.point().from_ep(ed.base)
         self.i = extEdwardsPoint(self, self.zero, self.one, self.zero, self.one)
+        self.tables = self.context.table_cache(self)
         if not self.base._on_curve():
             raise Exception("Incorrect base point")
 
@@ -67,13 +69,28 @@ class extEdwardsCurve(edwards.EdwardsCurve, object):
         return extEdwardsPoint(self, ModInt(self.p), ModInt(self.p),
                                 ModInt(self.p), ModInt(self.p))
 
+    def batch_to_ep(self, points):
+        """
+        Converts points to standard Edwards coordinates (X/Z, Y/Z) with a
+        single inversion shared between all of them.
+        """
+        P = self.p.v
+        z_invs = batch_inverse([pt.z.v for pt in points], P)
+        eds = []
+        for pt, z_inv in zip(points, z_invs):
+            ed = self.c.point()
+            ed.x.v = (pt.x.v * z_inv) % P
+            ed.y.v = (pt.y.v * z_inv) % P
+            eds.append(ed)
+        return eds
+
 class extEdwardsPoint(edwards.EdwardsPoint, object):
-    def __init__(self, curve, x=ModInt(), y=ModInt(), t=ModInt(), z=ModInt()):
+    def __init__(self, curve, x=None, y=None, t=None, z=None):
         self.c = curve
-        self.x = x
-        self.y = y
-        self.t = t
-        self.z = z
+        self.x = ModInt(curve.p) if x is None else x
+        self.y = ModInt(curve.p) if y is None else y
+        self.t = ModInt(curve.p) if t is None else t
+        self.z = ModInt(curve.p) if z is None else z
 
     def string(self):
         return (self.x.v, self.y.v, self.t.v, self.z.v)
@@ -160,7 +177,7 @@ class extEdwardsPoint(edwards.EdwardsPoint, object):
         Computational cost:  4M + 4S + 1*a + 6add + 1*2.
         """
         x, y, t, z = p.x, p.y, p.t, p.z
-        P, two = self.c.p, ModInt(self.c.p, 2)
+        P, two = self.c.p, self.c.context.two
         assert not z.equal(self.c.zero)
         A, B, C, D, E, F, G, H = ModInt(P), ModInt(P), ModInt(P), ModInt(P), ModInt(P), ModInt(P), ModInt(P), ModInt(P)
 
@@ -189,7 +206,7 @@ class extEdwardsPoint(edwards.EdwardsPoint, object):
         Cost: 3M + 4S + 1*a + 7add + 1*2
         """
         x, y, z = p.x, p.y, p.z
-        P , two = self.c.p, ModInt(self.c.p, 2)
+        P , two = self.c.p, self.c.context.two
         A, B, D, E, G, H = ModInt(P),  ModInt(P),  ModInt(P),  ModInt(P),  ModInt(P),  ModInt(P)
         t1, t2, t3 = ModInt(P),  ModInt(P),  ModInt(P)
 
@@ -224,7 +241,7 @@ class extEdwardsPoint(edwards.EdwardsPoint, object):
 
         xi, yi, zi = self.add_fast_test(p, q)
 
-        P, two = self.c.p, ModInt(self.c.p, 2)
+        P, two = self.c.p, self.c.context.two
 
         A, B, C, D, E, F, G, H = ModInt(P), ModInt(P), ModInt(P), ModInt(P), ModInt(P), ModInt(P), ModInt(P), ModInt(P)
 
@@ -237,7 +254,7 @@ class extEdwardsPoint(edwards.EdwardsPoint, object):
 
         A.mul(t1, t2)
         B.mul(t3, t4)
-        C.mul(self.c.d, two).mul(C, t1).mul(C, t2)
+        C.mul(self.c.context.d2, t1).mul(C, t2)
         D.mul(two, z1).mul(D, z2)
         E.sub(B, A)
         F.sub(D, C)
@@ -259,17 +276,17 @@ class extEdwardsPoint(edwards.EdwardsPoint, object):
 
         A = ((y1 - x1) * (y2 - x2))
         B = ((y1 + x2) * (y2 + x2))
-        C = self.d * 2 * t1 * t2
+        C = self.c.context.d2.v * t1 * t2
         D = 2 * z1 * z2
         E = B - A
         F = D - C
         G = D + C
         H = B + A
 
-        x_r = (E * F) % self.p
-        y_r = (G * H) % self.p
-        t_r = (E * H) % self.p
-        z_r = (F * G) % self.p
+        x_r = (E * F) % self.c.p.v
+        y_r = (G * H) % self.c.p.v
+        t_r = (E * H) % self.c.p.v
+        z_r = (F * G) % self.c.p.v
 
         p = (x_r, y_r, t_r, z_r)
         return p
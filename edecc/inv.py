@@ -3,9 +3,9 @@ InvertedCurve module implements the Inverted representation of a
 twisted Edwards interface and its associated unit tests.
 """
 
-import edwards
-from modular import ModInt
-from group import Group, Point
+from . import edwards
+from .modular import ModInt
+from .group import Group, Point
 
 # todo
 #   - test:
@@ -49,6 +49,7 @@ class invEdwardsCurve(edwards.EdwardsCurve, object):
         self.d = ed.d
         self.p = ed.p
         self.r = ed.r
+        self.context = ed.context
 
         self.zero = ed.zero
         self.one = ed.one
@@ -61,6 +62,7 @@ class invEdwardsCurve(edwards.EdwardsCurve, object):
 
         self.base = self.point().from_ep(ed.base)
         self.i = invEdwardsPoint(self, self.one, self.zero, self.zero)
+        self.tables = self.context.table_cache(self)
         if not self.base._on_curve():
             raise Exception("Incorrect base point")
 
@@ -71,11 +73,11 @@ class invEdwardsCurve(edwards.EdwardsCurve, object):
         return invEdwardsPoint(self, ModInt(self.p), ModInt(self.p), ModInt(self.p))
 
 class invEdwardsPoint(edwards.EdwardsPoint, object):
-    def __init__(self, curve, x=ModInt(), y=ModInt(), z=ModInt()):
+    def __init__(self, curve, x=None, y=None, z=None):
         self.c = curve
-        self.x = x
-        self.y = y
-        self.z = z
+        self.x = ModInt(curve.p) if x is None else x
+        self.y = ModInt(curve.p) if y is None else y
+        self.z = ModInt(curve.p) if z is None else z
 
     def string(self):
         return (self.x.v, self.y.v, self.z.v)
@@ -97,7 +99,7 @@ class invEdwardsPoint(edwards.EdwardsPoint, object):
 
         l.mul(self.c.a, yy).add(l, xx).mul(l, zz)
         m.mul(xx, yy)
-        r.exp(zz, ModInt(P, 2)).mul(r, self.c.d).add(r, m)
+        r.exp(zz, self.c.context.two).mul(r, self.c.d).add(r, m)
         return l.equal(r)
 
     def identity(self):
@@ -200,7 +202,7 @@ class invEdwardsPoint(edwards.EdwardsPoint, object):
         Computational cost: 3M + 3S + 1*a + 6add.
         """
         x, y, z = p.x, p.y, p.z
-        P, zero, two = self.c.p, self.c.zero, ModInt(self.c.p, 2)
+        P, zero, two = self.c.p, self.c.zero, self.c.context.two
         A, B, U, C, D, E = ModInt(P), ModInt(P), ModInt(P), ModInt(P), ModInt(P), ModInt(P)
         t1, t2, t3, t4, xyz = ModInt(P), ModInt(P), ModInt(P), ModInt(P), ModInt(P)
 
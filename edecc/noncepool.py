@@ -0,0 +1,177 @@
+"""
+Background pool of precomputed ECDSA nonces.
+
+An ECDSA signature needs a fresh nonce k, the x-coordinate r of kG and the
+inverse of k modulo the group order; all three are independent of the
+message. A NoncePool computes these tuples ahead of time on a background
+thread, so that EllipticCurve.sign only pays for a hash and two modular
+multiplications on the critical path.
+
+A forked child must never reuse a nonce of its parent (two signatures with
+the same k reveal the private key), so pools are emptied in the child after
+a fork, as rng.RandomPool drops its buffer.
+"""
+
+import os
+import threading
+import weakref
+from . import rng
+from collections import deque
+from .modular import batch_inverse
+
+class NoncePool(object):
+    """
+    A bounded pool of (k, k^-1 mod q, r) tuples for a Weierstrauss curve.
+
+    The refill thread sleeps until the pool drops to the low-water mark, then
+    tops it up in batches: the batch's kG products are normalized with a
+    single inversion mod p and its nonces inverted with a single inversion
+    mod q. Taking a nonce never blocks; sign falls back to computing the
+    nonce inline when the pool is empty.
+
+    Attributes:
+        curve (EllipticCurve): the curve nonces are generated for.
+        size (int): maximum number of nonces held.
+        low (int): refill is triggered when occupancy drops to this level.
+        batch (int): number of nonces generated per batched inversion.
+        hits, misses (int): nonces served from the pool / requests that
+            found it empty.
+        generated (int): total number of nonces computed by the pool.
+    """
+
+    def __init__(self, curve, size=256, low=None, batch=32, start=True):
+        self.curve = curve
+        self.size = size
+        self.low = size // 2 if low is None else low
+        self.batch = batch
+        self.hits = 0
+        self.misses = 0
+        self.generated = 0
+
+        self._nonces = deque()
+        self._cond = threading.Condition()
+        self._running = False
+        self._thread = None
+        _pools.add(self)
+        if start:
+            self.start()
+
+    def _after_fork(self):
+        """
+        Discards the nonces inherited from the parent and the parent's lock,
+        and restarts the refill thread (which does not survive the fork) if
+        it was running.
+        """
+        running = self._running
+        self._nonces = deque()
+        self._cond = threading.Condition()
+        self._running = False
+        self._thread = None
+        if running:
+            self.start()
+
+    def start(self):
+        """
+        Starts the background refill thread.
+        """
+        with self._cond:
+            if self._running:
+                return self
+            self._running = True
+        self._thread = threading.Thread(target=self._refill,
+                                        name="edecc-nonce-pool", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """
+        Stops the refill thread; nonces already in the pool can still be used.
+        """
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def get(self):
+        """
+        Returns a precomputed (k, k^-1, r) tuple, or None if the pool is empty.
+        Each tuple is handed out exactly once.
+        """
+        with self._cond:
+            if not self._nonces:
+                self.misses += 1
+                self._cond.notify()
+                return None
+            nonce = self._nonces.popleft()
+            self.hits += 1
+            if len(self._nonces) <= self.low:
+                self._cond.notify()
+            return nonce
+
+    def fill(self, n=None):
+        """
+        Synchronously adds up to n nonces (default: until the pool is full).
+        """
+        if n is None:
+            n = self.size - len(self)
+        while n > 0:
+            m = min(n, self.batch, self.size - len(self))
+            if m <= 0:
+                break
+            nonces = self.generate(m)
+            with self._cond:
+                self._nonces.extend(nonces[:self.size - len(self._nonces)])
+            n -= m
+
+    def generate(self, n):
+        """
+        Computes n fresh nonce tuples using one inversion mod p (to normalize
+        the kG products) and one inversion mod q (for the nonces).
+        """
+        c = self.curve
+        G = c.to_jacobian(c.generator())
+        ks = rng.pool.secrets(c.q, n)
+        points = c.to_affine_many([c.multiply_jacobian(G, k) for k in ks])
+        k_invs = batch_inverse(ks, c.q)
+        nonces = []
+        for k, k_inv, (x, y) in zip(ks, k_invs, points):
+            r = x % c.q
+            if r != 0:
+                nonces.append((k, int(k_inv), r))
+        with self._cond:
+            self.generated += len(nonces)
+        return nonces
+
+    def stats(self):
+        """
+        Returns occupancy metrics for the pool.
+        """
+        with self._cond:
+            return {"size": self.size, "occupancy": len(self._nonces),
+                    "low": self.low, "hits": self.hits,
+                    "misses": self.misses, "generated": self.generated,
+                    "running": self._running}
+
+    def __len__(self):
+        return len(self._nonces)
+
+    def _refill(self):
+        while True:
+            with self._cond:
+                while self._running and len(self._nonces) > self.low:
+                    self._cond.wait()
+                if not self._running:
+                    return
+            self.fill()
+
+# Live pools, emptied in the child after a fork by a single hook.
+_pools = weakref.WeakSet()
+
+def _after_fork():
+    for p in list(_pools):
+        p._after_fork()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork)
@@ -1,6 +1,6 @@
-import edwards
-from modular import ModInt
-from group import Group, Point
+from . import edwards
+from .modular import ModInt, batch_inverse
+from .group import Group, Point
 
 #TODO
 #   - test:
@@ -36,12 +36,14 @@ class projEdwardsCurve(edwards.EdwardsCurve, object):
         self.d = ed.d
         self.p = ed.p
         self.r = ed.r
+        self.context = ed.context
 
         self.zero = ed.zero
         self.one = ed.one
 
         self.base = self.point().from_ep(ed.base)
         self.i = projEdwardsPoint(self, self.zero, self.one, self.one)
+        self.tables = self.context.table_cache(self)
         if not self.base._on_curve():
             raise Exception("Incorrect base point")
 
@@ -51,12 +53,27 @@ class projEdwardsCurve(edwards.EdwardsCurve, object):
         """
         return projEdwardsPoint(self, ModInt(self.p), ModInt(self.p), ModInt(self.p))
 
+    def batch_to_ep(self, points):
+        """
+        Converts points to standard Edwards coordinates (X/Z, Y/Z) with a
+        single inversion shared between all of them.
+        """
+        P = self.p.v
+        z_invs = batch_inverse([pt.z.v for pt in points], P)
+        eds = []
+        for pt, z_inv in zip(points, z_invs):
+            ed = self.c.point()
+            ed.x.v = (pt.x.v * z_inv) % P
+            ed.y.v = (pt.y.v * z_inv) % P
+            eds.append(ed)
+        return eds
+
 class projEdwardsPoint(edwards.EdwardsPoint, object):
-    def __init__(self, curve, x=ModInt(), y=ModInt(), z=ModInt()):
+    def __init__(self, curve, x=None, y=None, z=None):
         self.c = curve
-        self.x = x
-        self.y = y
-        self.z = z
+        self.x = ModInt(curve.p) if x is None else x
+        self.y = ModInt(curve.p) if y is None else y
+        self.z = ModInt(curve.p) if z is None else z
 
     def string(self):
         return (self.x.v, self.y.v, self.z.v)
@@ -77,7 +94,7 @@ class projEdwardsPoint(edwards.EdwardsPoint, object):
         zz.mul(z, z)
         l.mul(self.c.a, xx).add(l, yy).mul(l, zz)
         m.mul(self.c.d, xx).mul(m, yy)
-        r.exp(zz, ModInt(P, 2)).add(r, m)
+        r.exp(zz, self.c.context.two).add(r, m)
         return l.equal(r)
 
     def identity(self):
@@ -153,7 +170,7 @@ class projEdwardsPoint(edwards.EdwardsPoint, object):
         x, y, z = p.x, p.y, p.z
         # print("\nDoubling", p.string())
         P = self.c.p
-        two = ModInt(P, 2)
+        two = self.c.context.two
         B, C, D, E, F, H, J = ModInt(P), ModInt(P), ModInt(P), ModInt(P), ModInt(P), ModInt(P), ModInt(P)
 
         B.exp(B.add(x, y), two)
@@ -0,0 +1,268 @@
+"""
+Differential and performance comparison against reference implementations.
+
+The reference libraries are optional and used only here: pysodium
+(libsodium's Ed25519 and X25519) and the ed25519 package (python-ed25519, a
+wrapper of the SUPERCOP ref10 code, without X25519). Every installed one is
+run next to edecc on the same randomized inputs: compare() returns the
+inputs on which their outputs differ, throughput() measures the operations
+per second of each implementation and report() prints them with the speed
+of each reference relative to edecc.
+
+    python -m edecc.reference [--count N] [--seed SEED]
+
+exits with status 1 if any output differs.
+"""
+
+import argparse
+import random
+import sys
+import time
+from .eddsa import edwardsPrivateKey, edwardsPublicKey
+from . import curve25519
+from . import ed25519
+from . import extended
+
+operations = ('keygen', 'sign', 'verify', 'x25519', 'x25519_base')
+max_message = 256 # longest random message, in bytes
+
+class Edecc(object):
+    """
+    edecc behind the interface shared with the references: keygen(seed)
+    returns the public key of a 32-byte seed, signer(seed) a function signing
+    a message into 64 bytes, verifier(pk) a function (m, sig) -> bool, and
+    x25519(k, u), x25519_base(k) the RFC 7748 function (None when the library
+    has none).
+    """
+
+    name = 'edecc'
+
+    def __init__(self, group=None):
+        self.group = group or extended.extEdwardsCurve(ed25519.ed25519())
+
+    def keygen(self, seed):
+        return edwardsPrivateKey(self.group, seed).element
+
+    def signer(self, seed):
+        key = edwardsPrivateKey(self.group, seed)
+        return lambda m: b''.join(key.sign(m))
+
+    def verifier(self, pk):
+        key = edwardsPublicKey(self.group, pk)
+        return lambda m, sig: key.verify(m, sig)
+
+    def x25519(self, k, u):
+        return curve25519.x25519(k, u)
+
+    def x25519_base(self, k):
+        return curve25519.x25519_base(k, self.group)
+
+class Sodium(object):
+    """
+    libsodium, through pysodium.
+    """
+
+    name = 'pysodium'
+
+    def __init__(self):
+        import pysodium
+        self.lib = pysodium
+
+    def keygen(self, seed):
+        return self.lib.crypto_sign_seed_keypair(seed)[0]
+
+    def signer(self, seed):
+        sk = self.lib.crypto_sign_seed_keypair(seed)[1]
+        return lambda m: self.lib.crypto_sign_detached(m, sk)
+
+    def verifier(self, pk):
+        def verify(m, sig):
+            try:
+                self.lib.crypto_sign_verify_detached(sig, m, pk)
+            except ValueError:
+                return False
+            return True
+        return verify
+
+    def x25519(self, k, u):
+        return self.lib.crypto_scalarmult_curve25519(k, u)
+
+    def x25519_base(self, k):
+        return self.lib.crypto_scalarmult_curve25519_base(k)
+
+class Ed25519Package(object):
+    """
+    The ed25519 package (python-ed25519).
+    """
+
+    name = 'ed25519'
+    x25519 = x25519_base = None
+
+    def __init__(self):
+        import ed25519
+        if not hasattr(ed25519, 'SigningKey'):
+            raise ImportError("ed25519 is not python-ed25519")
+        self.lib = ed25519
+
+    def keygen(self, seed):
+        return self.lib.SigningKey(seed).get_verifying_key().to_bytes()
+
+    def signer(self, seed):
+        return self.lib.SigningKey(seed).sign
+
+    def verifier(self, pk):
+        key = self.lib.VerifyingKey(pk)
+        def verify(m, sig):
+            try:
+                key.verify(sig, m)
+            except self.lib.BadSignatureError:
+                return False
+            return True
+        return verify
+
+libraries = (Sodium, Ed25519Package)
+
+def references():
+    """
+    Instances of the reference libraries that can be imported.
+    """
+    found = []
+    for library in libraries:
+        try:
+            found.append(library())
+        except (ImportError, OSError, AttributeError):
+            pass
+    return found
+
+def _random_bytes(rand, n):
+    return rand.getrandbits(8 * n).to_bytes(n, 'little') if n else b''
+
+def _corrupt(rand, pk, m, sig):
+    """
+    (pk, m, sig) with one random bit of one of them flipped.
+    """
+    parts = [bytearray(pk), bytearray(m), bytearray(sig)]
+    part = parts[rand.choice([0, 2] if not m else [0, 1, 2])]
+    bit = rand.randrange(8 * len(part))
+    part[bit // 8] ^= 1 << (bit % 8)
+    return tuple(bytes(x) for x in parts)
+
+def compare(count=100, seed=None, impl=None, refs=None):
+    """
+    Runs impl (edecc by default) and every reference on count random seeds,
+    messages, corrupted signatures and X25519 inputs, and returns the
+    mismatches as (operation, reference name, hex of the inputs) tuples. A
+    valid signature must verify under both implementations; a corrupted one
+    (one bit of the key, message or signature flipped) must get the same
+    verdict from both.
+    """
+    rand = random.Random(seed)
+    impl = impl or Edecc()
+    refs = references() if refs is None else refs
+    mismatches = []
+
+    def check(op, ref, inputs, ours, theirs):
+        if ours != theirs:
+            mismatches.append((op, ref.name, b''.join(inputs).hex()))
+
+    for i in range(count):
+        s = _random_bytes(rand, 32)
+        m = _random_bytes(rand, rand.randrange(max_message + 1))
+        k, u = _random_bytes(rand, 32), _random_bytes(rand, 32)
+        pk = impl.keygen(s)
+        sig = impl.signer(s)(m)
+        bad = _corrupt(rand, pk, m, sig)
+        for ref in refs:
+            check('keygen', ref, [s], pk, ref.keygen(s))
+            check('sign', ref, [s, m], sig, ref.signer(s)(m))
+            valid = (impl.verifier(pk)(m, sig), ref.verifier(pk)(m, sig))
+            check('verify', ref, [pk, m, sig], valid, (True, True))
+            bpk, bm, bsig = bad
+            check('verify', ref, [bpk, bm, bsig], impl.verifier(bpk)(bm, bsig),
+                  ref.verifier(bpk)(bm, bsig))
+            if ref.x25519 is not None:
+                check('x25519', ref, [k, u], impl.x25519(k, u), ref.x25519(k, u))
+                check('x25519_base', ref, [k], impl.x25519_base(k), ref.x25519_base(k))
+    return mismatches
+
+def throughput(count=100, seed=None, impl=None, refs=None):
+    """
+    Operations per second of impl and every reference, as a dictionary
+    operation -> name -> ops/s. Every implementation runs on the same count
+    inputs: keygen on seeds, sign on messages with one key, verify on their
+    signatures with one public key, x25519 on (scalar, u) pairs (a key
+    exchange) and x25519_base on scalars (an X25519 key generation).
+    """
+    rand = random.Random(seed)
+    impl = impl or Edecc()
+    refs = references() if refs is None else refs
+    s = _random_bytes(rand, 32)
+    seeds = [_random_bytes(rand, 32) for i in range(count)]
+    messages = [_random_bytes(rand, 64) for i in range(count)]
+    scalars = [_random_bytes(rand, 32) for i in range(count)]
+    points = [impl.x25519_base(_random_bytes(rand, 32)) for i in range(count)]
+    pk = impl.keygen(s)
+    sign = impl.signer(s)
+    signatures = [sign(m) for m in messages]
+
+    def rate(f, args):
+        t0 = time.perf_counter()
+        for a in args:
+            f(*a)
+        return len(args) / (time.perf_counter() - t0)
+
+    results = dict((op, {}) for op in operations)
+    for lib in [impl] + list(refs):
+        results['keygen'][lib.name] = rate(lib.keygen, [(x,) for x in seeds])
+        results['sign'][lib.name] = rate(lib.signer(s), [(m,) for m in messages])
+        results['verify'][lib.name] = rate(lib.verifier(pk), list(zip(messages, signatures)))
+        if lib.x25519 is not None:
+            results['x25519'][lib.name] = rate(lib.x25519, list(zip(scalars, points)))
+            results['x25519_base'][lib.name] = rate(lib.x25519_base, [(k,) for k in scalars])
+    return results
+
+def ratios(results, name='edecc'):
+    """
+    operation -> reference name -> how many times faster the reference is
+    than the implementation name, from the results of throughput.
+    """
+    return dict((op, dict((lib, rate / ops[name]) for lib, rate in ops.items()
+                          if lib != name))
+                for op, ops in results.items())
+
+def report(results, name='edecc', file=None):
+    """
+    Prints the results of throughput, with the ratios of every reference.
+    """
+    file = file or sys.stdout
+    relative = ratios(results, name)
+    for op in operations:
+        ops = results.get(op, {})
+        if name not in ops:
+            continue
+        line = "%-12s %s %9.0f/s" % (op, name, ops[name])
+        for lib in sorted(relative[op]):
+            line += "   %s %9.0f/s (x%.1f)" % (lib, ops[lib], relative[op][lib])
+        print(line, file=file)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m edecc.reference',
+        description='Compare edecc with reference Ed25519/X25519 libraries.')
+    parser.add_argument('--count', type=int, default=100,
+                        help='random inputs per operation')
+    parser.add_argument('--seed', type=int, help='seed of the random inputs')
+    args = parser.parse_args(argv)
+
+    refs = references()
+    missing = set(library.name for library in libraries) - set(ref.name for ref in refs)
+    if missing:
+        print("not installed: %s" % ", ".join(sorted(missing)))
+    mismatches = compare(args.count, args.seed, refs=refs)
+    for op, lib, inputs in mismatches:
+        print("MISMATCH %s vs %s: %s" % (op, lib, inputs))
+    print("%d mismatches in %d random inputs per operation" % (len(mismatches), args.count))
+    report(throughput(args.count, args.seed, refs=refs))
+    return 1 if mismatches else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,88 @@
+"""
+Buffered cryptographically secure randomness for secrets, nonces and seeds.
+"""
+
+import os
+import threading
+import weakref
+
+block = 64 * 1024 # bytes read from os.urandom per refill
+extra = 8 # bytes drawn beyond the size of a modulus, see RandomPool.below
+
+class RandomPool(object):
+    """
+    Serves random bytes and integers out of large blocks read from the
+    operating system's CSPRNG (os.urandom), so that drawing a secret costs a
+    slice and a reduction rather than a system call.
+
+    The pool is safe to share between threads (reads are serialized by a
+    lock) and between processes: a forked child discards the buffer it
+    inherited and reads a fresh block, so parent and child never hand out
+    the same bytes.
+
+    Attributes:
+        - block: number of bytes read from os.urandom per refill
+    """
+
+    def __init__(self, size=block):
+        self.block = size
+        self._reset()
+        _pools.add(self)
+
+    def _reset(self):
+        """
+        Drops the buffered bytes; called in the child after a fork.
+        """
+        self.buffer = b''
+        self.offset = 0
+        self.lock = threading.Lock()
+
+    def read(self, n):
+        """
+        Returns n random bytes.
+        """
+        with self.lock:
+            start = self.offset
+            end = start + n
+            if end > len(self.buffer):
+                self.buffer = os.urandom(max(self.block, n))
+                start, end = 0, n
+            self.offset = end
+            return self.buffer[start:end]
+
+    def below(self, n):
+        """
+        Returns a random integer in [0, n), by reducing an integer `extra`
+        bytes wider than n modulo n (wide reduction): the bias is below
+        2^-64, without the retries of rejection sampling.
+        """
+        size = (n.bit_length() + 7) // 8 + extra
+        return int.from_bytes(self.read(size), 'little') % n
+
+    def secret(self, n):
+        """
+        Returns a random integer in [1, n - 1].
+        """
+        return 1 + self.below(n - 1)
+
+    def secrets(self, n, count):
+        """
+        Returns count random integers in [1, n - 1], drawn from a single read.
+        """
+        size = (n.bit_length() + 7) // 8 + extra
+        data = self.read(size * count)
+        return [1 + int.from_bytes(data[i:i + size], 'little') % (n - 1)
+                for i in range(0, size * count, size)]
+
+# Live pools, reset in the child after a fork by a single hook (so that
+# pools do not each register a callback that would keep them alive).
+_pools = weakref.WeakSet()
+
+def _after_fork():
+    for p in list(_pools):
+        p._reset()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork)
+
+pool = RandomPool()
@@ -0,0 +1,59 @@
+"""
+Scalars modulo the prime order r of a curve's base point.
+"""
+
+from .modular import ModInt, batch_inverse
+
+size = 32 # bytes in the canonical encoding of a scalar
+
+class Scalar(ModInt):
+    """
+    An integer modulo the group order r rather than the field prime p; the
+    type of secrets, nonces and signature values. Reducing modulo r keeps
+    scalars below 2^253 on ed25519, so scalar multiplications never process
+    more bits than the group needs.
+
+    Attributes:
+        - p: the group order, as a ModInt (e.g. curve.r)
+        - v: the value of the scalar
+    """
+
+    def __init__(self, r=None, v=None):
+        ModInt.__init__(self, r, v)
+
+    def from_hash(self, digest):
+        """
+        Sets the scalar to the digest (e.g. a 64-byte SHA-512 output), read
+        as a little-endian integer, reduced modulo r.
+        """
+        self.v = int.from_bytes(digest, 'little') % self.p.v
+        return self
+
+    def from_bytes(self, s):
+        """
+        Decodes the canonical little-endian encoding of a scalar. Encodings
+        of the wrong length or of values >= r are rejected.
+        """
+        if len(s) != size:
+            raise ValueError("scalar encoding must be %d bytes" % size)
+        v = int.from_bytes(s, 'little')
+        if v >= self.p.v:
+            raise ValueError("non-canonical scalar encoding")
+        self.v = v
+        return self
+
+    def to_bytes(self):
+        """
+        Returns the canonical 32-byte little-endian encoding of the scalar.
+        """
+        return (self.v % self.p.v).to_bytes(size, 'little')
+
+def batch_inv(scalars):
+    """
+    Inverts a list of nonzero scalars (sharing the same modulus) with a
+    single modular inversion, see modular.batch_inverse.
+    """
+    if not scalars:
+        return []
+    r = scalars[0].p
+    return [Scalar(r, v) for v in batch_inverse([s.v for s in scalars], r.v)]
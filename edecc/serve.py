@@ -0,0 +1,309 @@
+"""
+Local Ed25519 signing and verification daemon (edecc-serve).
+
+Application processes on a host send requests over a Unix domain socket
+and share one process's warm fixed-base tables. Requests are collected into
+micro-batches: a batch is processed as soon as it holds `batch` requests or
+`latency` seconds after its first request arrived, signatures with
+edwardsPrivateKey.sign_many and verifications with one randomized batch
+equation (eddsa.verify_batch, in a VerifierPool when workers are
+configured).
+
+Framing: every frame is a 4-byte big-endian body length followed by the
+body. A request body is op (1 byte) || request id (4 bytes) || payload:
+    SIGN    payload = message; signed with the daemon's key
+    VERIFY  payload = public key (32) || signature (64) || message
+    PUBKEY  payload = empty
+A response body is request id (4 bytes) || status (1 byte) || payload,
+with status OK (payload = the signature for SIGN, the public key for
+PUBKEY), INVALID (a signature that does not verify) or ERROR.
+"""
+
+import argparse
+import asyncio
+import os
+import signal
+import socket
+import struct
+from concurrent.futures import ThreadPoolExecutor
+from .eddsa import edwardsPrivateKey, edwardsPublicKey, verify_batch
+from .verifierpool import VerifierPool
+from . import tablecache
+from . import ed25519
+from . import extended
+
+SIGN, VERIFY, PUBKEY = 1, 2, 3
+OK, INVALID, ERROR = 0, 1, 2
+
+length = struct.Struct('>I')
+request = struct.Struct('>BI')
+response = struct.Struct('>IB')
+max_frame = 16 * 1024 * 1024 # largest accepted request body
+latency = 0.002 # seconds a request may wait for its batch to fill
+batch_size = 64 # requests processed together
+max_keys = 1024 # public keys cached by the daemon
+socket_mode = 0o600 # permissions of the socket file
+max_queued = 4 * batch_size # requests queued or processing before reads pause
+max_queued_bytes = 64 * 1024 * 1024 # bytes of those requests before reads pause
+
+class Server(object):
+    """
+    The daemon: accepts connections on a Unix socket and answers requests in
+    micro-batches.
+
+    Attributes:
+        - group: the curve the keys compute in
+        - key: the edwardsPrivateKey used for SIGN requests (or None)
+        - pool: a VerifierPool for VERIFY requests (or None to verify in a
+          thread of this process)
+        - latency, batch: the micro-batching budget
+        - executor: the single thread batches are processed in, one at a
+          time (so the key cache is only ever used from that thread)
+        - queued, queued_bytes: requests received and not yet answered, and
+          their size; connections stop being read while either is over its
+          limit (max_queued, max_queued_bytes)
+    """
+
+    def __init__(self, group, key=None, pool=None, latency=latency, batch=batch_size):
+        self.group = group
+        self.key = key
+        self.pool = pool
+        self.latency = latency
+        self.batch = batch
+        self.keys = {}
+        self.pending = []
+        self.timer = None
+        self.queued = 0
+        self.queued_bytes = 0
+        self.drained = None
+        self.executor = ThreadPoolExecutor(1, thread_name_prefix='edecc-serve')
+        group.base_table()
+
+    async def serve(self, path, mode=socket_mode):
+        """
+        Serves on the Unix socket path until cancelled. The socket file gets
+        the permissions mode (by default only its owner may connect, since
+        any client can get signatures from the daemon's key).
+        """
+        self.drained = asyncio.Event()
+        server = await asyncio.start_unix_server(self.handle, path)
+        os.chmod(path, mode)
+        try:
+            await server.serve_forever()
+        finally:
+            server.close()
+            await server.wait_closed()
+
+    async def handle(self, reader, writer):
+        """
+        Reads the request frames of one connection and queues them.
+        """
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                while self.queued >= max_queued or self.queued_bytes >= max_queued_bytes:
+                    self.drained.clear()
+                    await self.drained.wait()
+                n, = length.unpack(await reader.readexactly(length.size))
+                if n < request.size or n > max_frame:
+                    break
+                body = await reader.readexactly(n)
+                op, rid = request.unpack_from(body)
+                self.queued += 1
+                self.queued_bytes += n
+                self.pending.append((op, rid, body[request.size:], writer))
+                if len(self.pending) >= self.batch:
+                    self._flush()
+                elif self.timer is None:
+                    self.timer = loop.call_later(self.latency, self._flush)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    def _flush(self):
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        batch, self.pending = self.pending, []
+        if batch:
+            asyncio.ensure_future(self._run(batch))
+
+    async def _run(self, batch):
+        """
+        Processes a batch and writes its replies; every request of a batch
+        that fails gets an ERROR reply.
+        """
+        loop = asyncio.get_running_loop()
+        try:
+            replies = await loop.run_in_executor(self.executor, self.process, batch)
+        except Exception:
+            replies = [(ERROR, b'')] * len(batch)
+        finally:
+            self.queued -= len(batch)
+            self.queued_bytes -= sum(request.size + len(item[2]) for item in batch)
+            self.drained.set()
+        writers = {}
+        for (op, rid, payload, writer), (status, data) in zip(batch, replies):
+            if not writer.is_closing():
+                body = response.pack(rid, status) + data
+                writer.write(length.pack(len(body)) + body)
+                writers[writer] = None
+        for writer in writers:
+            try:
+                await writer.drain()
+            except ConnectionError:
+                pass
+
+    def process(self, batch):
+        """
+        Computes the (status, payload) replies of a batch of requests.
+        """
+        replies = [(ERROR, b'')] * len(batch)
+        signs, verifies = [], []
+        for i, (op, rid, payload, writer) in enumerate(batch):
+            if op == SIGN and self.key is not None:
+                signs.append(i)
+            elif op == VERIFY and len(payload) >= 96:
+                verifies.append(i)
+            elif op == PUBKEY and self.key is not None:
+                replies[i] = (OK, self.key.element)
+
+        if signs:
+            signatures = self.key.sign_many([batch[i][2] for i in signs])
+            for i, (R, S) in zip(signs, signatures):
+                replies[i] = (OK, R + S)
+
+        if verifies:
+            items = [(bytes(batch[i][2][:32]), batch[i][2][96:], bytes(batch[i][2][32:96]))
+                     for i in verifies]
+            if self.pool is not None:
+                results = self.pool.verify_many(items)
+            else:
+                results = verify_batch([(self._key(pk), msg, sig)
+                                        for pk, msg, sig in items])
+            for i, ok in zip(verifies, results):
+                replies[i] = (OK if ok else INVALID, b'')
+        return replies
+
+    def close(self):
+        """
+        Stops the batch thread.
+        """
+        self.executor.shutdown()
+
+    def _key(self, pk):
+        """
+        The cached edwardsPublicKey of the encoded key pk.
+        """
+        key = self.keys.get(pk)
+        if key is None:
+            if len(self.keys) >= max_keys:
+                del self.keys[next(iter(self.keys))]
+            key = self.keys[pk] = edwardsPublicKey(self.group, pk)
+        return key
+
+class Client(object):
+    """
+    Blocking client of the daemon, one request at a time.
+    """
+
+    def __init__(self, path):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(path)
+        self.rid = 0
+
+    def request(self, op, payload=b''):
+        """
+        Sends one request and returns its (status, payload) reply.
+        """
+        self.rid = (self.rid + 1) & 0xffffffff
+        body = request.pack(op, self.rid) + payload
+        self.sock.sendall(length.pack(len(body)) + body)
+        n, = length.unpack(self._read(length.size))
+        body = self._read(n)
+        rid, status = response.unpack_from(body)
+        if rid != self.rid:
+            raise ValueError("reply to an unexpected request")
+        return status, body[response.size:]
+
+    def sign(self, msg):
+        status, signature = self.request(SIGN, msg)
+        if status != OK:
+            raise ValueError("signing failed")
+        return signature
+
+    def verify(self, pk, msg, sig):
+        return self.request(VERIFY, pk + sig + msg)[0] == OK
+
+    def public_key(self):
+        status, pk = self.request(PUBKEY)
+        if status != OK:
+            raise ValueError("the daemon has no signing key")
+        return pk
+
+    def close(self):
+        self.sock.close()
+
+    def _read(self, n):
+        data = bytearray()
+        while len(data) < n:
+            chunk = self.sock.recv(n - len(data))
+            if not chunk:
+                raise ConnectionError("daemon closed the connection")
+            data += chunk
+        return bytes(data)
+
+async def _serve(server, path, mode=socket_mode):
+    """
+    Runs server.serve(path, mode) until it is cancelled, on SIGTERM
+    included.
+    """
+    task = asyncio.ensure_future(server.serve(path, mode))
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, task.cancel)
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='edecc-serve',
+        description='Micro-batching Ed25519 signing/verification daemon.')
+    parser.add_argument('--socket', required=True, help='Unix socket path')
+    parser.add_argument('--key', help='file holding the 32-byte signing seed')
+    parser.add_argument('--latency', type=float, default=latency * 1000,
+                        help='batching latency budget, in milliseconds')
+    parser.add_argument('--batch', type=int, default=batch_size,
+                        help='maximum requests per batch')
+    parser.add_argument('--workers', type=int, default=0,
+                        help='verification worker processes (0: in process)')
+    parser.add_argument('--mode', type=lambda mode: int(mode, 8), default=socket_mode,
+                        help='permissions of the socket file, in octal (default 600)')
+    parser.add_argument('--tables',
+                        help='fixed-base table cache file, built if missing or stale')
+    args = parser.parse_args(argv)
+
+    group = extended.extEdwardsCurve(ed25519.ed25519())
+    if args.tables:
+        tablecache.warm(group, args.tables)
+    key = None
+    if args.key:
+        with open(args.key, 'rb') as f:
+            key = edwardsPrivateKey(group, f.read(32))
+    pool = VerifierPool(group, args.workers) if args.workers > 0 else None
+    server = Server(group, key, pool, args.latency / 1000, args.batch)
+    if os.path.exists(args.socket):
+        os.unlink(args.socket)
+    try:
+        asyncio.run(_serve(server, args.socket, args.mode))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+        if pool is not None:
+            pool.close()
+        if os.path.exists(args.socket):
+            os.unlink(args.socket)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,225 @@
+"""
+On-disk cache of fixed-base tables.
+
+Building the generator's fixed-base table (and those of pinned public keys)
+takes tens of milliseconds of pure Python, which short-lived processes pay
+on every start. A TableCache file stores the tables packed by
+EdwardsCurve.pack_table, so that a process maps the file and unpacks them
+instead of recomputing them; warm() (re)builds the file when it is missing,
+stale or lacks a requested key.
+
+File layout (little-endian):
+    header: magic, format version, curve digest, number of tables, bytes
+            per table
+    tables: encoded point (32 bytes) || packed table, the generator first
+    SHA-256 of everything above
+The curve digest covers the curve parameters and the table radix, so a file
+written for other parameters (or an older layout) is detected as stale. The
+packed tables hold affine coordinates, so any coordinate system of the curve
+can load them.
+"""
+
+import hashlib
+import mmap
+import os
+import struct
+from .eddsa import edwardsPublicKey
+from . import edwards
+
+magic = b'EDTABLES'
+version = 1
+header = struct.Struct('<8sI32sII') # magic, version, curve digest, tables, bytes per table
+key_size = 32 # bytes of an encoded point
+digest_size = 32 # bytes of the trailing SHA-256
+
+def curve_digest(group):
+    """
+    SHA-256 of the parameters of group and of the table layout.
+    """
+    c = group.context
+    p = c.p.v
+    params = (p, c.a.v % p, c.d.v % p, c.r.v, c.gx.v % p, c.gy.v % p, edwards.radix)
+    return hashlib.sha256(repr(params).encode()).digest()
+
+def default_path(group):
+    """
+    The cache file of group: $EDECC_TABLES if set, else a file named after
+    the curve digest in ~/.cache/edecc.
+    """
+    if os.environ.get('EDECC_TABLES'):
+        return os.environ['EDECC_TABLES']
+    return os.path.join(os.path.expanduser('~'), '.cache', 'edecc',
+                        'tables-%s.bin' % curve_digest(group).hex()[:16])
+
+class TableCache(object):
+    """
+    The fixed-base tables of a curve's generator and pinned public keys,
+    stored in a file.
+
+    Attributes:
+        - group: the curve (coordinate system) the tables are unpacked for
+        - path: the cache file
+        - offsets: encoded point -> offset of its packed table in the file,
+          for the tables of the loaded file
+    """
+
+    def __init__(self, group, path=None):
+        self.group = group
+        self.path = path or default_path(group)
+        self.offsets = {}
+        self.size = 0
+        self.data = None
+        self.tables = {}
+
+    def load(self):
+        """
+        Maps the file, validates it and installs the generator's table in
+        the curve's table cache; pinned tables are unpacked on first use.
+        Raises OSError if the file cannot be read and ValueError if it is
+        corrupt or stale.
+        """
+        self.close()
+        with open(self.path, 'rb') as f:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            if len(data) < header.size + digest_size:
+                raise ValueError("truncated table cache")
+            tag, v, digest, count, size = header.unpack_from(data, 0)
+            if tag != magic or v != version:
+                raise ValueError("not a table cache of this version")
+            if digest != curve_digest(self.group):
+                raise ValueError("table cache of another curve")
+            end = header.size + count * (key_size + size)
+            if count == 0 or len(data) != end + digest_size:
+                raise ValueError("truncated table cache")
+            with memoryview(data) as view:
+                checksum = hashlib.sha256(view[:end]).digest()
+            if checksum != data[end:]:
+                raise ValueError("table cache checksum mismatch")
+        except ValueError:
+            data.close()
+            raise
+
+        offsets = {}
+        for offset in range(header.size, end, key_size + size):
+            offsets[data[offset:offset + key_size]] = offset + key_size
+        self.data, self.size, self.offsets = data, size, offsets
+
+        group = self.group
+        base = group.encode_point(group.base)
+        if base not in offsets:
+            self.close()
+            raise ValueError("table cache without the generator")
+        group.tables[group.base.string()] = self.table(base)
+        return self
+
+    def keys(self):
+        """
+        The encoded public keys pinned in the loaded file.
+        """
+        base = self.group.encode_point(self.group.base)
+        return [pk for pk in self.offsets if pk != base]
+
+    def table(self, pk):
+        """
+        The fixed-base table of the point encoded as pk: unpacked from the
+        file if it is there, computed otherwise. A table from the file whose
+        first point is not pk's (a tampered file) is recomputed as well.
+        """
+        table = self.tables.get(pk)
+        if table is None:
+            offset = self.offsets.get(pk)
+            if offset is not None:
+                try:
+                    with memoryview(self.data) as view:
+                        table = self.group.unpack_table(view[offset:offset + self.size], pk)
+                except ValueError:
+                    table = None
+            if table is None:
+                table = edwardsPublicKey(self.group, pk).precompute()
+            self.tables[pk] = table
+        return table
+
+    def public_key(self, pk):
+        """
+        An edwardsPublicKey for pk with its fixed-base table preset.
+        """
+        key = edwardsPublicKey(self.group, pk)
+        key.table = self.table(pk)
+        key.A = key.table[0][0]
+        return key
+
+    def save(self, keys=()):
+        """
+        Writes the generator's table and those of the encoded public keys
+        keys to the file, atomically (readers see the old or the new file).
+        Tables already in memory are reused.
+        """
+        group = self.group
+        base = group.encode_point(group.base)
+        entries = [(base, group.pack_table(group.base_table()))]
+        for pk in sorted(set(keys) - {base}):
+            entries.append((pk, group.pack_table(self.table(pk))))
+
+        size = len(entries[0][1])
+        h = hashlib.sha256()
+        h.update(header.pack(magic, version, curve_digest(group), len(entries), size))
+        for pk, packed in entries:
+            h.update(pk)
+            h.update(packed)
+
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        tmp = '%s.%d.tmp' % (self.path, os.getpid())
+        try:
+            with open(tmp, 'wb') as f:
+                f.write(header.pack(magic, version, curve_digest(group), len(entries), size))
+                for pk, packed in entries:
+                    f.write(pk)
+                    f.write(packed)
+                f.write(h.digest())
+            os.replace(tmp, self.path)
+        finally:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+        return self
+
+    def close(self):
+        """
+        Unmaps the file. Tables already unpacked stay usable.
+        """
+        if self.data is not None:
+            self.data.close()
+            self.data = None
+        self.offsets = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def warm(group, path=None, keys=()):
+    """
+    Returns a loaded TableCache of group, first (re)writing its file if it
+    is missing, stale, corrupt or lacks one of the encoded public keys keys.
+    If the file cannot be written, the tables are built in memory and the
+    returned cache computes the missing ones on use.
+    """
+    cache = TableCache(group, path)
+    keys = set(keys)
+    try:
+        cache.load()
+        if keys <= set(cache.offsets):
+            return cache
+        keys |= set(cache.keys())
+    except (OSError, ValueError):
+        pass
+
+    tables = dict(cache.tables)
+    cache.close()
+    cache.tables = tables
+    try:
+        return cache.save(keys).load()
+    except (OSError, ValueError):
+        return cache
@@ -1,7 +1,7 @@
-from edwards import EdwardsCurve
-import mont
-from utils import string_to_long
-from modular import ModInt
+from .edwards import EdwardsCurve
+from . import mont
+from .utils import string_to_long
+from .modular import ModInt
 
 """
 These "safe curves" are obtained from
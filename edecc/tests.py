@@ -1,20 +1,47 @@
 import unittest
 import time
+import os
+import io
+import mmap
+import pickle
+import tempfile
 import random
 import string
-#from pysodium import crypto_sign, crypto_scalarmult_curve25519, crypto_scalarmult_curve25519_base
-# need to figure out how to use relative imports
-from elgamal import ElGamal, PrivateKey
-import edwards
-import inv
-import proj
-import mont
-import xz
-import extended
-import ed25519
-import curve25519
-from eddsa import edwardsPrivateKey
-from modular import ModInt
+import threading
+import weakref
+import gc
+import asyncio
+import subprocess
+import sys
+import hashlib
+# run from the repository root: python -m edecc.tests
+from edecc.elgamal import ElGamal, PrivateKey
+from edecc import elgamal, eddsa, edwards, inv, proj, mont, xz, extended
+from edecc import ed25519, curve25519, dlog, rng, aio, serve, values
+from edecc import context, tablecache, modular, reference, verifierpool
+from edecc.eddsa import edwardsPrivateKey
+from edecc.modular import ModInt
+from edecc.scalar import Scalar, batch_inv
+from edecc.verifierpool import VerifierPool
+from concurrent.futures import ThreadPoolExecutor
+
+def barrett_constant(r, bits=512):
+    """
+    mu = floor(2^bits / r), for Barrett reduction of bits-bit integers.
+    """
+    return (1 << bits) // r
+
+def reduce_barrett(x, r, mu, bits=512):
+    """
+    Barrett reduction of a non-negative x < 2^bits modulo r: the quotient is
+    estimated as (x * mu) >> bits, off by at most two, and corrected by
+    subtraction. Kept here as the baseline of test_scalar, which shows it
+    slower than % on CPython's integers (so Scalar.from_hash uses %).
+    """
+    x -= ((x * mu) >> bits) * r
+    while x >= r:
+        x -= r
+    return x
 
 class Test(unittest.TestCase):
     """
@@ -48,6 +75,1043 @@ class Test(unittest.TestCase):
          #self.timing(self.extended)
          self.data_plotter(self.extended)
 
+    def test_hybrid(self):
+        """
+        Hybrid (ECIES-style) encryption round trips, including payloads far
+        beyond the capacity of a single encoded point.
+        """
+        for group in (self.extended, self.projective):
+            x0 = PrivateKey(group)
+            y0 = x0.public_key()
+            x1 = PrivateKey(group)
+            for data in (b"", b"hello", os.urandom(100000)):
+                encrypted = y0.encrypt_hybrid(data)
+                self.assertEqual(x0.decrypt_hybrid(encrypted), data)
+                self.assertEqual(len(encrypted), len(data) + 96)
+            self.assertEqual(x0.decrypt_hybrid(y0.encrypt_hybrid(b"a", b"ctx"),
+                b"ctx"), b"a")
+
+            encrypted = bytearray(y0.encrypt_hybrid(b"hello"))
+            self.assertRaises(ValueError, x1.decrypt_hybrid, bytes(encrypted))
+            encrypted[70] ^= 1
+            self.assertRaises(ValueError, x0.decrypt_hybrid, bytes(encrypted))
+            encrypted[70] ^= 1
+            encrypted[0] ^= 1
+            self.assertRaises(ValueError, x0.decrypt_hybrid, bytes(encrypted))
+
+        data = os.urandom(4 * 1024 * 1024)
+        t0 = time.time()
+        encrypted = y0.encrypt_hybrid(data)
+        time1 = time.time() - t0
+        t1 = time.time()
+        self.assertEqual(x0.decrypt_hybrid(encrypted), data)
+        time2 = time.time() - t1
+        print("\nHybrid encryption of 4 MiB: encrypt: ", time1, "decrypt: ", time2)
+
+    def test_stream(self):
+        """
+        Streaming hybrid encryption over file objects, buffers and mmaps.
+        """
+        x0 = PrivateKey(self.extended)
+        y0 = x0.public_key()
+        size = 1000
+        for n in (0, 1, size, 3 * size, 3 * size + 17):
+            data = os.urandom(n)
+            out = io.BytesIO()
+            y0.encrypt_stream(io.BytesIO(data), out, size)
+            encrypted = out.getvalue()
+            self.assertEqual(len(encrypted), 68 + n + 32 * (n // size + 1))
+
+            out = io.BytesIO()
+            self.assertEqual(x0.decrypt_stream(io.BytesIO(encrypted), out), n)
+            self.assertEqual(out.getvalue(), data)
+            out = io.BytesIO()
+            x0.decrypt_stream(encrypted, out)
+            self.assertEqual(out.getvalue(), data)
+
+        # truncated, reordered and extended streams are rejected
+        frame = size + 32
+        for bad in (encrypted[:-frame], encrypted[:68 + frame],
+                    encrypted[:68] + encrypted[68 + frame:68 + 2 * frame] +
+                    encrypted[68:68 + frame] + encrypted[68 + 2 * frame:],
+                    encrypted + b"\x00", encrypted[:60]):
+            self.assertRaises(ValueError, x0.decrypt_stream, bad, io.BytesIO())
+
+        # a forged frame size is rejected before any buffer is allocated
+        for forged_size in (0, elgamal.max_chunk_size + 1, 2**32 - 1):
+            forged = encrypted[:64] + forged_size.to_bytes(4, 'big') + encrypted[68:]
+            self.assertRaises(ValueError, x0.decrypt_stream, io.BytesIO(forged), io.BytesIO())
+        self.assertRaises(ValueError, y0.encrypt_stream, io.BytesIO(b"a"), io.BytesIO(),
+                          elgamal.max_chunk_size + 1)
+
+        with tempfile.TemporaryFile() as f:
+            data = os.urandom(5 * size + 3)
+            f.write(data)
+            f.flush()
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+                out = io.BytesIO()
+                y0.encrypt_stream(m, out, size)
+            out.seek(0)
+            decrypted = io.BytesIO()
+            x0.decrypt_stream(out, decrypted)
+            self.assertEqual(decrypted.getvalue(), data)
+
+    def test_encrypt_many(self):
+        """
+        Batch ElGamal encryption with fixed-base tables and shared
+        normalization, against single-message encryption.
+        """
+        for group in (self.extended, self.projective):
+            x0 = PrivateKey(group)
+            y0 = x0.public_key()
+            msgs = [b"", b"a", b"Hello", b"abcdefghijklmnopqrstuvxyzab"] + \
+                [os.urandom(20) for i in range(10)]
+            encrypted = y0.encrypt_many(msgs)
+            self.assertEqual([x0.decrypt(c) for c in encrypted], msgs)
+            for c1, c2 in encrypted:
+                self.assertTrue(c1.z.equal(group.one) and c2.z.equal(group.one))
+            self.assertEqual([p.decode(p) for p in group.encode_many(msgs)], msgs)
+
+            ref = self.ed.point()
+            for i in range(5):
+                k = group.secret()
+                r = group.point().random_element()
+                prod = group.point().multiply_fixed(group.fixed_table(r), k)
+                ref.multiply(r.to_ep(r), k)
+                self.assertTrue(prod.to_ep(prod).equal(ref))
+                prod.multiply_fixed(group.base_table(), k)
+                ref.multiply(self.ed.point().generator(), k)
+                self.assertTrue(prod.to_ep(prod).equal(ref))
+
+            points = [group.point().random_element() for i in range(5)]
+            for pt, ed in zip(points, group.batch_to_ep(points)):
+                self.assertTrue(pt.to_ep(pt).equal(ed))
+
+        n = 20
+        msgs = [os.urandom(20) for i in range(n)]
+        t0 = time.time()
+        for m in msgs:
+            y0.encrypt(m)
+        time1 = (time.time() - t0)/n
+        t1 = time.time()
+        y0.encrypt_many(msgs)
+        time2 = (time.time() - t1)/n
+        print("\nElGamal avgtime: encrypt: ", time1, "encrypt_many: ", time2)
+
+    def test_fixed_table_cache(self):
+        """
+        The fixed-base table cache evicts the least recently used table and
+        never the generator's.
+        """
+        group = self.projective
+        limit = edwards.max_tables
+        saved = dict(group.tables)
+        group.tables.clear()
+        edwards.max_tables = 3
+        try:
+            base = group.base_table()
+            points = [group.point().random_element() for i in range(4)]
+            tables = [group.fixed_table(points[0])]
+            group.base_table()
+            tables.append(group.fixed_table(points[1]))
+            group.fixed_table(points[0])
+            tables.append(group.fixed_table(points[2]))
+            self.assertIs(group.fixed_table(points[0]), tables[0])
+            self.assertIsNot(group.fixed_table(points[1]), tables[1])
+            for P in points:
+                group.fixed_table(P)
+            self.assertEqual(len(group.tables), 3)
+            self.assertIs(group.base_table(), base)
+        finally:
+            edwards.max_tables = limit
+            group.tables.clear()
+            group.tables.update(saved)
+
+    def test_exp_elgamal(self):
+        """
+        Exponential ElGamal: homomorphic addition and baby-step giant-step
+        decryption, with the table stored in (and memory-mapped from) a file.
+        """
+        group = self.extended
+        x0 = PrivateKey(group)
+        y0 = x0.public_key()
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, "dlog")
+            table = dlog.DlogTable(group, bits=20, baby_bits=8, path=path)
+            self.assertIsNone(table.entries)
+            for m in (0, 1, 255, 256, 257, 513, 2**20 - 1, 12345):
+                self.assertEqual(x0.decrypt_exp(y0.encrypt_exp(m), table), m)
+            self.assertTrue(os.path.exists(path))
+
+            total, encrypted = 0, y0.encrypt_exp(0)
+            for i in range(10):
+                m = random.randrange(1000)
+                total += m
+                encrypted = group.add_exp(encrypted, y0.encrypt_exp(m))
+            self.assertEqual(x0.decrypt_exp(encrypted, table), total)
+            self.assertRaises(ValueError, x0.decrypt_exp,
+                y0.encrypt_exp(2**20), table)
+            self.assertEqual(x0.decrypt_exp(y0.encrypt_exp(2**20 - 1, bits=20), table),
+                             2**20 - 1)
+            for m, bits in ((-1, 20), (2**20, 20), (-1, 32), (2**32, 32)):
+                self.assertRaises(ValueError, y0.encrypt_exp, m, bits)
+
+            loaded = dlog.DlogTable(group, bits=20, baby_bits=8, path=path).load()
+            self.assertIsInstance(loaded.entries, memoryview)
+            self.assertEqual(list(loaded.entries), list(table.entries))
+            self.assertEqual(x0.decrypt_exp(y0.encrypt_exp(4242), loaded), 4242)
+
+            # concurrent saves of the same table from two processes
+            pids = []
+            for i in range(2):
+                pid = os.fork()
+                if pid == 0:
+                    for j in range(5):
+                        table.save(path)
+                    os._exit(0)
+                pids.append(pid)
+            for pid in pids:
+                self.assertEqual(os.waitpid(pid, 0)[1], 0)
+            self.assertEqual(os.listdir(d), ["dlog"])
+            loaded = dlog.DlogTable(group, bits=20, baby_bits=8, path=path).load()
+            self.assertEqual(list(loaded.entries), list(table.entries))
+
+            # a table for other parameters is rebuilt rather than trusted
+            other = dlog.DlogTable(group, bits=20, baby_bits=6, path=path).load()
+            self.assertNotIsInstance(other.entries, memoryview)
+            self.assertEqual(x0.decrypt_exp(y0.encrypt_exp(4242), other), 4242)
+
+    def test_dlog_tables(self):
+        """
+        Shared dlog tables are per curve, not per coordinate system name.
+        """
+        c = self.ed.context
+        G = self.ed.point().double(self.ed.base)
+        ctx = context.CurveContext(c.name, c.p, c.d, c.a, c.r,
+                                   ModInt(c.p, G.x.v), ModInt(c.p, G.y.v))
+        other = extended.extEdwardsCurve(edwards.EdwardsCurve(c.name, c.p, c.d, c.a, c.r,
+            ModInt(c.p, G.x.v), ModInt(c.p, G.y.v), ctx))
+        self.assertEqual(other.name, self.extended.name)
+        t1 = dlog.table(self.extended, bits=8, baby_bits=4)
+        t2 = dlog.table(other, bits=8, baby_bits=4)
+        self.assertIsNot(t1, t2)
+        self.assertIs(dlog.table(extended.extEdwardsCurve(self.ed), bits=8, baby_bits=4), t1)
+        for group, table in ((self.extended, t1), (other, t2)):
+            M = group.point().multiply(group.point().generator(), ModInt(c.p, 200))
+            self.assertEqual(table.log(M), 200)
+
+    def test_decrypt_many(self):
+        """
+        Batch and process-parallel decryption against single decryption,
+        and windowed multiplication against the reference multiply.
+        """
+        for group in (self.extended, self.projective):
+            x0 = PrivateKey(group)
+            y0 = x0.public_key()
+            msgs = [os.urandom(20) for i in range(10)]
+            encrypted = [y0.encrypt(m) for m in msgs]
+            self.assertEqual(x0.decrypt_many(encrypted), msgs)
+            self.assertEqual(x0.decrypt_many(encrypted, workers=3), msgs)
+            self.assertEqual(x0.decrypt_many([]), [])
+
+            for i in range(5):
+                k = group.secret()
+                r = group.point().random_element()
+                prod = group.point().multiply_window(r, k)
+                ref = group.point().multiply(r, k)
+                self.assertTrue(prod.to_ep(prod).equal(ref.to_ep(ref)))
+
+    def test_rerandomize_many(self):
+        """
+        Re-randomized ciphertexts decrypt to the same messages but share no
+        points with the originals.
+        """
+        for group in (self.extended, self.projective):
+            x0 = PrivateKey(group)
+            y0 = x0.public_key()
+            msgs = [os.urandom(20) for i in range(5)]
+            encrypted = y0.encrypt_many(msgs)
+            mixed = y0.rerandomize_many(encrypted)
+            self.assertEqual([x0.decrypt(c) for c in mixed], msgs)
+            self.assertEqual(x0.decrypt_many(y0.rerandomize_many(mixed)), msgs)
+            for (a1, a2), (b1, b2) in zip(encrypted, mixed):
+                self.assertFalse(a1.equal(b1) or a2.equal(b2))
+
+            tables = (group.base_table(), group.fixed_table(y0.element))
+            k = group.secret()
+            rG, rK = group.multiply_fixed_many(tables, k)
+            ref = group.point().multiply(group.point().generator(), k)
+            self.assertTrue(rG.to_ep(rG).equal(ref.to_ep(ref)))
+            ref = group.point().multiply(y0.element, k)
+            self.assertTrue(rK.to_ep(rK).equal(ref.to_ep(ref)))
+
+    def test_scalar(self):
+        """
+        Scalars live modulo r: encoding, hash reduction, batch inversion.
+        """
+        r = self.ed.r
+        for i in range(20):
+            k = self.extended.secret()
+            self.assertTrue(0 < k.v < r.v)
+            self.assertEqual(Scalar(r).from_bytes(k.to_bytes()).v, k.v)
+        self.assertRaises(ValueError, Scalar(r).from_bytes, r.v.to_bytes(32, 'little'))
+        self.assertRaises(ValueError, Scalar(r).from_bytes, bytes(31))
+
+        mu = barrett_constant(r.v)
+        for x in (0, 1, r.v - 1, r.v, pow(2, 512) - 1):
+            self.assertEqual(reduce_barrett(x, r.v, mu), x % r.v)
+        for i in range(1000):
+            digest = os.urandom(64)
+            x = int.from_bytes(digest, 'little')
+            self.assertEqual(reduce_barrett(x, r.v, mu), x % r.v)
+            self.assertEqual(Scalar(r).from_hash(digest).v, x % r.v)
+
+        scalars = [self.ed.secret() for i in range(10)]
+        for s, s_inv in zip(scalars, batch_inv(scalars)):
+            self.assertEqual(Scalar(r).mul(s, s_inv).v, 1)
+
+        n = 10000
+        x = int.from_bytes(os.urandom(64), 'little')
+        print("\nTesting hash-to-scalar reduction times: ")
+        t0 = time.time()
+        for i in range(n):
+            x % r.v
+        time1 = (time.time() - t0)/n
+        t1 = time.time()
+        for i in range(n):
+            reduce_barrett(x, r.v, mu)
+        time2 = (time.time() - t1)/n
+        print("avgtime: generic %: ", time1, "barrett: ", time2)
+
+    def test_rng(self):
+        """
+        The buffered CSPRNG pool: ranges, threads, and reseeding after fork.
+        """
+        pool = rng.RandomPool(1024)
+        r = self.ed.r.v
+        for k in [pool.secret(r) for i in range(200)] + pool.secrets(r, 200):
+            self.assertTrue(1 <= k < r)
+        self.assertEqual(len(pool.read(5000)), 5000)
+        self.assertEqual(set(pool.below(3) for i in range(200)), {0, 1, 2})
+
+        chunks = []
+        def draw():
+            for i in range(500):
+                chunks.append(pool.read(16))
+        threads = [threading.Thread(target=draw) for i in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(len(set(chunks)), 2000)
+
+        pool.read(1)
+        rfd, wfd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.write(wfd, pool.read(32))
+            os._exit(0)
+        os.waitpid(pid, 0)
+        child = os.read(rfd, 32)
+        os.close(rfd)
+        os.close(wfd)
+        self.assertNotEqual(child, pool.read(32))
+
+        # the fork hook does not keep discarded pools alive
+        ref = weakref.ref(rng.RandomPool(16))
+        gc.collect()
+        self.assertIsNone(ref())
+
+        n = 10000
+        print("\nTesting secret generation times: ")
+        t0 = time.time()
+        for i in range(n):
+            random.randrange(1, r)
+        time1 = (time.time() - t0)/n
+        t1 = time.time()
+        for i in range(n):
+            int.from_bytes(os.urandom(40), 'little') % r
+        time2 = (time.time() - t1)/n
+        t2 = time.time()
+        for i in range(n):
+            rng.pool.secret(r)
+        time3 = (time.time() - t2)/n
+        t3 = time.time()
+        rng.pool.secrets(r, n)
+        time4 = (time.time() - t3)/n
+        print("avgtime: randrange: ", time1, "urandom: ", time2,
+            "pool: ", time3, "pool (bulk): ", time4)
+
+    def test_eddsa(self):
+        """
+        RFC 8032 test vectors 1 and 2, and rejection of altered signatures.
+        """
+        vectors = [
+            ("9d61b19deffd5a60ba844af492ec2cc44449c5697b326919703bac031cae7f60",
+             "d75a980182b10ab7d54bfed3c964073a0ee172f3daa62325af021a68f707511a",
+             "",
+             "e5564300c360ac729086e2cc806e828a84877f1eb8e5d974d873e06522490155"
+             "5fb8821590a33bacc61e39701cf9b46bd25bf5f0595bbe24655141438e7a100b"),
+            ("4ccd089b28ff96da9db6c346ec114e0f5b8a319f35aba624da8cf6ed4fb8a6fb",
+             "3d4017c3e843895a92b70aa74d1b7ebc9c982ccf2ec4968cc0cd55f12af4660c",
+             "72",
+             "92a009a9f0d4cab8720e820b5f642540a2b27b5416503f8fb3762223ebdb69da"
+             "085ac1e43e15996e458f3613d0f11d8c387b2eaeb4302aeeb00d291612bb0c00")]
+        for group in (self.ed, self.extended, self.projective):
+            for secret, pk, msg, sig in vectors:
+                key = edwardsPrivateKey(group, bytes.fromhex(secret))
+                msg = bytes.fromhex(msg)
+                self.assertEqual(key.element.hex(), pk)
+                self.assertEqual(b''.join(key.sign(msg)).hex(), sig)
+                pub = key.public_key()
+                self.assertTrue(pub.verify(msg, bytes.fromhex(sig)))
+                self.assertFalse(pub.verify(msg + b"x", bytes.fromhex(sig)))
+                bad = bytearray.fromhex(sig)
+                bad[40] ^= 1
+                self.assertFalse(pub.verify(msg, bytes(bad)))
+
+        key = edwardsPrivateKey(self.extended)
+        signature = key.sign(self.msg)
+        self.assertTrue(key.public_key().verify(self.msg, signature))
+        R, S = signature
+        S = (int.from_bytes(S, 'little') + self.ed.r.v).to_bytes(32, 'little')
+        self.assertFalse(key.public_key().verify(self.msg, (R, S)))
+
+    def test_prehashed(self):
+        """
+        Ed25519ph: the RFC 8032 test vector, incremental Signer/Verifier,
+        contexts, and buffers hashed in place.
+        """
+        key = edwardsPrivateKey(self.extended, bytes.fromhex(
+            "833fe62409237b9d62ec77587520911e9a759cec1d19755b7da901b96dca3d42"))
+        self.assertEqual(key.element.hex(),
+            "ec172b93ad5e563bf4932c70e1245034c35467ef2efd4d64ebf819683467e2bf")
+        sig = "98a70222f0b8121aa9d30f813d683f809e462b469c7ff87639499bb94e6dae41" \
+            "31f85042463c2a355a2003d062adf5aaa10b8c61e636062aaad11c2a26083406"
+        self.assertEqual(b''.join(key.sign_prehashed(b"abc")).hex(), sig)
+        self.assertEqual(b''.join(key.signer().update(b"a").update(b"bc").sign()).hex(), sig)
+        pub = key.public_key()
+        self.assertTrue(pub.verify_prehashed(b"abc", bytes.fromhex(sig)))
+        self.assertFalse(pub.verify(b"abc", bytes.fromhex(sig)))
+        self.assertFalse(pub.verify_prehashed(b"abc", bytes.fromhex(sig), b"ctx"))
+
+        data = os.urandom(100000)
+        signature = key.sign_prehashed(data, b"ctx")
+        verifier = pub.verifier(signature, b"ctx")
+        for i in range(0, len(data), 4096):
+            verifier.update(memoryview(data)[i:i + 4096])
+        self.assertTrue(verifier.verify())
+        self.assertFalse(pub.verifier(signature, b"ctx").update(data[1:]).verify())
+        self.assertRaises(ValueError, key.signer, bytes(256))
+
+        with tempfile.TemporaryFile() as f:
+            f.write(data)
+            f.flush()
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+                self.assertEqual(key.sign_prehashed(m, b"ctx"), signature)
+                self.assertEqual(key.sign(m), key.sign(data))
+                self.assertTrue(pub.verify(memoryview(m), key.sign(data)))
+
+    def test_sign_many(self):
+        """
+        Batch signing gives the same (deterministic) signatures as sign.
+        """
+        for group in (self.extended, self.projective):
+            key = edwardsPrivateKey(group)
+            msgs = [b"", "hello", os.urandom(1000)] + [os.urandom(20) for i in range(5)]
+            signatures = key.sign_many(msgs)
+            self.assertEqual(signatures, [key.sign(m) for m in msgs])
+            for m, signature in zip(msgs, signatures):
+                self.assertTrue(key.public_key().verify(m, signature))
+        self.assertEqual(key.sign_many([]), [])
+
+        n = 50
+        msgs = [os.urandom(100) for i in range(n)]
+        t0 = time.time()
+        for m in msgs:
+            key.sign(m)
+        time1 = (time.time() - t0)/n
+        t1 = time.time()
+        key.sign_many(msgs)
+        time2 = (time.time() - t1)/n
+        print("\nEd25519 avgtime: sign: ", time1, "sign_many: ", time2)
+
+    def test_verify_batch(self):
+        """
+        Batch verification agrees with verify, singles out bad signatures,
+        and is cofactored: a key with a small-order component is accepted.
+        """
+        group = self.extended
+        keys = [edwardsPrivateKey(group) for i in range(4)]
+        items = []
+        for i in range(20):
+            key, msg = keys[i % 4], os.urandom(i)
+            items.append((key.public_key(), msg, b''.join(key.sign(msg))))
+        self.assertEqual(eddsa.verify_batch(items), [True] * 20)
+        self.assertEqual(eddsa.verify_batch([]), [])
+
+        items[3] = (items[3][0], b"other", items[3][2])
+        items[7] = (items[7][0], items[7][1], items[7][2][:32] + bytes(32))
+        items[8] = (items[8][0], items[8][1], bytes(64))
+        items[9] = (items[9][0], items[9][1], items[9][2][:40])
+        expected = [k.verify(m, s) if len(s) == 64 else False for k, m, s in items]
+        self.assertEqual(eddsa.verify_batch(items), expected)
+        self.assertEqual([i for i, ok in enumerate(expected) if not ok], [3, 7, 8, 9])
+
+        # A' = A + T for T = (sqrt(-1), 0) of order 4, signed with a
+        ed = self.ed.point()
+        ed.x.v, ed.y.v = self.ed.context.sqrt_m1.v, 0
+        T = group.point().from_ep(ed)
+        key = keys[0]
+        pk = group.encode_point(group.point().add(key.A, T))
+        for i in range(20):
+            msg = os.urandom(8)
+            nonce = group.secret()
+            R = group.encode_point(group.point().multiply_fixed(group.base_table(), nonce))
+            k = key._Hint(R, pk, msg)
+            S = Scalar(group.r).mul(k, key.scalar)
+            S.add(S, nonce)
+            if k.v % 4:
+                break
+        signature = R + S.to_bytes()
+        self.assertFalse(eddsa.edwardsPublicKey(group, pk).verify(msg, signature))
+        self.assertEqual(eddsa.verify_batch([(eddsa.edwardsPublicKey(group, pk), msg, signature),
+                                             items[0]]), [True, True])
+
+    def test_verifier_pool(self):
+        """
+        Process-pool verification with tables shared through shared memory,
+        for pinned and unpinned keys, good and bad signatures.
+        """
+        group = self.extended
+        keys = [edwardsPrivateKey(group) for i in range(3)]
+        table = group.base_table()
+        unpacked = group.unpack_table(group.pack_table(table))
+        for row, urow in zip(table, unpacked):
+            for pt, upt in zip(row, urow):
+                self.assertTrue(pt.to_ep(pt).equal(upt.to_ep(upt)))
+
+        items, expected = [], []
+        for i in range(12):
+            key, msg = keys[i % 3], os.urandom(40)
+            signature = key.sign(msg)
+            if i % 4 == 0:
+                msg += b"x"
+            items.append((key.element, msg, b''.join(signature)))
+            expected.append(i % 4 != 0)
+        items.append((keys[0].element, b"", bytes(63)))
+        expected.append(False)
+
+        pub = keys[0].public_key()
+        pub.precompute()
+        self.assertTrue(pub.verify(b"m", keys[0].sign(b"m")))
+        self.assertFalse(pub.verify(b"n", keys[0].sign(b"m")))
+
+        with self.assertRaises(ValueError):
+            group.unpack_table(group.pack_table(table), keys[0].element)
+
+        with VerifierPool(group, workers=2, keys=[keys[0].element]) as pool:
+            self.assertEqual(pool.verify_many(items), expected)
+            self.assertEqual(pool.submit(items[:2]).result(), expected[:2])
+
+        # workers skip a pinned table that is not its key's (the shared block
+        # is tampered with before they start)
+        with VerifierPool(group, workers=1, keys=[keys[0].element]) as pool:
+            packed = group.pack_table(keys[1].public_key().precompute())
+            offset = verifierpool.header.size + 2 * verifierpool.key_size + len(packed)
+            pool.shm.buf[offset:offset + len(packed)] = packed
+            self.assertEqual(pool.verify_many(items), expected)
+
+    def test_verifier_pool_tracker(self):
+        """
+        Workers attach to the shared tables without registering them with
+        the resource tracker: no "leaked shared_memory" warning from a pool,
+        and a process attaching with a tracker of its own leaves the block
+        alone when it exits.
+        """
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        setup = ("from edecc import extended, ed25519, verifierpool; "
+                 "from edecc.eddsa import edwardsPrivateKey; "
+                 "group = extended.extEdwardsCurve(ed25519.ed25519()); ")
+        code = setup + ("key = edwardsPrivateKey(group); "
+                        "pool = verifierpool.VerifierPool(group, workers=2, keys=[key.element]); "
+                        "print(pool.verify_many([(key.element, b'm', key.sign(b'm'))] * 4)); "
+                        "pool.close()")
+        out = subprocess.run([sys.executable, "-c", code], cwd=root,
+                             capture_output=True, text=True, timeout=120)
+        self.assertEqual(out.stdout.strip(), "[True, True, True, True]")
+        self.assertEqual(out.stderr, "")
+
+        group = self.extended
+        with VerifierPool(group, workers=1) as pool:
+            code = setup + "verifierpool._attach(%r, group)" % pool.shm.name
+            out = subprocess.run([sys.executable, "-c", code], cwd=root,
+                                 capture_output=True, text=True, timeout=120)
+            self.assertNotIn("leaked shared_memory", out.stderr)
+            self.assertEqual(out.returncode, 0)
+            # closing the pool unlinks the block, which must still exist
+
+    def test_aio(self):
+        """
+        The asyncio interface: offloaded operations, coalesced verification,
+        and a backpressure limit below the batch size.
+        """
+        group = self.extended
+        key = edwardsPrivateKey(group)
+        pub = key.public_key()
+        x0, x1 = PrivateKey(group), PrivateKey(group)
+        msgs = [os.urandom(20) for i in range(10)]
+
+        async def main(runner):
+            signatures = await asyncio.gather(*[runner.sign(key, m) for m in msgs])
+            self.assertEqual(signatures, [key.sign(m) for m in msgs])
+            batches = runner.batches
+            results = await asyncio.gather(*[runner.verify(pub, m, s)
+                for m, s in zip(msgs, signatures)], runner.verify(pub, b"x", signatures[0]))
+            self.assertEqual(results, [True] * len(msgs) + [False])
+            self.assertEqual(runner.batches - batches,
+                -(-(len(msgs) + 1) // min(runner.batch, runner.limit)))
+
+            shared = await runner.exchange(x0, x1.public_key())
+            self.assertEqual(shared, x1.exchange(x0.public_key()))
+            encrypted = await runner.encrypt(x0.public_key(), b"hello")
+            self.assertEqual(await runner.decrypt(x0, encrypted), b"hello")
+
+        asyncio.run(main(aio.Runner()))
+        asyncio.run(main(aio.Runner(limit=2, batch=4)))
+        with VerifierPool(group, workers=1) as pool:
+            asyncio.run(main(aio.Runner(pool, batch=8)))
+
+        async def module():
+            signature = await aio.sign(key, b"m")
+            self.assertTrue(await aio.verify(pub, b"m", signature))
+        aio.configure(batch=16)
+        asyncio.run(module())
+
+        # the module-level runner survives its event loop, with a contended
+        # limit in each loop
+        async def contended():
+            await asyncio.gather(*[aio.sign(key, m) for m in msgs[:3]])
+        aio.configure(limit=1)
+        asyncio.run(contended())
+        asyncio.run(contended())
+        aio.configure()
+
+        # a cancelled verification job cancels its waiting callers
+        async def cancelled():
+            loop = asyncio.get_running_loop()
+            job = loop.create_future()
+            waiter = loop.create_future()
+            job.cancel()
+            aio._resolve(job, [(pub, b"m", b"", waiter)])
+            self.assertTrue(waiter.cancelled())
+        asyncio.run(cancelled())
+
+    def test_serve(self):
+        """
+        The signing/verification daemon, run as a separate process and
+        driven by concurrent clients.
+        """
+        with tempfile.TemporaryDirectory() as d:
+            path, seed = os.path.join(d, "sock"), os.urandom(32)
+            with open(os.path.join(d, "seed"), "wb") as f:
+                f.write(seed)
+            server = subprocess.Popen([sys.executable, "-m", "edecc.serve", "--socket", path,
+                "--key", os.path.join(d, "seed"), "--latency", "5"],
+                cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                stderr=subprocess.PIPE)
+            try:
+                for i in range(100):
+                    if os.path.exists(path):
+                        break
+                    time.sleep(0.1)
+                self.assertEqual(os.stat(path).st_mode & 0o777, 0o600)
+                key = edwardsPrivateKey(self.extended, seed)
+                client = serve.Client(path)
+                self.assertEqual(client.public_key(), key.element)
+                self.assertEqual(client.sign(b"hello"), b''.join(key.sign(b"hello")))
+
+                results = []
+                def run():
+                    c = serve.Client(path)
+                    for i in range(3):
+                        msg = os.urandom(30)
+                        signature = c.sign(msg)
+                        results.append(c.verify(key.element, msg, signature))
+                        results.append(not c.verify(key.element, msg + b"x", signature))
+                    c.close()
+                threads = [threading.Thread(target=run) for i in range(4)]
+                for t in threads:
+                    t.start()
+                for t in threads:
+                    t.join()
+                self.assertEqual(results, [True] * 24)
+                self.assertFalse(client.verify(key.element, b"m", bytes(64)))
+                self.assertEqual(client.request(99)[0], serve.ERROR)
+                client.close()
+            finally:
+                server.terminate()
+                errors = server.communicate()[1]
+            self.assertEqual(server.returncode, 0)
+            self.assertEqual(errors, b'')
+            self.assertFalse(os.path.exists(path))
+
+    def test_serve_failure(self):
+        """
+        A batch whose processing fails is answered with ERROR replies
+        instead of leaving its clients waiting.
+        """
+        def fail(batch):
+            raise RuntimeError("processing failed")
+
+        async def run(path):
+            server = serve.Server(self.extended, latency=0.001)
+            server.process = fail
+            task = asyncio.ensure_future(server.serve(path))
+            for i in range(100):
+                if os.path.exists(path):
+                    break
+                await asyncio.sleep(0.01)
+            reader, writer = await asyncio.open_unix_connection(path)
+            replies = []
+            for rid in (1, 2):
+                body = serve.request.pack(serve.SIGN, rid) + b"hello"
+                writer.write(serve.length.pack(len(body)) + body)
+                n, = serve.length.unpack(await asyncio.wait_for(reader.readexactly(4), 5))
+                replies.append(serve.response.unpack(await reader.readexactly(n)))
+            writer.close()
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+            server.close()
+            return replies
+
+        with tempfile.TemporaryDirectory() as d:
+            replies = asyncio.run(run(os.path.join(d, "sock")))
+        self.assertEqual(replies, [(1, serve.ERROR), (2, serve.ERROR)])
+
+    def test_serve_backpressure(self):
+        """
+        The daemon stops reading a connection while too many requests are
+        queued, and resumes as batches complete.
+        """
+        key = edwardsPrivateKey(self.extended)
+        queued = []
+
+        async def run(path):
+            server = serve.Server(self.extended, key, latency=0.001, batch=2)
+            process = server.process
+            def slow(batch):
+                queued.append(server.queued)
+                time.sleep(0.01)
+                return process(batch)
+            server.process = slow
+            task = asyncio.ensure_future(server.serve(path))
+            for i in range(100):
+                if os.path.exists(path):
+                    break
+                await asyncio.sleep(0.01)
+            reader, writer = await asyncio.open_unix_connection(path)
+            for rid in range(20):
+                body = serve.request.pack(serve.SIGN, rid) + b"m"
+                writer.write(serve.length.pack(len(body)) + body)
+            replies = []
+            for rid in range(20):
+                n, = serve.length.unpack(await asyncio.wait_for(reader.readexactly(4), 5))
+                replies.append(serve.response.unpack_from(await reader.readexactly(n)))
+            writer.close()
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+            server.close()
+            return replies
+
+        limit = serve.max_queued
+        serve.max_queued = 4
+        try:
+            with tempfile.TemporaryDirectory() as d:
+                replies = asyncio.run(run(os.path.join(d, "sock")))
+        finally:
+            serve.max_queued = limit
+        self.assertEqual(sorted(replies), [(rid, serve.OK) for rid in range(20)])
+        self.assertLessEqual(max(queued), 4)
+
+    def test_generate_keypairs(self):
+        """
+        Bulk Ed25519 and Diffie-Hellman key generation into packed records,
+        in process and fanned out to worker processes.
+        """
+        group = self.extended
+        for workers in (None, 2):
+            packed = eddsa.generate_keypairs(group, 6, workers)
+            self.assertEqual(len(packed), 6 * 64)
+            for i in range(0, len(packed), 64):
+                key = edwardsPrivateKey(group, packed[i:i + 32])
+                self.assertEqual(key.element, packed[i + 32:i + 64])
+
+            packed = elgamal.generate_keypairs(group, 6, workers)
+            self.assertEqual(len(packed), 6 * 64)
+            for i in range(0, len(packed), 64):
+                key = PrivateKey(group, Scalar(group.r).from_bytes(packed[i:i + 32]))
+                self.assertEqual(group.encode_point(key.element), packed[i + 32:i + 64])
+                element = group.decode_point(packed[i + 32:i + 64])
+                self.assertTrue(element.to_ep(element).equal(key.element.to_ep(key.element)))
+        self.assertEqual(len(set(packed[i:i + 32] for i in range(0, len(packed), 64))), 6)
+
+        n = 50
+        t0 = time.time()
+        for i in range(n):
+            edwardsPrivateKey(group)
+        time1 = (time.time() - t0)/n
+        t1 = time.time()
+        eddsa.generate_keypairs(group, n)
+        time2 = (time.time() - t1)/n
+        print("\nEd25519 keygen avgtime: single: ", time1, "generate_keypairs: ", time2)
+
+    def test_values(self):
+        """
+        The immutable value API agrees with the in-place one, and its objects
+        cannot be modified.
+        """
+        group = self.extended
+        params = values.params(group)
+        B = values.base(params)
+        n = group.secret()
+        Q = group.point().multiply_window(group.base, n)
+        P = B * n
+        self.assertEqual(P, values.from_point(Q))
+        self.assertEqual(P.encode(), group.encode_point(Q))
+        self.assertEqual(values.multiply_base(params, n), P)
+        self.assertEqual(group.encode_point(P.to_point(group)), P.encode())
+        self.assertEqual(values.decode(group, P.encode()), P)
+        self.assertEqual(P + B, values.from_point(group.point().add(Q, group.base)))
+        self.assertEqual(P.double(), P + P)
+        self.assertEqual(P - P, values.identity(params))
+        self.assertEqual(B * group.r, values.identity(params))
+        self.assertTrue(P.on_curve())
+        with self.assertRaises(AttributeError):
+            P.X = 0
+
+        limit, saved = values.max_tables, dict(values._tables)
+        values._tables.clear()
+        values.max_tables = 3
+        try:
+            base = values.fixed_table(B)
+            points = [B * (i + 2) for i in range(4)]
+            tables = [values.fixed_table(points[0])]
+            values.fixed_table(B)
+            tables.append(values.fixed_table(points[1]))
+            values.fixed_table(points[0])
+            tables.append(values.fixed_table(points[2]))
+            self.assertIs(values.fixed_table(points[0]), tables[0])
+            self.assertIsNot(values.fixed_table(points[1]), tables[1])
+            for Q in points:
+                values.fixed_table(Q)
+            self.assertEqual(len(values._tables), 3)
+            self.assertIs(values.fixed_table(B), base)
+        finally:
+            values.max_tables = limit
+            values._tables.clear()
+            values._tables.update(saved)
+
+        x = values.FieldElement(params.p, 5)
+        self.assertEqual(x / 3 * 3, x)
+        self.assertEqual(x - 7, -2)
+        self.assertEqual((x * x).sqrt() ** 2, x * x)
+        with self.assertRaises(AttributeError):
+            x.v = 1
+
+        # In-place points no longer share default coordinates.
+        self.assertIsNot(edwards.EdwardsPoint(self.ed).x,
+                         edwards.EdwardsPoint(self.ed).x)
+
+    def test_context(self):
+        """
+        Curves of the same parameters share one CurveContext, its constants
+        and the fixed-base tables of each coordinate system.
+        """
+        ctx = self.ed.context
+        P = ctx.p.v
+        self.assertIs(ed25519.ed25519().context, ctx)
+        self.assertIs(extended.extEdwardsCurve(ed25519.ed25519()).tables, self.extended.tables)
+        self.assertIsNot(self.projective.tables, self.extended.tables)
+        self.assertEqual(ctx.d2.v, 2 * ctx.d.v % P)
+        self.assertEqual(ctx.sqrt_m1.v * ctx.sqrt_m1.v % P, P - 1)
+        self.assertEqual(ctx.a24.v, (486662 + 2) // 4)
+        self.assertEqual((ctx.exp_p38.v, ctx.exp_p58.v), ((P + 3)//8, (P - 5)//8))
+
+        copy = pickle.loads(pickle.dumps(self.extended))
+        self.assertIs(copy.context, ctx)
+        self.assertIs(copy.tables, self.extended.tables)
+
+        for group in (self.ed, self.projective, self.inverted, self.extended):
+            for i in range(5):
+                element = group.encode_point(group.point().random_element())
+                self.assertEqual(group.encode_point(group.decode_point(element)), element)
+            x = ModInt(ctx.p, 5)
+            self.assertEqual(group.sqrt(x.mul(x, x)).v ** 2 % P, 25)
+
+    def test_table_cache(self):
+        """
+        Fixed-base tables saved to and loaded from a cache file, which is
+        rebuilt when missing, corrupt or lacking a requested key.
+        """
+        group = self.extended
+        keys = [edwardsPrivateKey(group) for i in range(2)]
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, 'tables.bin')
+            t0 = time.time()
+            cache = tablecache.warm(group, path, [keys[0].element])
+            time1 = time.time() - t0
+            self.assertEqual(cache.keys(), [keys[0].element])
+            cache.close()
+
+            group.tables.clear()
+            t1 = time.time()
+            cache = tablecache.warm(group, path, [keys[0].element])
+            time2 = time.time() - t1
+            self.assertIn(group.base.string(), group.tables)
+            self.assertEqual(group.pack_table(group.base_table()),
+                             group.pack_table(group.fixed_table(group.point().set(group.base))))
+            msg = b'cached'
+            self.assertTrue(cache.public_key(keys[0].element).verify(msg, keys[0].sign(msg)))
+            cache.close()
+
+            cache = tablecache.warm(group, path, [keys[1].element])
+            self.assertEqual(sorted(cache.keys()), sorted(k.element for k in keys))
+            self.assertTrue(cache.public_key(keys[1].element).verify(msg, keys[1].sign(msg)))
+            cache.close()
+
+            # a tampered file (valid checksum) giving keys[1] the table of
+            # keys[0]: the table is recomputed rather than trusted
+            with open(path, 'rb') as f:
+                data = bytearray(f.read())
+            size = tablecache.header.unpack_from(data)[4]
+            entries = {}
+            for offset in range(tablecache.header.size, len(data) - tablecache.digest_size,
+                                tablecache.key_size + size):
+                entries[bytes(data[offset:offset + tablecache.key_size])] = offset
+            src, dst = (entries[k.element] + tablecache.key_size for k in keys)
+            data[dst:dst + size] = data[src:src + size]
+            data[-tablecache.digest_size:] = hashlib.sha256(data[:-tablecache.digest_size]).digest()
+            with open(path, 'wb') as f:
+                f.write(data)
+            with self.assertRaises(ValueError):
+                group.unpack_table(data[dst:dst + size], keys[1].element)
+            cache = tablecache.TableCache(group, path).load()
+            pub = cache.public_key(keys[1].element)
+            self.assertEqual(group.encode_point(pub.A), keys[1].element)
+            self.assertTrue(pub.verify(msg, keys[1].sign(msg)))
+            self.assertFalse(pub.verify(msg, keys[0].sign(msg)))
+            cache.close()
+
+            with open(path, 'r+b') as f:
+                f.seek(tablecache.header.size + 100)
+                byte = f.read(1)
+                f.seek(-1, 1)
+                f.write(bytes([byte[0] ^ 1]))
+            with self.assertRaises(ValueError):
+                tablecache.TableCache(group, path).load()
+            cache = tablecache.warm(group, path)
+            self.assertIsNotNone(cache.data)
+            cache.close()
+        print("\nTable cache: build and save: ", time1, "load: ", time2)
+
+    def test_import_time(self):
+        """
+        Importing the signing code stays within its budget and leaves the
+        optional dependencies unloaded. The time is the cumulative figure
+        reported by python -X importtime (the best of a few runs).
+        """
+        budget = 0.150
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        code = ("import sys, edecc.eddsa, edecc.extended, edecc.ed25519; "
+                "print([m for m in ('Crypto', 'ecdsa', 'concurrent.futures', "
+                "'multiprocessing', 'asyncio') if m in sys.modules])")
+        times = []
+        for i in range(3):
+            out = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                                 cwd=root, capture_output=True, text=True, check=True)
+            self.assertEqual(out.stdout.strip(), "[]")
+            times.append(sum(int(line.split("|")[1]) for line in out.stderr.splitlines()
+                             if line.rstrip().endswith(("| edecc.eddsa", "| edecc.extended",
+                                                        "| edecc.ed25519"))) / 1e6)
+        print("\nimport edecc.eddsa, edecc.extended, edecc.ed25519: ", min(times), "s")
+        self.assertLess(min(times), budget)
+
+    def test_backends(self):
+        """
+        Every available arithmetic backend gives bit-identical results: the
+        same field operations, keys, signatures, encodings and point values.
+        """
+        def run():
+            group = extended.extEdwardsCurve(ed25519.ed25519(ed25519.new_context()))
+            p = group.p
+            x, y = ModInt(p, 3 ** 100), ModInt(p, 7 ** 90)
+            field = [ModInt(p).mul(x, y).v, ModInt(p).div(x, y).v, ModInt(p).inv(y).v,
+                     ModInt(p).exp(x, y).v, group.sqrt(ModInt(p).mul(x, x)).v,
+                     modular.batch_inverse([x.v, y.v, 12345], p.v)]
+            key = edwardsPrivateKey(group, bytes(range(32)))
+            signatures = key.sign_many([b"", b"abc", b"x" * 1000])
+            public = eddsa.edwardsPublicKey(group, key.element)
+            valid = [public.verify(m, s) for m, s in
+                     zip([b"", b"abc", b"x" * 1000], signatures)]
+            points = [group.point().multiply_fixed(group.base_table(), Scalar(group.r, n))
+                      for n in (1, 2, 3 ** 150)]
+            encoded = group.encode_points(points) + [group.encode_point(group.decode_point(key.element))]
+            P = values.base(values.params(group)) * (5 ** 100)
+            with self.assertRaises(ValueError):
+                ModInt(p).inv(ModInt(p, 0))
+            return [[int(v) for v in field[:5]], [int(v) for v in field[5]],
+                    key.element, signatures, valid, encoded, P.encode(), type(p.v).__name__]
+
+        previous = modular.backend().name
+        results = {}
+        try:
+            for name in modular.backends:
+                try:
+                    modular.set_backend(name)
+                except ImportError:
+                    continue
+                results[name] = run()
+        finally:
+            modular.set_backend(previous)
+
+        self.assertIn('python', results)
+        print("\nbackends tested: ", sorted(results))
+        reference = results['python']
+        self.assertEqual(reference[-1], 'int')
+        for name, result in results.items():
+            self.assertEqual(result[:-1], reference[:-1], name)
+        self.assertTrue(all(reference[4]))
+        if 'gmpy2' in results:
+            self.assertEqual(results['gmpy2'][-1], 'mpz')
+
+    def test_values_threads(self):
+        """
+        Scalar multiplications on shared PointValues from a thread pool.
+        Scales with the number of cores on free-threaded CPython; under the
+        GIL the throughput stays flat.
+        """
+        params = values.params(self.extended)
+        B = values.base(params)
+        values.fixed_table(B)
+        scalars = [self.extended.secret() for i in range(64)]
+        expected = [values.multiply_base(params, n) for n in scalars[:8]]
+
+        print("\nPointValue scalar multiplications per second (%d CPUs):" % (os.cpu_count() or 1))
+        for threads in (1, 2, 4, 8):
+            with ThreadPoolExecutor(threads) as executor:
+                t0 = time.time()
+                results = list(executor.map(lambda n: B * n, scalars))
+                elapsed = time.time() - t0
+            self.assertEqual(results[:8], expected)
+            print("threads: ", threads, "ops/s: ", len(scalars) / elapsed)
+
     # def test_projective(self):
     #     self.get_params(self.projective)
     #     self.basic(self.projective)
@@ -77,70 +1141,66 @@ class Test(unittest.TestCase):
     #     self.timing(self.mont)
     #     self.data_plotter(self.mont)
 
-    # def test_opt(self):
-    #     """
-    #     Timing tests for python wrapper of c code from the pysodium package.
-    #     """
-    #     g = self.ed
-    #     n = 100
-    #     times1, times2 = 0, 0
-    #     print("\nTesting scalar multiplication times: ")
-    #     for i in range(n):
-    #         s = crypto_scalarmult_curve25519_base(randombytes(crypto_scalarmult_BYTES))
-    #         r = crypto_scalarmult_curve25519_base(randombytes(crypto_scalarmult_BYTES))
-    #         t0 = time.time()
-    #         crypto_scalarmult_curve25519(s,r)
-    #         times1 += time.time() - t0
-    #         t1 = time.time()
-    #         crypto_scalarmult_curve25519_base(randombytes(crypto_scalarmult_BYTES))
-    #         times2 += time.time() - t1
-
-    #     print("scalarmult (random): ", times1/n, "mult by base: ", times2/n)
-
-    #     times1, times2, times3 = 0, 0, 0
-    #     print("\nTesting signing/verification times: ")
-    #     for i in range(n):
-    #         msg = ''.join([random.choice(string.ascii_letters + string.digits) \
-    #             for n in range(numchars)])
-    #         pk, sk = crypto_sign_keypair()
-
-    #         t0 = time.time()
-    #         signed = crypto_sign(msg,sk)
-    #         times1 += time.time() - t0
-    #         changed = signed[:crypto_sign_BYTES]+'0'+signed[crypto_sign_BYTES+1:]
-    #         print (crypto_sign_open(signed, pk))
-    #         t1 = time.time()
-    #         crypto_sign_open(changed, pk)
-    #         times2 += time.time() - t1
-    #         seed = crypto_generichash(msg, outlen=crypto_sign_SEEDBYTES)
-    #         pk2, sk2 = crypto_sign_seed_keypair(seed)
-    #         t2 = time.time()
-    #         pk, sk = crypto_sign_seed_keypair(seed)
-    #         times3 += time.time() - t2
-    #         assert pk == pk2 and sk == sk2
-
-    #     print("avgtime: signing: ", times1/n, "verification: ", times2/n,
-    #         "w/ hash: ", times3/n)
-
-    #     with open(cwrappernummsg.txt, 'w') as file:
-    #         nummessages = 100
-    #         for n in range(nummessages):
-    #             t0 = time.time()
-    #             for n in range(i):
-    #                 signed = crypto_sign(self.msg,sk)
-    #                 changed = signed[:crypto_sign_BYTES]+'0'+signed[crypto_sign_BYTES+1:]
-    #                 crypto_sign_open(changed, pk)
-    #             time = time.time() - t0
-    #             file.write(n + "\t" + time + "\n")
-
-    #     with open(cwrapperlenmsg.txt, 'w') as file:
-    #         numchars = 1000
-    #         for n in range(numchars):
-    #             signed = crypto_sign(self.msg,sk)
-    #             changed = signed[:crypto_sign_BYTES]+'0'+signed[crypto_sign_BYTES+1:]
-    #             crypto_sign_open(changed, pk)
-    #             time = time.time() - t0
-    #         file.write(n + "\t" + time + "\n")
+    def test_x25519(self):
+        """
+        X25519 against the RFC 7748 test vectors; the fixed-base path agrees
+        with the ladder on u = 9.
+        """
+        vectors = [
+            ('a546e36bf0527c9d3b16154b82465edd62144c0ac1fc5a18506a2244ba449ac4',
+             'e6db6867583030db3594c1a424b15f7c726624ec26b3353b10a903a6d0ab1c4c',
+             'c3da55379de9c6908e94ea4df28d084f32eccf03491c71f754b4075577a28552'),
+            ('4b66e9d4d1b4673c5ad22691957d6af5c11b6421e0ea01d42ca4169e7918ba0d',
+             'e5210f12786811d3f4b7959d0538ae2c31dbe7106fc03c3efc4cd549c715a493',
+             '95cbde9476e8907d7aade45cb4b873f88b595a68799fa152e6f8f7647aac7957'),
+        ]
+        for k, u, out in vectors:
+            self.assertEqual(curve25519.x25519(bytes.fromhex(k), bytes.fromhex(u)).hex(), out)
+
+        # Diffie-Hellman (RFC 7748 section 6.1)
+        a = bytes.fromhex('77076d0a7318a57d3c16c17251b26645df4c2f87ebc0992ab177fba51db92c2a')
+        b = bytes.fromhex('5dab087e624a8a4b79e17f8b83800ee66f3bb1292618b6fd1c2f8b27ff88e0eb')
+        A = curve25519.x25519_base(a)
+        B = curve25519.x25519_base(b)
+        self.assertEqual(A.hex(), '8520f0098930a754748b7ddcb43ef75a0dbf3a0d26381af4eba4a98eaa9b4e6a')
+        self.assertEqual(B.hex(), 'de9edb7d7b7dc1b4d35b61c2ece435373f8343c85b78674dadfc7e146f882b4f')
+        shared = '4a5d9d5ba4ce2de1728e3bf480350f25e07e21c947d19e3376f09b3c1e161742'
+        self.assertEqual(curve25519.x25519(a, B).hex(), shared)
+        self.assertEqual(curve25519.x25519(b, A).hex(), shared)
+
+        nine = (9).to_bytes(32, 'little')
+        for i in range(5):
+            k = os.urandom(32)
+            self.assertEqual(curve25519.x25519_base(k), curve25519.x25519(k, nine))
+            self.assertEqual(curve25519.x25519_base(k, self.projective), curve25519.x25519(k, nine))
+        self.assertEqual(curve25519.x25519(k, bytes(32)), bytes(32))
+        self.assertRaises(ValueError, curve25519.x25519, k[:31], nine)
+
+    def test_reference(self):
+        """
+        Differential comparison with the installed reference libraries
+        (pysodium, python-ed25519) on randomized inputs, and their throughput
+        relative to edecc. A deliberately broken implementation must be
+        caught.
+        """
+        refs = reference.references()
+        if not refs:
+            self.skipTest("no reference library installed")
+        self.assertEqual(reference.compare(20, seed=1, refs=refs), [])
+
+        class Broken(reference.Edecc):
+            def signer(self, seed):
+                sign = reference.Edecc.signer(self, seed)
+                return lambda m: sign(m + b'!')
+        mismatches = reference.compare(3, seed=2, impl=Broken(self.projective), refs=refs)
+        self.assertIn(('sign', refs[0].name), [m[:2] for m in mismatches])
+
+        results = reference.throughput(20, seed=3, refs=refs)
+        print("\nThroughput vs reference libraries:")
+        reference.report(results)
+        for op, ratios in reference.ratios(results).items():
+            for lib, ratio in ratios.items():
+                self.assertGreater(ratio, 0)
 
     def data_plotter(self, group):
         """
@@ -3,15 +3,14 @@ Misc helper functions.
 """
 
 import binascii
-from Crypto.Util.number import bytes_to_long, long_to_bytes
 
 def b2l(s):
-    return bytes_to_long(s)
+    return int.from_bytes(s, 'big')
 
 def l2b(s):
-    return long_to_bytes(s)
+    return s.to_bytes(max(1, (s.bit_length() + 7) // 8), 'big')
 
 def string_to_long(s):
     s = bytes("".join(s.split()), "UTF-8")
     s = binascii.a2b_hex(s)
-    return bytes_to_long(s)
+    return b2l(s)
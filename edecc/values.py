@@ -0,0 +1,330 @@
+"""
+Immutable field elements and curve points.
+
+ModInt and the point classes compute in place: every operation overwrites
+its receiver, and points built from a curve share its ModInt constants, so
+two threads can only use the same objects under a lock. The classes here
+are value types instead: operations return new objects and nothing is
+modified after construction, so curve parameters, points and fixed-base
+tables can be shared freely between threads (e.g. the workers of a
+ThreadPoolExecutor on free-threaded CPython) without any locking.
+
+Both APIs interoperate: from_point and PointValue.to_point convert between
+them, and scalars may be ints or ModInt/Scalar objects.
+"""
+
+from collections import namedtuple
+from .edwards import digits, radix
+from .modular import inverse, powmod
+
+b = 256 # word size
+max_tables = 256 # number of fixed-base tables kept (as edwards.max_tables)
+
+class FieldElement(object):
+    """
+    An element of the prime field of order p (an int). Supports the usual
+    arithmetic operators with other FieldElements of the same field or ints.
+    """
+
+    __slots__ = ('p', 'v')
+
+    def __init__(self, p, v=0):
+        object.__setattr__(self, 'p', p)
+        object.__setattr__(self, 'v', v % p)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("FieldElement is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError("FieldElement is immutable")
+
+    def __reduce__(self):
+        return (FieldElement, (self.p, self.v))
+
+    def _value(self, a):
+        if isinstance(a, FieldElement):
+            if a.p != self.p:
+                raise ValueError("elements of different fields")
+            return a.v
+        return a
+
+    def __add__(self, a):
+        return FieldElement(self.p, self.v + self._value(a))
+
+    __radd__ = __add__
+
+    def __sub__(self, a):
+        return FieldElement(self.p, self.v - self._value(a))
+
+    def __rsub__(self, a):
+        return FieldElement(self.p, self._value(a) - self.v)
+
+    def __mul__(self, a):
+        return FieldElement(self.p, self.v * self._value(a))
+
+    __rmul__ = __mul__
+
+    def __truediv__(self, a):
+        return self * FieldElement(self.p, self._value(a)).inverse()
+
+    def __rtruediv__(self, a):
+        return self.inverse() * a
+
+    def __neg__(self):
+        return FieldElement(self.p, -self.v)
+
+    def __pow__(self, n):
+        return FieldElement(self.p, powmod(self.v, int(n), self.p))
+
+    def inverse(self):
+        return FieldElement(self.p, inverse(self.v, self.p))
+
+    def sqrt(self):
+        """
+        A square root of the element (which must be a quadratic residue).
+        """
+        from ecdsa import numbertheory
+        return FieldElement(self.p, numbertheory.square_root_mod_prime(self.v, self.p))
+
+    def __eq__(self, a):
+        if isinstance(a, FieldElement):
+            return self.p == a.p and self.v == a.v
+        if isinstance(a, int):
+            return self.v == a % self.p
+        return NotImplemented
+
+    def __hash__(self):
+        return hash((self.p, self.v))
+
+    def __int__(self):
+        return self.v
+
+    __index__ = __int__
+
+    def __repr__(self):
+        return "FieldElement(%d, %d)" % (self.p, self.v)
+
+# Parameters of a twisted Edwards curve ax^2 + y^2 = 1 + dx^2y^2 as plain
+# ints: the field prime p, a, d, the group order r and the affine generator.
+Params = namedtuple('Params', 'p a d r gx gy')
+
+def params(curve):
+    """
+    The Params of an EdwardsCurve (in any coordinate system).
+    """
+    c = curve.context
+    p = c.p.v
+    return Params(p, c.a.v % p, c.d.v % p, c.r.v, c.gx.v % p, c.gy.v % p)
+
+class PointValue(object):
+    """
+    An immutable point in extended twisted Edwards coordinates
+    (X : Y : Z : T), with x = X/Z, y = Y/Z and xy = T/Z.
+
+    Arithmetic uses the unified formulas of "Twisted Edwards Curves
+    Revisited" (http://eprint.iacr.org/2008/522), add-2008-hwcd and
+    dbl-2008-hwcd, which are complete when a is a square and d a nonsquare.
+
+    Attributes:
+        - params: the curve Params
+        - X, Y, Z, T: coordinates as ints modulo params.p
+    """
+
+    __slots__ = ('params', 'X', 'Y', 'Z', 'T')
+
+    def __init__(self, params, x, y, z=1, t=None):
+        """
+        Without t, (x : y : z) are projective coordinates, (x, y) affine ones
+        when z = 1.
+        """
+        p = params.p
+        x, y, z = getattr(x, 'v', x), getattr(y, 'v', y), getattr(z, 'v', z)
+        if t is None:
+            x, y, z, t = x * z, y * z, z * z, x * y
+        init = object.__setattr__
+        init(self, 'params', params)
+        init(self, 'X', x % p)
+        init(self, 'Y', y % p)
+        init(self, 'Z', z % p)
+        init(self, 'T', getattr(t, 'v', t) % p)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("PointValue is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError("PointValue is immutable")
+
+    def __reduce__(self):
+        return (PointValue, (self.params, self.X, self.Y, self.Z, self.T))
+
+    def __add__(self, q):
+        c = self.params
+        p = c.p
+        A = self.X * q.X % p
+        B = self.Y * q.Y % p
+        C = self.T * c.d * q.T % p
+        D = self.Z * q.Z % p
+        E = (self.X + self.Y) * (q.X + q.Y) - A - B
+        F = D - C
+        G = D + C
+        H = B - c.a * A
+        return PointValue(c, E * F, G * H, F * G, E * H)
+
+    def __neg__(self):
+        return PointValue(self.params, -self.X, self.Y, self.Z, -self.T)
+
+    def __sub__(self, q):
+        return self + (-q)
+
+    def double(self):
+        c = self.params
+        p = c.p
+        A = self.X * self.X % p
+        B = self.Y * self.Y % p
+        C = 2 * self.Z * self.Z % p
+        D = c.a * A
+        E = (self.X + self.Y) * (self.X + self.Y) - A - B
+        G = D + B
+        F = G - C
+        H = D - B
+        return PointValue(c, E * F, G * H, F * G, E * H)
+
+    def __mul__(self, n):
+        """
+        Fixed-window scalar multiplication by n (an int, or a ModInt or
+        Scalar), as EdwardsPoint.multiply_window.
+        """
+        n = getattr(n, 'v', n)
+        table = [identity(self.params), self]
+        for i in range(2, 1 << radix):
+            table.append(table[-1] + self)
+
+        Q = table[0]
+        for digit in reversed(digits(n)):
+            for i in range(radix):
+                Q = Q.double()
+            if digit:
+                Q = Q + table[digit]
+        return Q
+
+    __rmul__ = __mul__
+
+    def __eq__(self, q):
+        if not isinstance(q, PointValue):
+            return NotImplemented
+        p = self.params.p
+        return self.params == q.params and \
+            (self.X * q.Z - q.X * self.Z) % p == 0 and \
+            (self.Y * q.Z - q.Y * self.Z) % p == 0
+
+    def __hash__(self):
+        return hash((self.params, self.affine()))
+
+    def affine(self):
+        """
+        The affine coordinates (x, y) as ints.
+        """
+        p = self.params.p
+        z_inv = inverse(self.Z, p)
+        return (self.X * z_inv % p, self.Y * z_inv % p)
+
+    def on_curve(self):
+        c = self.params
+        x, y = self.affine()
+        return (c.a * x * x + y * y - 1 - c.d * x * x * y * y) % c.p == 0
+
+    def encode(self):
+        """
+        Compressed encoding (RFC 8032), as EdwardsCurve.encode_point.
+        """
+        x, y = self.affine()
+        return (y | ((x & 1) << (b - 1))).to_bytes(b//8, 'little')
+
+    def to_point(self, curve):
+        """
+        Returns a new (mutable) point of curve, in its coordinate system.
+        """
+        ed = curve.c.point()
+        ed.x.v, ed.y.v = self.affine()
+        return curve.point().from_ep(ed)
+
+    def __repr__(self):
+        return "PointValue(%d, %d, %d, %d)" % (self.X, self.Y, self.Z, self.T)
+
+def identity(params):
+    return PointValue(params, 0, 1)
+
+def base(params):
+    """
+    The generator of the curve.
+    """
+    return PointValue(params, params.gx, params.gy)
+
+def from_point(pt):
+    """
+    The PointValue of pt, a point of an EdwardsCurve in any coordinate
+    system; pt itself is left unchanged.
+    """
+    ed = pt.to_ep(pt)
+    return PointValue(params(pt.c), ed.x.v, ed.y.v)
+
+def decode(curve, s):
+    """
+    Decodes a compressed point (see EdwardsCurve.decode_point).
+    """
+    return from_point(curve.decode_point(s))
+
+# Fixed-base tables keyed by (Params, affine point), never modified once
+# built; meant for the generator and long-lived public keys. At most
+# max_tables are kept, in least recently used order.
+_tables = {}
+
+def fixed_table(P):
+    """
+    The fixed-base table of P, as EdwardsCurve.fixed_table: row i holds the
+    multiples [1, 2, ..., 15] * 16^i * P, as tuples. Threads racing on a
+    missing table may each build it; the results are equal and one wins.
+    When the cache is full the least recently used table is evicted, never
+    the generator's. Only single dict operations are used, so the cache
+    needs no lock.
+    """
+    key = (P.params, P.affine())
+    table = _tables.get(key)
+    if table is not None:
+        _tables.pop(key, None)
+        _tables[key] = table
+        return table
+
+    rows = []
+    Q = P
+    for i in range((P.params.p.bit_length() + radix - 1) // radix):
+        row = [Q]
+        for j in range(2, 1 << radix):
+            row.append(row[-1] + Q)
+        rows.append(tuple(row))
+        Q = row[(1 << (radix - 1)) - 1].double()
+    table = tuple(rows)
+    if len(_tables) >= max_tables:
+        base = (P.params, (P.params.gx, P.params.gy))
+        for old in list(_tables):
+            if old != base:
+                _tables.pop(old, None)
+                break
+    return _tables.setdefault(key, table)
+
+def multiply_fixed(table, n):
+    """
+    [n]P for the point P whose table is given: one addition per nonzero
+    radix-16 digit of n (an int, or a ModInt or Scalar).
+    """
+    Q = identity(table[0][0].params)
+    for i, digit in enumerate(digits(getattr(n, 'v', n))):
+        if digit:
+            Q = Q + table[i][digit - 1]
+    return Q
+
+def multiply_base(params, n):
+    """
+    [n]B for the generator B, using its (shared) fixed-base table.
+    """
+    return multiply_fixed(fixed_table(base(params)), n)
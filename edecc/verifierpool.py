@@ -0,0 +1,164 @@
+"""
+Multi-process Ed25519 verification with shared precomputed tables.
+
+Pure-Python curve arithmetic holds the GIL, so a VerifierPool spreads
+signature verification over worker processes. The fixed-base tables of the
+generator and of pinned (frequently used) public keys are built once in the
+parent and packed into a single multiprocessing.shared_memory block; every
+worker attaches to that block at startup instead of recomputing them.
+"""
+
+import os
+import struct
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import resource_tracker, shared_memory
+from .eddsa import edwardsPublicKey, verify_batch
+
+magic = b'EDVPOOL\x01'
+header = struct.Struct('<8sII') # magic, number of tables, bytes per table
+key_size = 32 # bytes of an encoded public key
+max_keys = 1024 # public keys cached by a worker
+
+class VerifierPool(object):
+    """
+    A pool of worker processes verifying (public key, message, signature)
+    triples, with public keys, messages and signatures as bytes (the
+    signature either as the (R, S) pair or its 64-byte concatenation).
+
+    Attributes:
+        - group: the curve (coordinate system) the workers compute in
+        - workers: number of worker processes
+        - shm: the shared memory block holding the packed tables
+    """
+
+    def __init__(self, group, workers=None, keys=()):
+        """
+        Starts workers processes (one per CPU by default). keys are encoded
+        public keys whose tables are shared with the workers, on top of the
+        generator's.
+        """
+        self.group = group
+        self.workers = workers or os.cpu_count() or 1
+
+        tables = [(group.encode_point(group.base), group.base_table())]
+        for pk in keys:
+            tables.append((pk, edwardsPublicKey(group, pk).precompute()))
+        packed = [(pk, group.pack_table(table)) for pk, table in tables]
+        size = len(packed[0][1])
+
+        self.shm = shared_memory.SharedMemory(create=True,
+            size=header.size + len(packed) * (key_size + size))
+        header.pack_into(self.shm.buf, 0, magic, len(packed), size)
+        offset = header.size
+        for pk, data in packed:
+            self.shm.buf[offset:offset + key_size] = pk
+            self.shm.buf[offset + key_size:offset + key_size + size] = data
+            offset += key_size + size
+
+        self.executor = ProcessPoolExecutor(self.workers, initializer=_attach,
+                                            initargs=(self.shm.name, group))
+
+    def submit(self, batch):
+        """
+        Schedules the verification of a batch of (pk, msg, sig) triples on
+        one worker. Returns a future of the list of results (booleans).
+        """
+        return self.executor.submit(_verify_batch, list(batch))
+
+    def verify_many(self, items):
+        """
+        Verifies the (pk, msg, sig) triples of items, split evenly between
+        the workers, and returns their results in order.
+        """
+        items = list(items)
+        size = max(1, -(-len(items) // self.workers))
+        futures = [self.submit(items[i:i + size])
+                   for i in range(0, len(items), size)]
+        return [ok for future in futures for ok in future.result()]
+
+    def close(self):
+        """
+        Stops the workers and releases the shared memory block.
+        """
+        self.executor.shutdown()
+        self.shm.close()
+        self.shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+# State of a worker process, set up by _attach.
+_group = None
+_pinned = {}
+_keys = {}
+
+def _open(name):
+    """
+    Attaches to the shared memory block name without registering it with
+    the resource tracker (bpo-38119): a worker with a tracker of its own
+    would otherwise unlink the block, with a "leaked shared_memory" warning,
+    when it exits. Unregistering it after attaching is no substitute, as
+    workers usually share the parent's tracker, whose registration it would
+    drop.
+    """
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name, track=False)
+    register = resource_tracker.register
+    resource_tracker.register = lambda name, rtype: None
+    try:
+        return shared_memory.SharedMemory(name)
+    finally:
+        resource_tracker.register = register
+
+def _attach(name, group):
+    """
+    Worker initializer: reads the packed tables from the shared memory block
+    name. The generator's table goes into the curve's table cache (so
+    base_table() finds it), and pinned keys get their table preset. A table
+    whose first point is not its key's is skipped (and rebuilt on use).
+    """
+    global _group
+    shm = _open(name)
+    try:
+        tag, count, size = header.unpack_from(shm.buf, 0)
+        if tag != magic:
+            raise ValueError("not a verifier pool table block")
+        offset = header.size
+        for i in range(count):
+            pk = bytes(shm.buf[offset:offset + key_size])
+            try:
+                with shm.buf[offset + key_size:offset + key_size + size] as data:
+                    table = group.unpack_table(data, pk)
+            except ValueError:
+                continue
+            finally:
+                offset += key_size + size
+            if i == 0:
+                group.tables[group.base.string()] = table
+            else:
+                key = edwardsPublicKey(group, pk)
+                key.A = table[0][0]
+                key.table = table
+                _pinned[pk] = key
+    finally:
+        shm.close()
+    _group = group
+
+def _verify_batch(batch):
+    """
+    Process pool entry point for VerifierPool.submit: the batch is checked
+    with one batch equation (eddsa.verify_batch).
+    """
+    items = []
+    for pk, msg, sig in batch:
+        key = _pinned.get(pk) or _keys.get(pk)
+        if key is None:
+            if len(_keys) >= max_keys:
+                del _keys[next(iter(_keys))]
+            key = _keys[pk] = edwardsPublicKey(_group, pk)
+        items.append((key, msg, sig))
+    return verify_batch(items)
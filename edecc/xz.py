@@ -1,6 +1,6 @@
-import edwards
-from modular import ModInt
-from group import Group, Point
+from . import edwards
+from .modular import ModInt
+from .group import Group, Point
 
 class xzEdwardsCurve(edwards.EdwardsCurve):
     """
@@ -23,6 +23,7 @@ class xzEdwardsCurve(edwards.EdwardsCurve):
         #self.d = mont.d
         self.p = mont.p
         self.r = mont.r
+        self.context = mont.context
 
         self.zero = mont.zero
         self.one = mont.one
@@ -36,10 +37,10 @@ class xzEdwardsCurve(edwards.EdwardsCurve):
         return xzEdwardsPoint(self, ModInt(self.p), ModInt(self.p))
 
 class xzEdwardsPoint(edwards.EdwardsPoint):
-    def __init__(self, curve, x=ModInt(), z=ModInt()):
+    def __init__(self, curve, x=None, z=None):
         self.c = curve
-        self.x = x
-        self.z = z
+        self.x = ModInt(curve.p) if x is None else x
+        self.z = ModInt(curve.p) if z is None else z
 
     def string(self):
         return (self.x.v, self.z.v)
@@ -104,7 +105,7 @@ class xzEdwardsPoint(edwards.EdwardsPoint):
             BB = B**2
             C = AA - BB
             x_r = AA * BB
-            z_r = C * (BB + self.A * 25 * C)
+            z_r = C * (BB + self.c.context.a24.v * C)
         return (x_r % self.p, z_r % self.p)
 
     def multiply(self, n, P):
@@ -6,7 +6,7 @@ setup(
     author='Lining Wang',
     author_email='liningwang@live.com',
     packages=['edecc'],
-    scripts=['bin/tests.py'],
+    scripts=['bin/edecc-serve'],
     url='http://pypi.python.org/pypi/TowelStuff/',
     license='LICENSE.txt',
     description='Curve25519/Edwards curve cryptography and abstract group support for a variety of crypto primitives.',